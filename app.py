@@ -1,64 +1,177 @@
 import os
-import json
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from datetime import datetime
+import time
+from contextlib import nullcontext
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, Response, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import date
+from catalog import JsonCatalogStore, FileCatalogVersion
+from pagination import page_size
+from orders import MemoryOrderStore, Order, OrderLine, OrderFilter, InvalidFilter, EXPORT_FORMATS, export_chunks, sales_report
+from users import MemoryUserStore
+from stats import MemoryStats
+from search import SearchIndex
+from images import ImagePipeline, InvalidImage, MAX_UPLOAD_BYTES
+from jobs import JobQueue, CoverJobs
+from sessions import ServerSessionInterface, MemorySessionStore, session_user
+from cart import CartService, MemoryCartStore, CartConflict
+from passwords import PasswordHasher, RateLimiter, HasherBusy, SIGNUP_BURST, SIGNUP_PER_MINUTE, TRUSTED_PROXIES
+from render_cache import RenderCache
+import sqlite_store
+import metrics
 
 app = Flask(__name__)
 app.secret_key = 'bookbazar_secret_key'
 
+# Request timing, backend-call counts and Server-Timing, scraped at /metrics;
+# PROFILE_ENDPOINTS turns on the sampling profiler for those endpoints
+profiler = metrics.SamplingProfiler()
+metrics.init_app(app, profiler=profiler)
+
+# Cover-image job workers (jobs.py) re-import this script as __mp_main__
+# when it is run directly; they only need images.process_staged, so the
+# web-only startup work below is skipped there
+JOB_WORKER = __name__ == '__mp_main__'
+
 # Configuration
 UPLOAD_FOLDER = 'static/images'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
 DATA_FILE = 'books.json'
+# 'sqlite' (default: users, orders and books persisted in one WAL-mode file)
+# or 'json' (books.json + in-memory users/orders, the original behaviour)
+STORAGE_BACKEND = os.environ.get('BOOKBAZAR_STORAGE', 'sqlite')
+DATABASE_FILE = os.environ.get('BOOKBAZAR_DB', 'bookbazar.db')
+# Server-side sessions: 'sqlite' (default with the SQLite backend) or 'memory'
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite' if STORAGE_BACKEND == 'sqlite' else 'memory')
 
 # Ensure the upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+image_pipeline = ImagePipeline(UPLOAD_FOLDER)
+app.add_template_global(image_pipeline.sources, 'cover_sources')
 
 # ---------------------------------------------------------
-# Helper Functions (Read/Write JSON)
+# Data Storage
 # ---------------------------------------------------------
-def load_books():
-    if not os.path.exists(DATA_FILE):
-        return []
-    try:
-        with open(DATA_FILE, 'r') as file:
-            return json.load(file)
-    except:
-        return []
+if STORAGE_BACKEND == 'sqlite':
+    db = sqlite_store.Database(DATABASE_FILE)
+    # First start: import the existing books.json catalog
+    sqlite_store.migrate_books_json(db, DATA_FILE)
+    catalog = sqlite_store.SqliteCatalogStore(db)
+    user_store = sqlite_store.SqliteUserStore(db)
+    order_store = sqlite_store.SqliteOrderStore(db)
+    stats = sqlite_store.SqliteStats(db)
+    cart_store = sqlite_store.SqliteCartStore(db)
+    # Writes to several stores in one SQLite transaction (checkout)
+    transaction = db.transaction
+else:
+    # Parsed catalog stays in memory (indexed by id, author and title);
+    # books.json is only re-read when it changes
+    catalog = JsonCatalogStore(DATA_FILE)
+    user_store = MemoryUserStore()
+    # Orders indexed by order_id and user_id (my_orders never walks every order)
+    order_store = MemoryOrderStore()
+    # Dashboard totals, kept up to date by every write instead of recomputed per hit
+    stats = MemoryStats()
+    if not JOB_WORKER:
+        stats.adjust_stock(sum(b.get('stock', 0) for b in catalog.all()))
+    cart_store = MemoryCartStore()
+    # books.json and the in-memory stores share no transaction
+    transaction = nullcontext
 
-def save_books(books_list):
-    with open(DATA_FILE, 'w') as file:
-        json.dump(books_list, file, indent=4)
 
-# ---------------------------------------------------------
-# Data Storage
-# ---------------------------------------------------------
-users = [
-    {'id': 1, 'name': 'Admin', 'email': 'admin@bookbazar.com', 'password': generate_password_hash('admin123')}
-]
-orders = []
-order_counter = 1
+# The session cookie only carries an opaque id; session data lives here
+if SESSION_BACKEND == 'sqlite':
+    if STORAGE_BACKEND != 'sqlite':
+        db = sqlite_store.Database(DATABASE_FILE)
+    app.session_interface = ServerSessionInterface(sqlite_store.SqliteSessionStore(db))
+else:
+    app.session_interface = ServerSessionInterface(MemorySessionStore())
+
+# Rendered book fragments and anonymous pages, keyed by a catalog version
+# that every catalog write (add/edit/delete, checkout, cover attach) bumps;
+# with books.json the version is the file's own signature, shared by all workers
+render_cache = RenderCache(sqlite_store.SqliteCatalogVersion(db) if STORAGE_BACKEND == 'sqlite'
+                           else FileCatalogVersion(catalog.cache))
+app.add_template_global(render_cache.fragment, 'book_fragment')
+
+# Carts are per user (not in the session), with a cached priced summary
+# that is re-priced when the catalog version moved on (no per-cart writes)
+cart_service = CartService(cart_store, catalog, catalog_version=lambda: render_cache.version()[0])
+
+# Full-text search: built once at startup, updated by add/edit/delete
+search_index = SearchIndex()
+if not JOB_WORKER:
+    search_index.build(catalog.all())
+
+# Cover resizing runs in a local process pool (IMAGE_WORKERS), not in requests
+job_queue = JobQueue()
+cover_jobs = CoverJobs(job_queue, image_pipeline, catalog, on_attach=render_cache.bump)
+metrics.REGISTRY.register_gauge('bookbazar_jobs_pending', 'Background jobs queued or running.', lambda: job_queue.stats()['pending'])
+
+# Password hashing runs on a bounded pool (PASSWORD_METHOD sets the KDF/cost);
+# login and signup are rate limited per client IP, in separate buckets
+password_hasher = PasswordHasher()
+login_limiter = RateLimiter()
+signup_limiter = RateLimiter(burst=SIGNUP_BURST, per_minute=SIGNUP_PER_MINUTE)
+# Behind a load balancer remote_addr is the proxy's: take the client's
+# address from X-Forwarded-For (TRUSTED_PROXIES hops)
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+_admin_seeded = False
+
+def ensure_admin():
+    """Seeds the admin account on the first login instead of at import, so
+    starting a worker doesn't pay for a password hash."""
+    global _admin_seeded
+    if not _admin_seeded:
+        if not user_store.get_by_email('admin@bookbazar.com'):
+            user_store.add('Admin', 'admin@bookbazar.com', password_hasher.hash('admin123'))
+        _admin_seeded = True
+
+def cart_key():
+    return str(session['user']['id'])
+
+def current_cart():
+    """The logged-in user's {str_id: qty}, read once per request."""
+    if 'cart' not in g:
+        g.cart = cart_service.items(cart_key()) if 'user' in session else {}
+    return g.cart
+
+app.add_template_global(current_cart, 'current_cart')
 
 # ---------------------------------------------------------
 # Core Routes
 # ---------------------------------------------------------
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # index.html shows Login/Register only to visitors: cache that variant alone
+    if 'user' in session:
+        return render_template('index.html')
+    return render_cache.page(lambda: render_template('index.html'))
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
+        if not login_limiter.allow(request.remote_addr):
+            flash('Too many attempts. Please wait a minute and try again.', 'danger')
+            return render_template('login.html'), 429
         email = request.form['email']
         password = request.form['password']
-        user = next((u for u in users if u['email'] == email), None)
+        try:
+            ensure_admin()
+            user = user_store.get_by_email(email)
+            valid = user is not None and password_hasher.verify(user['password'], password)
+        except HasherBusy:
+            flash('Server is busy, please try again.', 'warning')
+            return render_template('login.html'), 503
         
-        if user and check_password_hash(user['password'], password):
-            session['user'] = user
-            if 'cart' in session and isinstance(session['cart'], list):
-                session['cart'] = {}
+        if valid:
+            if password_hasher.needs_rehash(user['password']):
+                # Hashing policy changed: upgrade the stored hash in the background
+                password_hasher.rehash_later(password, lambda new_hash: user_store.set_password(email, new_hash))
+            session.rotate()
+            session['user'] = session_user(user)
             if user['email'] == 'admin@bookbazar.com':
                 return redirect(url_for('admin_dashboard'))
             return redirect(url_for('browse_books'))
@@ -69,28 +182,37 @@ def login():
 @app.route('/logout')
 def logout():
     session.pop('user', None)
-    session.pop('cart', None)
     flash('Logged out successfully.', 'info')
     return redirect(url_for('index'))
 
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
+        if not signup_limiter.allow(request.remote_addr):
+            flash('Too many attempts. Please wait a minute and try again.', 'danger')
+            return render_template('signup.html'), 429
         name = request.form['name']
         email = request.form['email']
-        password = generate_password_hash(request.form['password'])
-        if any(u['email'] == email for u in users):
+        if user_store.get_by_email(email):
+            flash('Email already registered!', 'danger')
+            return redirect(url_for('signup'))
+        try:
+            password = password_hasher.hash(request.form['password'])
+        except HasherBusy:
+            flash('Server is busy, please try again.', 'warning')
+            return render_template('signup.html'), 503
+        if not user_store.add(name, email, password):
             flash('Email already registered!', 'danger')
             return redirect(url_for('signup'))
-        new_user = {'id': len(users) + 1, 'name': name, 'email': email, 'password': password}
-        users.append(new_user)
         flash('Registration successful! Please login.', 'success')
         return redirect(url_for('login'))
     return render_template('signup.html')
 
 @app.route('/about')
 def about():
-    return render_template('about.html', user=session.get('user'))
+    if 'user' in session:
+        return render_template('about.html', user=session['user'])
+    return render_cache.page(lambda: render_template('about.html', user=None))
 
 @app.route('/contact', methods=['GET', 'POST'])
 def contact():
@@ -106,44 +228,59 @@ def contact():
 @app.route('/browse')
 def browse_books():
     if 'user' not in session: return redirect(url_for('login'))
-    if 'cart' in session and isinstance(session['cart'], list):
-        session['cart'] = {}
-    books = load_books()
-    return render_template('browse_books.html', books=books, user=session['user'])
+    # Optional filters served from the author / title-prefix indexes,
+    # otherwise one cursor-paginated page of the catalog
+    next_cursor = None
+    if request.args.get('author'):
+        books = catalog.by_author(request.args['author'])
+    elif request.args.get('title'):
+        books = catalog.by_title_prefix(request.args['title'])
+    else:
+        books, next_cursor = catalog.page(page_size(request.args), request.args.get('cursor'))
+    return render_cache.conditional(render_template('browse_books.html', books=books, next_cursor=next_cursor, user=session['user']))
+
+@app.route('/search')
+def search():
+    if 'user' not in session: return redirect(url_for('login'))
+    query = request.args.get('q', '').strip()
+    book_ids = search_index.search(query, limit=page_size(request.args))
+    books_by_id = catalog.get_many(book_ids)
+    books = [books_by_id[i] for i in book_ids if i in books_by_id]
+    if request.args.get('format') == 'json':
+        return jsonify([{'id': b['id'], 'title': b['title'], 'author': b['author']} for b in books])
+    return render_cache.conditional(render_template('browse_books.html', books=books, query=query, user=session['user']))
+
+@app.route('/covers/<path:filename>')
+def cover(filename):
+    return image_pipeline.send(filename)
 
 @app.route('/book/<int:book_id>')
 def book_details(book_id):
     if 'user' not in session: return redirect(url_for('login'))
-    books = load_books()
-    book = next((b for b in books if b['id'] == book_id), None)
+    book = catalog.get(book_id)
     if not book:
         flash('Book not found.', 'danger')
         return redirect(url_for('browse_books'))
-    return render_template('book_details.html', book=book, user=session['user'])
+    return render_cache.conditional(render_template('book_details.html', book=book, user=session['user']))
 
 @app.route('/add_to_cart/<int:book_id>', methods=['POST'])
 def add_to_cart(book_id):
     if 'user' not in session: return redirect(url_for('login'))
     
-    if 'cart' not in session or isinstance(session['cart'], list):
-        session['cart'] = {}
-    
-    books = load_books()
-    book = next((b for b in books if b['id'] == book_id), None)
+    book = catalog.get(book_id)
     if not book:
         flash('Book not found.', 'danger')
         return redirect(url_for('browse_books'))
 
-    cart = session['cart']
-    str_id = str(book_id)
-    current_qty = cart.get(str_id, 0)
-    
-    # Stock Check
-    if current_qty + 1 > book.get('stock', 0):
+    # Stock Check (against the cart as saved, so two tabs can't both add the last copy)
+    try:
+        added = cart_service.add(cart_key(), book_id, 1, max_quantity=book.get('stock', 0))
+    except CartConflict:
+        flash('Your cart is busy, please try again.', 'warning')
+        return redirect(request.referrer or url_for('browse_books'))
+    if added is None:
         flash(f'Sorry, only {book["stock"]} copies available!', 'warning')
     else:
-        cart[str_id] = current_qty + 1
-        session['cart'] = cart
         flash('Cart updated! 🛒', 'success')
         
     return redirect(request.referrer or url_for('browse_books'))
@@ -151,96 +288,88 @@ def add_to_cart(book_id):
 @app.route('/decrease_cart/<int:book_id>', methods=['POST'])
 def decrease_cart(book_id):
     if 'user' not in session: return redirect(url_for('login'))
-    cart = session.get('cart', {})
-    str_id = str(book_id)
-    if str_id in cart:
-        if cart[str_id] > 1:
-            cart[str_id] -= 1
-        else:
-            del cart[str_id]
-    session['cart'] = cart
+    if str(book_id) in current_cart():
+        try:
+            cart_service.add(cart_key(), book_id, -1)
+        except CartConflict:
+            flash('Your cart is busy, please try again.', 'warning')
+            return redirect(request.referrer or url_for('browse_books'))
     flash('Cart updated.', 'info')
     return redirect(request.referrer or url_for('browse_books'))
 
 @app.route('/cart')
 def view_cart():
     if 'user' not in session: return redirect(url_for('login'))
-    books = load_books()
-    cart = session.get('cart', {})
-    if isinstance(cart, list):
-        session['cart'] = {}
-        cart = {}
-    cart_items = []
-    grand_total = 0
-    for str_id, quantity in cart.items():
-        book = next((b for b in books if str(b['id']) == str_id), None)
-        if book:
-            line_total = book['price'] * quantity
-            grand_total += line_total
-            cart_items.append({'book': book, 'quantity': quantity, 'line_total': round(line_total, 2)})
-    return render_template('cart.html', cart_items=cart_items, grand_total=round(grand_total, 2))
+    # Cached priced summary: one cart read, re-priced only after a change
+    summary = cart_service.summary(cart_key())
+    return render_template('cart.html', cart_items=summary['lines'], grand_total=summary['grand_total'])
+
+@app.route('/cart/summary')
+def cart_summary():
+    if 'user' not in session: return jsonify({'count': 0, 'total': 0})
+    summary = cart_service.summary(cart_key())
+    return jsonify({'count': summary['count'], 'total': summary['grand_total']})
 
 @app.route('/remove_from_cart/<int:book_id>')
 def remove_from_cart(book_id):
-    if 'cart' in session:
-        cart = session['cart']
-        str_id = str(book_id)
-        if isinstance(cart, dict) and str_id in cart:
-            del cart[str_id]
-            session['cart'] = cart
-            flash('Item removed from cart.', 'warning')
-        elif isinstance(cart, list):
-             session['cart'] = {}
+    if 'user' not in session: return redirect(url_for('login'))
+    if str(book_id) in current_cart():
+        try:
+            cart_service.set_quantity(cart_key(), book_id, 0)
+        except CartConflict:
+            flash('Your cart is busy, please try again.', 'warning')
+            return redirect(url_for('view_cart'))
+        flash('Item removed from cart.', 'warning')
     return redirect(url_for('view_cart'))
 
 # --- UPDATED: Checkout with Status & Stock Validation ---
 @app.route('/checkout', methods=['POST'])
 def checkout():
     if 'user' not in session: return redirect(url_for('login'))
-    cart = session.get('cart', {})
-    if not cart or isinstance(cart, list):
+    cart = current_cart()
+    if not cart:
         flash('Your cart is empty!', 'danger')
         return redirect(url_for('browse_books'))
     
-    books = load_books()
-    global order_counter
+    books_by_id = catalog.get_many(cart.keys())
     
     # 1. Validation Loop
     for str_id, quantity in cart.items():
-        book = next((b for b in books if str(b['id']) == str_id), None)
+        book = books_by_id.get(str_id)
         if book and quantity > book.get('stock', 0):
             flash(f"Error: Not enough stock for '{book['title']}'. Only {book['stock']} left.", 'danger')
             return redirect(url_for('view_cart'))
 
-    # 2. Processing Loop
-    for str_id, quantity in cart.items():
-        book = next((b for b in books if str(b['id']) == str_id), None)
-        if book:
-            book['stock'] -= quantity
-            for _ in range(quantity):
-                new_order = {
-                    'order_id': order_counter,
-                    'user_id': session['user']['id'],
-                    'user_name': session['user']['name'], # NEW: Save user name for Admin
-                    'book_title': book['title'],
-                    'price': book['price'],
-                    'status': 'Pending', # NEW: Default status
-                    'order_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                orders.append(new_order)
-                order_counter += 1
-                
-    save_books(books)
-    session.pop('cart', None)
+    # Stock, order and dashboard counters are written together (one SQLite
+    # transaction): a failure part-way leaves none of them behind
+    with transaction():
+        # 2. Reserve stock (re-checked under the write lock, so two workers can't oversell)
+        short = catalog.adjust_stock({str_id: -quantity for str_id, quantity in cart.items() if str_id in books_by_id})
+        if short:
+            for str_id in short:
+                book = catalog.get(str_id)
+                flash(f"Error: Not enough stock for '{book['title']}'. Only {book['stock']} left.", 'danger')
+            return redirect(url_for('view_cart'))
+
+        # 3. One order for the whole checkout, one line per book
+        lines = [OrderLine(str_id, books_by_id[str_id]['title'], quantity, books_by_id[str_id]['price'])
+                 for str_id, quantity in cart.items() if str_id in books_by_id]
+        if lines:
+            order = order_store.add(Order(None, session['user']['id'], session['user']['name'], time.time(), lines))
+            stats.record_orders(1, order.total, order.units)
+    cart_service.clear(cart_key())
+    # Stock changed: other carts re-price on next view (catalog version)
+    render_cache.bump()
     flash(f'Order placed successfully!', 'success')
     return redirect(url_for('my_orders'))
 
 @app.route('/my_orders')
 def my_orders():
     if 'user' not in session: return redirect(url_for('login'))
-    user_orders = [o for o in orders if o['user_id'] == session['user']['id']]
-    # Reverse to show newest orders first
-    return render_template('my_orders.html', orders=user_orders[::-1])
+    # Newest first, one page at a time from the per-user index
+    user_orders, next_cursor = order_store.page_for_user(session['user']['id'], page_size(request.args), request.args.get('cursor'))
+    page_total = round(sum(o.total for o in user_orders), 2)
+    return render_template('my_orders.html', orders=user_orders, page_total=page_total, next_cursor=next_cursor)
 
 # ---------------------------------------------------------
 # Admin Routes
@@ -249,17 +378,19 @@ def my_orders():
 def admin_dashboard():
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com':
         return redirect(url_for('index'))
-    books = load_books()
-    total_sales = sum(o['price'] for o in orders)
-    total_stock = sum(book.get('stock', 0) for book in books)
-    
-    # Pass 'orders' to template (reversed for newest first)
+    # O(1) totals; only one page of recent orders and one page of books
+    totals = stats.snapshot()
+    orders, orders_cursor = order_store.recent(page_size(request.args), request.args.get('orders_cursor'))
+    books, books_cursor = catalog.page(page_size(request.args), request.args.get('books_cursor'))
     return render_template('admin_dashboard.html', 
                            books=books, 
-                           orders=orders[::-1], 
-                           total_sales=round(total_sales, 2), 
-                           total_orders=len(orders), 
-                           total_stock=total_stock, 
+                           orders=orders, 
+                           orders_cursor=orders_cursor,
+                           books_cursor=books_cursor,
+                           total_sales=totals['total_sales'], 
+                           total_orders=totals['total_orders'], 
+                           total_stock=totals['total_stock'], 
+                           status_counts=totals['status_counts'],
                            user=session['user'])
 
 # --- NEW: Update Order Status Route ---
@@ -268,29 +399,106 @@ def update_order_status(order_id):
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
     
     new_status = request.form.get('status')
-    for order in orders:
-        if order['order_id'] == order_id:
-            order['status'] = new_status
-            break
+    old_status = order_store.update_status(order_id, new_status)
+    if old_status:
+        stats.status_changed(old_status, new_status)
             
     flash(f'Order #{order_id} updated to {new_status}.', 'success')
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/orders/export')
+def export_orders():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    # ?format=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD&status=Pending,Shipped
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        order_filter = OrderFilter.from_args(request.args)
+    except InvalidFilter as e:
+        return jsonify({'error': str(e)}), 400
+    # Keyset pages from the store, encoded chunk by chunk as the client reads
+    orders = order_store.iter_orders(order_filter)
+    filename = f"orders-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(export_chunks(orders, fmt)), mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/admin/orders/report')
+def orders_report():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    try:
+        order_filter = OrderFilter.from_args(request.args)
+    except InvalidFilter as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(sales_report(order_store.iter_orders(order_filter)))
+
+@app.route('/admin/jobs')
+def admin_jobs():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    return jsonify({'jobs': job_queue.recent(page_size(request.args)), 'stats': job_queue.stats()})
+
+@app.route('/admin/jobs/<job_id>')
+def admin_job_status(job_id):
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/admin/images/reclaim', methods=['POST'])
+def reclaim_images():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    # legacy=1 also removes unreferenced covers uploaded before content-hash names
+    job_id = cover_jobs.reclaim(include_legacy=request.form.get('legacy') == '1')
+    return jsonify({'job_id': job_id}), 202
+
+@app.route('/admin/stats')
+def admin_stats():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    return jsonify({'catalog': catalog.stats(), 'dashboard': stats.snapshot(), 'search': search_index.stats(), 'jobs': job_queue.stats(), 'sessions': app.session_interface.stats(), 'carts': cart_service.stats(),
+                    'passwords': password_hasher.stats(), 'login_rate_limit': login_limiter.stats(), 'signup_rate_limit': signup_limiter.stats(),
+                    'render_cache': render_cache.stats()})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    is_admin = 'user' in session and session['user']['email'] == 'admin@bookbazar.com'
+    if not metrics.metrics_allowed(is_admin): return 'Forbidden', 403
+    return metrics.REGISTRY.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    if request.method == 'POST':
+        # endpoints=browse_books,checkout&rate=0.05 (empty endpoints turns it off)
+        endpoints = [e.strip() for e in request.form.get('endpoints', '').split(',') if e.strip()]
+        profiler.configure(endpoints, float(request.form.get('rate', profiler.rate)))
+        if request.form.get('reset') == '1':
+            profiler.reset()
+        return jsonify(profiler.status())
+    if request.args.get('endpoint'):
+        report = profiler.report(request.args['endpoint'], sort=request.args.get('sort', 'cumulative'))
+        if report is None:
+            return jsonify({'error': 'no samples for this endpoint'}), 404
+        return report, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return jsonify(profiler.status())
+
 @app.route('/admin/add', methods=['GET', 'POST'])
 def add_book():
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
     if request.method == 'POST':
-        books = load_books()
         image_filename = 'default_book.jpg'
+        staged_upload = None
         if 'image' in request.files:
             file = request.files['image']
             if file.filename != '':
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_filename = filename
+                try:
+                    staged_upload = cover_jobs.stage(file)
+                except InvalidImage as e:
+                    flash(str(e), 'danger')
+                    return render_template('book_form.html', action='Add', book=request.form)
 
-        new_id = max([b['id'] for b in books] or [0]) + 1
-        new_book = {
+        # Id is allocated under the books.json lock
+        new_book = catalog.insert(lambda new_id: {
             'id': new_id, 
             'title': request.form['title'], 
             'author': request.form['author'], 
@@ -298,9 +506,13 @@ def add_book():
             'description': request.form['description'],
             'stock': int(request.form['stock']),
             'image': image_filename
-        }
-        books.append(new_book)
-        save_books(books)
+        })
+        stats.adjust_stock(new_book['stock'])
+        search_index.add(new_book)
+        render_cache.bump()
+        if staged_upload:
+            # Cover is resized in the background and attached when ready
+            cover_jobs.submit(new_book['id'], staged_upload)
         flash('Book added successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
     return render_template('book_form.html', action='Add')
@@ -308,41 +520,45 @@ def add_book():
 @app.route('/admin/edit/<int:book_id>', methods=['GET', 'POST'])
 def edit_book(book_id):
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
-    books = load_books()
-    book_index = next((i for i, b in enumerate(books) if b['id'] == book_id), None)
-    if book_index is None: return redirect(url_for('admin_dashboard'))
+    book = catalog.get(book_id)
+    if book is None: return redirect(url_for('admin_dashboard'))
     if request.method == 'POST':
-        books[book_index]['title'] = request.form['title']
-        books[book_index]['author'] = request.form['author']
-        books[book_index]['price'] = float(request.form['price'])
-        books[book_index]['description'] = request.form['description']
-        books[book_index]['stock'] = int(request.form['stock'])
-        
+        old_stock = book.get('stock', 0)
+        book = dict(book)
+        book['title'] = request.form['title']
+        book['author'] = request.form['author']
+        book['price'] = float(request.form['price'])
+        book['description'] = request.form['description']
+        book['stock'] = int(request.form['stock'])
+        staged_upload = None
         if 'image' in request.files:
             file = request.files['image']
             if file.filename != '':
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                books[book_index]['image'] = filename
-        save_books(books)
+                try:
+                    staged_upload = cover_jobs.stage(file)
+                except InvalidImage as e:
+                    flash(str(e), 'danger')
+                    return render_template('book_form.html', action='Edit', book=book)
+        catalog.put(book)
+        stats.adjust_stock(book['stock'] - old_stock)
+        search_index.add(book)
+        render_cache.bump()
+        if staged_upload:
+            cover_jobs.submit(book_id, staged_upload)
         flash('Book updated successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
-    return render_template('book_form.html', action='Edit', book=books[book_index])
+    return render_template('book_form.html', action='Edit', book=book)
 
 @app.route('/admin/delete/<int:book_id>')
 def delete_book(book_id):
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
-    books = load_books()
-    book_to_delete = next((b for b in books if b['id'] == book_id), None)
+    book_to_delete = catalog.delete(book_id)
     if book_to_delete:
-        image_name = book_to_delete.get('image')
-        if image_name and image_name != 'default_book.jpg':
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], image_name)
-            if os.path.exists(file_path):
-                try: os.remove(file_path)
-                except: pass
-        books = [b for b in books if b['id'] != book_id]
-        save_books(books)
+        stats.adjust_stock(-book_to_delete.get('stock', 0))
+        search_index.remove(book_id)
+        render_cache.bump()
+        # Deleted in the background once no other book shares the cover
+        cover_jobs.reclaim([book_to_delete.get('image')])
         flash('Book and image deleted successfully!', 'warning')
     return redirect(url_for('admin_dashboard'))
 
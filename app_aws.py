@@ -1,74 +1,255 @@
 import os
-import boto3
+import time
 import uuid
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from datetime import datetime
-from boto3.dynamodb.conditions import Key, Attr
+import threading
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, Response, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import date
 from botocore.exceptions import ClientError
+from catalog import DynamoCatalogStore
+from pagination import page_size
+from orders import DynamoOrderStore, Order, OrderLine, order_to_item, OrderFilter, InvalidFilter, EXPORT_FORMATS, export_chunks, sales_report
+from stats import DynamoStats
+from notifications import NotificationDispatcher, FakeSNSClient
+import aws_clients
+import metrics
+from search import SearchIndex
+from images import ImagePipeline, InvalidImage, MAX_UPLOAD_BYTES
+from jobs import JobQueue, CoverJobs
+from sessions import ServerSessionInterface, MemorySessionStore, DynamoSessionStore, session_user
+from cart import CartService, MemoryCartStore, DynamoCartStore, CartConflict
+from passwords import PasswordHasher, RateLimiter, HasherBusy, SIGNUP_BURST, SIGNUP_PER_MINUTE, TRUSTED_PROXIES
+from render_cache import RenderCache, DynamoCatalogVersion
+from dynamo_utils import TRANSACT_ITEMS_LIMIT, TransactionCancelled, chunked, transact_write
+from fanout import FanOut
 
 app = Flask(__name__)
 app.secret_key = 'bookbazar_secret_key'
 
+# Request timing, backend-call counts and Server-Timing, scraped at /metrics;
+# PROFILE_ENDPOINTS turns on the sampling profiler for those endpoints
+profiler = metrics.SamplingProfiler()
+metrics.init_app(app, profiler=profiler)
+
+# Cover-image job workers (jobs.py) re-import this script as __mp_main__
+# when it is run directly; they only need images.process_staged, so they
+# start no SNS worker threads
+JOB_WORKER = __name__ == '__mp_main__'
+
 # ---------------------------------------------------------
 # AWS CONFIGURATION
 # ---------------------------------------------------------
 REGION = 'us-east-1'
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-sns_client = boto3.client('sns', region_name=REGION)
+# Clients come from aws_clients: created on first use, shared across threads,
+# with a sized connection pool, adaptive retries and timeouts
+sns_client = aws_clients.lazy_client('sns', REGION)
+
+# DynamoDB Tables (python create_tables.py)
+books_table = aws_clients.lazy_table('Books', REGION)   # Partition Key: id (String)
+users_table = aws_clients.lazy_table('Users', REGION)   # Partition Key: email (String)
+orders_table = aws_clients.lazy_table('Orders', REGION) # Partition Key: order_id (String), GSIs: user_id-order_date-index, order_shard-order_date-index
+stats_table = aws_clients.lazy_table('Stats', REGION)   # Partition Key: name (String)
+sessions_table = aws_clients.lazy_table('Sessions', REGION) # Partition Key: sid (String), TTL: expires_at
+carts_table = aws_clients.lazy_table('Carts', REGION)   # Partition Key: user_key, Sort Key: entry
+
+# Independent DynamoDB calls in one request run concurrently on a shared
+# pool (FANOUT_WORKERS; 0 = one after another), FANOUT_PER_REQUEST at a time
+fanout = FanOut()
+
+# Book lookups go through the catalog store (key lookups + author/title GSIs)
+catalog = DynamoCatalogStore(books_table, fanout=fanout)
+order_store = DynamoOrderStore(orders_table)
+# Parallel Scan segments (threads) per order export / sales report
+ORDER_EXPORT_SEGMENTS = int(os.environ.get('ORDER_EXPORT_SEGMENTS', 4))
+# Dashboard totals: atomic counters updated on every write (python stats.py recounts)
+stats = DynamoStats(stats_table)
 
-# DynamoDB Tables (Created manually in AWS Console)
-books_table = dynamodb.Table('Books')   # Partition Key: id (String)
-users_table = dynamodb.Table('Users')   # Partition Key: email (String)
-orders_table = dynamodb.Table('Orders') # Partition Key: order_id (String)
+# The session cookie only carries an opaque id; session data lives in the
+# Sessions table (SESSION_BACKEND=memory for a single instance)
+if os.environ.get('SESSION_BACKEND', 'dynamodb') == 'memory':
+    app.session_interface = ServerSessionInterface(MemorySessionStore())
+else:
+    app.session_interface = ServerSessionInterface(DynamoSessionStore(sessions_table))
+
+
+# Password hashing runs on a bounded pool (PASSWORD_METHOD sets the KDF/cost);
+# login and signup are rate limited per client IP, in separate buckets
+password_hasher = PasswordHasher()
+login_limiter = RateLimiter()
+signup_limiter = RateLimiter(burst=SIGNUP_BURST, per_minute=SIGNUP_PER_MINUTE)
+# Behind a load balancer remote_addr is the proxy's: take the client's
+# address from X-Forwarded-For (TRUSTED_PROXIES hops)
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Full-text search index, built from one catalog scan on first use and
+# updated by add/edit/delete (no search service, no per-query Scan)
+search_index = SearchIndex()
+_search_build_lock = threading.Lock()
 
 # SNS Topic ARN (UPDATE THIS with your actual Topic ARN from AWS Console)
 # Format: 'arn:aws:sns:us-east-1:123456789012:BookBazar_Orders'
 SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:YOUR_ACCOUNT_ID:BookBazar_Orders' 
 
+# SNS publishes happen on background workers, never in the request
+# (SNS_FAKE=1 records messages in memory instead of calling AWS)
+sns_dispatcher = NotificationDispatcher(
+    FakeSNSClient() if os.environ.get('SNS_FAKE') else sns_client,
+    SNS_TOPIC_ARN,
+    workers=0 if JOB_WORKER else int(os.environ.get('SNS_WORKERS', 2)),
+    dead_letter_path=os.environ.get('SNS_DEAD_LETTER', 'sns_dead_letter.jsonl')
+)
+
 # File Upload Config
 UPLOAD_FOLDER = 'static/images'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+image_pipeline = ImagePipeline(UPLOAD_FOLDER)
+app.add_template_global(image_pipeline.sources, 'cover_sources')
+
+# Rendered book fragments and anonymous pages, keyed by a catalog version kept
+# in the Stats table (every instance re-reads it at most once a second)
+render_cache = RenderCache(DynamoCatalogVersion(stats_table))
+app.add_template_global(render_cache.fragment, 'book_fragment')
+
+# Carts are per user (shared across devices), with a cached priced summary
+# that is re-priced when the catalog version moved on (no per-cart writes)
+cart_service = CartService(
+    MemoryCartStore() if os.environ.get('CART_BACKEND', 'dynamodb') == 'memory' else DynamoCartStore(carts_table),
+    catalog,
+    catalog_version=lambda: render_cache.version()[0]
+)
+
+# Cover resizing runs in a local process pool (IMAGE_WORKERS), not in requests
+job_queue = JobQueue()
+cover_jobs = CoverJobs(job_queue, image_pipeline, catalog, on_attach=render_cache.bump)
+metrics.REGISTRY.register_gauge('bookbazar_jobs_pending', 'Background jobs queued or running.', lambda: job_queue.stats()['pending'])
+metrics.REGISTRY.register_gauge('bookbazar_sns_queue_depth', 'Notifications waiting to be sent.', lambda: sns_dispatcher.stats()['queue_depth'])
 
 # ---------------------------------------------------------
 # AWS Helper Functions
 # ---------------------------------------------------------
 def send_sns_notification(subject, message):
-    """Sends an email notification via AWS SNS"""
-    try:
-        sns_client.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=message
-        )
-    except ClientError as e:
-        print(f"Error sending SNS: {e}")
+    """Queues an email notification via AWS SNS (sent by a background worker)"""
+    sns_dispatcher.submit(subject, message)
+
+def cart_key():
+    return session['user']['email']
+
+def current_cart():
+    """The logged-in user's {str_id: qty}, read once per request."""
+    if 'cart' not in g:
+        g.cart = cart_service.items(cart_key()) if 'user' in session else {}
+    return g.cart
+
+app.add_template_global(current_cart, 'current_cart')
+
+def get_search_index():
+    if not search_index.built:
+        with _search_build_lock:
+            if not search_index.built:
+                search_index.build(catalog.all())
+    return search_index
+
+# Each cart line is a stock decrement; the last call also puts the order item
+LINES_PER_TRANSACTION = TRANSACT_ITEMS_LIMIT - 1
+
+def _stock_action(line, sign):
+    action = {
+        'TableName': books_table.name,
+        'Key': {'id': line.book_id},
+        'UpdateExpression': f"set stock = stock {sign} :q",
+        'ExpressionAttributeValues': {':q': line.quantity},
+    }
+    if sign == '-':
+        # Conditional decrement: concurrent buyers can never oversell
+        action['ConditionExpression'] = "attribute_exists(id) AND stock >= :q"
+        action['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+    return {'Update': action}
+
+def _restore_stock(lines):
+    """Undoes already committed chunks when a later chunk is cancelled."""
+    client = books_table.meta.client
+    for chunk in chunked(lines, TRANSACT_ITEMS_LIMIT):
+        try:
+            transact_write(client, [_stock_action(line, '+') for line in chunk])
+        except (ClientError, TransactionCancelled) as e:
+            print(f"Error rolling back checkout: {e}")
+
+def place_order(user, cart, books_by_id):
+    """Decrements stock for every cart line and writes one Orders item
+    (with all the lines) in TransactWriteItems calls: one call for carts
+    up to LINES_PER_TRANSACTION lines.
+
+    Returns (order, failed_lines). order is None when nothing was placed;
+    failed_lines lists every cart line whose stock condition failed, with
+    the stock that was actually left.
+    """
+    lines = [OrderLine(str_id, books_by_id[str_id]['title'], quantity, books_by_id[str_id]['price'])
+             for str_id, quantity in cart.items() if str_id in books_by_id]
+    if not lines:
+        return None, []
+    order = Order(str(uuid.uuid4()), user['email'], user['name'], time.time(), lines)
+
+    client = books_table.meta.client
+    chunks = list(chunked(lines, LINES_PER_TRANSACTION))
+    committed = []
+    for n, chunk in enumerate(chunks):
+        actions = [_stock_action(line, '-') for line in chunk]
+        if n == len(chunks) - 1:
+            actions.append({'Put': {'TableName': orders_table.name, 'Item': order_to_item(order)}})
+        try:
+            transact_write(client, actions)
+        except TransactionCancelled as e:
+            failed_lines = []
+            for i, line in enumerate(chunk):
+                reason = e.reasons[i] if i < len(e.reasons) else {}
+                if reason.get('Code') == 'ConditionalCheckFailed':
+                    stock_left = int(reason.get('Item', {}).get('stock', 0))
+                    failed_lines.append({'book': books_by_id[line.book_id], 'quantity': line.quantity, 'stock': stock_left})
+            if committed:
+                _restore_stock(committed)
+            # [None] = cancelled for another reason (e.g. TransactionConflict)
+            return None, failed_lines or [None]
+        committed.extend(chunk)
+    return order, []
 
 # ---------------------------------------------------------
 # Core Routes
 # ---------------------------------------------------------
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # index.html shows Login/Register only to visitors: cache that variant alone
+    if 'user' in session:
+        return render_template('index.html')
+    return render_cache.page(lambda: render_template('index.html'))
 
 @app.route('/about')
 def about():
-    return render_template('about.html', user=session.get('user'))
+    if 'user' in session:
+        return render_template('about.html', user=session['user'])
+    return render_cache.page(lambda: render_template('about.html', user=None))
 
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
+        if not signup_limiter.allow(request.remote_addr):
+            flash('Too many attempts. Please wait a minute and try again.', 'danger')
+            return render_template('signup.html'), 429
         name = request.form['name']
         email = request.form['email']
-        password = generate_password_hash(request.form['password'])
         
-        # AWS: Check if user exists in DynamoDB
+        # AWS: Check if user exists in DynamoDB (before paying for a hash)
         response = users_table.get_item(Key={'email': email})
         if 'Item' in response:
             flash('Email already registered!', 'danger')
             return redirect(url_for('signup'))
+        try:
+            password = password_hasher.hash(request.form['password'])
+        except HasherBusy:
+            flash('Server is busy, please try again.', 'warning')
+            return render_template('signup.html'), 503
         
         # AWS: Add User to DynamoDB
         users_table.put_item(Item={
@@ -88,6 +269,9 @@ def signup():
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
+        if not login_limiter.allow(request.remote_addr):
+            flash('Too many attempts. Please wait a minute and try again.', 'danger')
+            return render_template('login.html'), 429
         email = request.form['email']
         password = request.form['password']
         
@@ -96,12 +280,22 @@ def login():
         
         if 'Item' in response:
             user = response['Item']
-            if check_password_hash(user['password'], password):
-                session['user'] = user
-                
-                # Reset Cart
-                if 'cart' in session and isinstance(session['cart'], list):
-                    session['cart'] = {}
+            try:
+                valid = password_hasher.verify(user['password'], password)
+            except HasherBusy:
+                flash('Server is busy, please try again.', 'warning')
+                return render_template('login.html'), 503
+            if valid:
+                if password_hasher.needs_rehash(user['password']):
+                    # Hashing policy changed: upgrade the stored hash in the background
+                    password_hasher.rehash_later(password, lambda new_hash: users_table.update_item(
+                        Key={'email': email},
+                        UpdateExpression='set password = :p',
+                        ExpressionAttributeValues={':p': new_hash}
+                    ))
+                session.rotate()
+                # AWS: Only name/email go in the session, never the password hash
+                session['user'] = session_user(user)
                 
                 # Check Admin Role
                 if user['email'] == 'admin@bookbazar.com':
@@ -117,7 +311,6 @@ def login():
 @app.route('/logout')
 def logout():
     session.pop('user', None)
-    session.pop('cart', None)
     flash('Logged out successfully.', 'info')
     return redirect(url_for('index'))
 
@@ -136,54 +329,72 @@ def contact():
 def browse_books():
     if 'user' not in session: return redirect(url_for('login'))
     
-    # AWS: Scan returns all items from DynamoDB
-    response = books_table.scan()
-    books = response.get('Items', [])
+    # AWS: Author / title-prefix filters are GSI queries
+    next_cursor = None
+    if request.args.get('author'):
+        books = catalog.by_author(request.args['author'])
+    elif request.args.get('title'):
+        books = catalog.by_title_prefix(request.args['title'])
+    else:
+        # AWS: One projected, paginated Scan page (follows LastEvaluatedKey via cursor)
+        books, next_cursor = catalog.page(page_size(request.args), request.args.get('cursor'))
     
     # Convert Decimal to float/int for display if needed
     # (DynamoDB returns Decimal types, Jinja handles them fine usually)
-    return render_template('browse_books.html', books=books, user=session['user'])
+    return render_cache.conditional(render_template('browse_books.html', books=books, next_cursor=next_cursor, user=session['user']))
+
+@app.route('/search')
+def search():
+    if 'user' not in session: return redirect(url_for('login'))
+    query = request.args.get('q', '').strip()
+    book_ids = get_search_index().search(query, limit=page_size(request.args))
+    # AWS: Hydrate the hits with one BatchGetItem
+    books_by_id = catalog.get_many(book_ids)
+    books = [books_by_id[i] for i in book_ids if i in books_by_id]
+    if request.args.get('format') == 'json':
+        return jsonify([{'id': b['id'], 'title': b['title'], 'author': b['author']} for b in books])
+    return render_cache.conditional(render_template('browse_books.html', books=books, query=query, user=session['user']))
+
+@app.route('/covers/<path:filename>')
+def cover(filename):
+    return image_pipeline.send(filename)
 
 @app.route('/book/<book_id>')
 def book_details(book_id):
     if 'user' not in session: return redirect(url_for('login'))
     
     # AWS: Get specific item using Key
-    # Ensure ID is treated as string since DynamoDB keys are usually strings
-    response = books_table.get_item(Key={'id': str(book_id)})
-    book = response.get('Item')
+    book = catalog.get(book_id)
     
     if not book:
         flash('Book not found.', 'danger')
         return redirect(url_for('browse_books'))
         
-    return render_template('book_details.html', book=book, user=session['user'])
+    return render_cache.conditional(render_template('book_details.html', book=book, user=session['user']))
 
 @app.route('/add_to_cart/<book_id>', methods=['POST'])
 def add_to_cart(book_id):
     if 'user' not in session: return redirect(url_for('login'))
-    if 'cart' not in session or isinstance(session['cart'], list): session['cart'] = {}
     
-    # AWS: Check Stock in DynamoDB
-    response = books_table.get_item(Key={'id': str(book_id)})
-    book = response.get('Item')
+    book = catalog.get(book_id)
     
     if not book: 
         flash('Book not found', 'danger')
         return redirect(url_for('browse_books'))
 
-    cart = session['cart']
-    str_id = str(book_id)
-    current_qty = cart.get(str_id, 0)
-    
     # Logic: DynamoDB uses Decimals, cast to int for comparison
     stock_available = int(book.get('stock', 0))
     
-    if current_qty + 1 > stock_available:
+    # AWS: Conditional write on the cart version; the stock check is
+    # re-applied if a concurrent request changed the cart first
+    try:
+        added = cart_service.add(cart_key(), book_id, 1, max_quantity=stock_available)
+    except CartConflict:
+        flash('Your cart is busy, please try again.', 'warning')
+        return redirect(request.referrer or url_for('browse_books'))
+    if added is None:
         flash(f'Sorry, only {stock_available} copies available!', 'warning')
     else:
-        cart[str_id] = current_qty + 1
-        session['cart'] = cart
         flash('Cart updated! 🛒', 'success')
         
     return redirect(request.referrer or url_for('browse_books'))
@@ -191,12 +402,12 @@ def add_to_cart(book_id):
 @app.route('/decrease_cart/<book_id>', methods=['POST'])
 def decrease_cart(book_id):
     if 'user' not in session: return redirect(url_for('login'))
-    cart = session.get('cart', {})
-    str_id = str(book_id)
-    if str_id in cart:
-        if cart[str_id] > 1: cart[str_id] -= 1
-        else: del cart[str_id]
-    session['cart'] = cart
+    if str(book_id) in current_cart():
+        try:
+            cart_service.add(cart_key(), book_id, -1)
+        except CartConflict:
+            flash('Your cart is busy, please try again.', 'warning')
+            return redirect(request.referrer or url_for('browse_books'))
     flash('Cart updated.', 'info')
     return redirect(request.referrer or url_for('browse_books'))
 
@@ -204,86 +415,73 @@ def decrease_cart(book_id):
 def view_cart():
     if 'user' not in session: return redirect(url_for('login'))
     
-    cart = session.get('cart', {})
-    cart_items = []
-    grand_total = 0
-    
-    # AWS: Must fetch details for every ID in the cart
-    for str_id, quantity in cart.items():
-        response = books_table.get_item(Key={'id': str_id})
-        book = response.get('Item')
-        
-        if book:
-            price = float(book['price'])
-            line_total = price * quantity
-            grand_total += line_total
-            
-            # Inject float price for template math
-            book['price'] = price 
-            cart_items.append({'book': book, 'quantity': quantity, 'line_total': round(line_total, 2)})
-            
-    return render_template('cart.html', cart_items=cart_items, grand_total=round(grand_total, 2))
+    # AWS: One get_item for the cached priced summary; books are only
+    # re-read (one BatchGetItem) after the cart or a book in it changed
+    summary = cart_service.summary(cart_key())
+    return render_template('cart.html', cart_items=summary['lines'], grand_total=summary['grand_total'])
+
+@app.route('/cart/summary')
+def cart_summary():
+    if 'user' not in session: return jsonify({'count': 0, 'total': 0})
+    summary = cart_service.summary(cart_key())
+    return jsonify({'count': summary['count'], 'total': summary['grand_total']})
 
 @app.route('/remove_from_cart/<book_id>')
 def remove_from_cart(book_id):
-    if 'cart' in session:
-        cart = session['cart']
-        str_id = str(book_id)
-        if isinstance(cart, dict) and str_id in cart:
-            del cart[str_id]
-            session['cart'] = cart
-            flash('Item removed from cart.', 'warning')
+    if 'user' not in session: return redirect(url_for('login'))
+    if str(book_id) in current_cart():
+        try:
+            cart_service.set_quantity(cart_key(), book_id, 0)
+        except CartConflict:
+            flash('Your cart is busy, please try again.', 'warning')
+            return redirect(url_for('view_cart'))
+        flash('Item removed from cart.', 'warning')
     return redirect(url_for('view_cart'))
 
 @app.route('/checkout', methods=['POST'])
 def checkout():
     if 'user' not in session: return redirect(url_for('login'))
-    cart = session.get('cart', {})
+    cart = current_cart()
     if not cart: 
         flash('Your cart is empty!', 'danger')
         return redirect(url_for('browse_books'))
     
-    # 1. Validation Loop (Check Stock against DynamoDB)
-    for str_id, quantity in cart.items():
-        response = books_table.get_item(Key={'id': str_id})
-        book = response.get('Item')
-        if book and quantity > int(book.get('stock', 0)):
-            flash(f"Error: Not enough stock for '{book['title']}'. Only {book['stock']} left.", 'danger')
-            return redirect(url_for('view_cart'))
+    # 1. Load every cart book fresh (titles / prices for the order lines)
+    books_by_id = catalog.get_many(cart.keys())
 
-    # 2. Processing Loop (Update Stock & Create Order in DynamoDB)
-    for str_id, quantity in cart.items():
-        # A. Atomic Update: Decrease Stock
-        books_table.update_item(
-            Key={'id': str_id},
-            UpdateExpression="set stock = stock - :q",
-            ExpressionAttributeValues={':q': quantity}
-        )
-        
-        # Fetch book data for receipt
-        response = books_table.get_item(Key={'id': str_id})
-        book = response['Item']
-        
-        # B. Create Order ID (UUID)
-        order_id = str(uuid.uuid4())
-        
-        # C. Save Order to DynamoDB
-        orders_table.put_item(Item={
-            'order_id': order_id,
-            'user_id': session['user']['email'],
-            'user_name': session['user']['name'], # Saved for Admin view
-            'book_title': book['title'],
-            'price': book['price'], 
-            'quantity': quantity,
-            'status': 'Pending',
-            'order_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
-        
-        # D. AWS SNS Notification
-        msg_body = f"Order Received!\nUser: {session['user']['name']}\nItem: {book['title']}\nQty: {quantity}"
+    # 2. One conditional transaction: stock >= qty checks, decrements and the order insert
+    order, failed_lines = place_order(session['user'], cart, books_by_id)
+    if failed_lines:
+        for line in failed_lines:
+            if line is None:
+                flash('Checkout could not be completed, please try again.', 'danger')
+            else:
+                flash(f"Error: Not enough stock for '{line['book']['title']}'. Only {line['stock']} left.", 'danger')
+        return redirect(url_for('view_cart'))
+
+    # 3. AWS SNS Notification (one message for the whole order, sent by a background worker)
+    if order:
+        lines = "\n".join(f"- {line.title} x {line.quantity}" for line in order.lines)
+        msg_body = f"Order Received!\nUser: {order.user_name}\nItems:\n{lines}"
         send_sns_notification("BookBazar: New Order", msg_body)
 
-    session.pop('cart', None)
+    # 4. Follow-up writes: the counters in parallel with clearing the cart and
+    # bumping the catalog version (other carts re-price when next viewed)
+    def record_stats():
+        # Dashboard counters (outside the transaction so checkouts don't contend on one item)
+        try:
+            stats.record_orders(1, float(order.total), order.units)
+        except ClientError as e:
+            print(f"Error updating stats: {e}")
+
+    def clear_and_bump():
+        cart_service.clear(cart_key())
+        try:
+            render_cache.bump()
+        except ClientError as e:
+            print(f"Error bumping the catalog version: {e}")
+
+    fanout.run(clear_and_bump, *([record_stats] if order else []))
     flash('Order placed successfully!', 'success')
     return redirect(url_for('my_orders'))
 
@@ -291,16 +489,11 @@ def checkout():
 def my_orders():
     if 'user' not in session: return redirect(url_for('login'))
     
-    # AWS: Scan Orders with Filter for current user
-    response = orders_table.scan(
-        FilterExpression=Attr('user_id').eq(session['user']['email'])
-    )
-    user_orders = response.get('Items', [])
-    
-    # Sort orders by date (newest first)
-    user_orders.sort(key=lambda x: x['order_date'], reverse=True)
+    # AWS: Query the user_id/order_date GSI, newest first, one page at a time
+    user_orders, next_cursor = order_store.page_for_user(session['user']['email'], page_size(request.args), request.args.get('cursor'))
+    page_total = round(sum(float(o.total) for o in user_orders), 2)
     
-    return render_template('my_orders.html', orders=user_orders)
+    return render_template('my_orders.html', orders=user_orders, page_total=page_total, next_cursor=next_cursor)
 
 # ---------------------------------------------------------
 # Admin Routes
@@ -310,21 +503,22 @@ def admin_dashboard():
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com':
         return redirect(url_for('index'))
     
-    # AWS: Fetch all data for Dashboard
-    books = books_table.scan().get('Items', [])
-    orders = orders_table.scan().get('Items', [])
-    orders.sort(key=lambda x: x['order_date'], reverse=True)
-    
-    # Calculate Stats
-    total_sales = sum(float(o['price']) * int(o.get('quantity', 1)) for o in orders)
-    total_stock = sum(int(b.get('stock', 0)) for b in books)
+    # AWS: One GetItem for the totals, one page each of recent orders and books, in parallel
+    totals, (orders, orders_cursor), (books, books_cursor) = fanout.run(
+        stats.snapshot,
+        lambda: order_store.recent(page_size(request.args), request.args.get('orders_cursor')),
+        lambda: catalog.page(page_size(request.args), request.args.get('books_cursor')),
+    )
     
     return render_template('admin_dashboard.html', 
                            books=books, 
                            orders=orders, 
-                           total_sales=round(total_sales, 2), 
-                           total_orders=len(orders), 
-                           total_stock=total_stock, 
+                           orders_cursor=orders_cursor,
+                           books_cursor=books_cursor,
+                           total_sales=totals['total_sales'], 
+                           total_orders=totals['total_orders'], 
+                           total_stock=totals['total_stock'], 
+                           status_counts=totals['status_counts'],
                            user=session['user'])
 
 @app.route('/admin/update_order/<order_id>', methods=['POST'])
@@ -335,33 +529,121 @@ def update_order_status(order_id):
     
     # AWS: Update Item Status in DynamoDB
     # We use order_id as string because we saved it as string UUID
-    orders_table.update_item(
-        Key={'order_id': str(order_id)},
-        UpdateExpression="set #s = :status",
-        ExpressionAttributeNames={'#s': 'status'}, # 'status' is a reserved keyword
-        ExpressionAttributeValues={':status': new_status}
-    )
+    try:
+        response = orders_table.update_item(
+            Key={'order_id': str(order_id)},
+            UpdateExpression="set #s = :status",
+            ConditionExpression="attribute_exists(order_id)",
+            ExpressionAttributeNames={'#s': 'status'}, # 'status' is a reserved keyword
+            ExpressionAttributeValues={':status': new_status},
+            ReturnValues='UPDATED_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        flash('Order not found.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    stats.status_changed(response.get('Attributes', {}).get('status'), new_status)
             
     flash(f'Order updated to {new_status}.', 'success')
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/orders/export')
+def export_orders():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    # ?format=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD&status=Pending,Shipped
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        order_filter = OrderFilter.from_args(request.args)
+    except InvalidFilter as e:
+        return jsonify({'error': str(e)}), 400
+    # AWS: Parallel segmented Scan streamed straight into the response
+    orders = order_store.iter_orders(order_filter, segments=ORDER_EXPORT_SEGMENTS)
+    filename = f"orders-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(export_chunks(orders, fmt)), mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/admin/orders/report')
+def orders_report():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    try:
+        order_filter = OrderFilter.from_args(request.args)
+    except InvalidFilter as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(sales_report(order_store.iter_orders(order_filter, segments=ORDER_EXPORT_SEGMENTS)))
+
+@app.route('/admin/jobs')
+def admin_jobs():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    return jsonify({'jobs': job_queue.recent(page_size(request.args)), 'stats': job_queue.stats()})
+
+@app.route('/admin/jobs/<job_id>')
+def admin_job_status(job_id):
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/admin/images/reclaim', methods=['POST'])
+def reclaim_images():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    # legacy=1 also removes unreferenced covers uploaded before content-hash names
+    job_id = cover_jobs.reclaim(include_legacy=request.form.get('legacy') == '1')
+    return jsonify({'job_id': job_id}), 202
+
+@app.route('/admin/stats')
+def admin_stats():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    return jsonify({'dashboard': stats.snapshot(), 'notifications': sns_dispatcher.stats(), 'aws_pools': aws_clients.pool_stats(), 'search': search_index.stats(), 'jobs': job_queue.stats(), 'sessions': app.session_interface.stats(), 'carts': cart_service.stats(),
+                    'passwords': password_hasher.stats(), 'login_rate_limit': login_limiter.stats(), 'signup_rate_limit': signup_limiter.stats(),
+                    'render_cache': render_cache.stats(), 'fanout': fanout.stats()})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    is_admin = 'user' in session and session['user']['email'] == 'admin@bookbazar.com'
+    if not metrics.metrics_allowed(is_admin): return 'Forbidden', 403
+    return metrics.REGISTRY.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
+    if request.method == 'POST':
+        # endpoints=browse_books,checkout&rate=0.05 (empty endpoints turns it off)
+        endpoints = [e.strip() for e in request.form.get('endpoints', '').split(',') if e.strip()]
+        profiler.configure(endpoints, float(request.form.get('rate', profiler.rate)))
+        if request.form.get('reset') == '1':
+            profiler.reset()
+        return jsonify(profiler.status())
+    if request.args.get('endpoint'):
+        report = profiler.report(request.args['endpoint'], sort=request.args.get('sort', 'cumulative'))
+        if report is None:
+            return jsonify({'error': 'no samples for this endpoint'}), 404
+        return report, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return jsonify(profiler.status())
+
 @app.route('/admin/add', methods=['GET', 'POST'])
 def add_book():
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
     if request.method == 'POST':
         image_filename = 'default_book.jpg'
+        staged_upload = None
         if 'image' in request.files:
             file = request.files['image']
             if file.filename != '':
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_filename = filename
+                try:
+                    staged_upload = cover_jobs.stage(file)
+                except InvalidImage as e:
+                    flash(str(e), 'danger')
+                    return render_template('book_form.html', action='Add', book=request.form)
 
         # AWS: Generate UUID for new Book ID
         new_id = str(uuid.uuid4())
         
         # AWS: Put Item in DynamoDB
-        books_table.put_item(Item={
+        new_book = {
             'id': new_id, 
             'title': request.form['title'], 
             'author': request.form['author'], 
@@ -369,7 +651,15 @@ def add_book():
             'description': request.form['description'],
             'stock': int(request.form['stock']),
             'image': image_filename
-        })
+        }
+        catalog.put(new_book)
+        stats.adjust_stock(int(request.form['stock']))
+        if search_index.built:
+            search_index.add(new_book)
+        render_cache.bump()
+        if staged_upload:
+            # Cover is resized in the background and attached when ready
+            cover_jobs.submit(new_id, staged_upload)
         
         flash('Book added successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
@@ -380,20 +670,23 @@ def edit_book(book_id):
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
     
     # AWS: Get current data
-    response = books_table.get_item(Key={'id': str(book_id)})
-    book = response.get('Item')
+    book = catalog.get(book_id)
+    if not book: return redirect(url_for('admin_dashboard'))
     
     if request.method == 'POST':
         image_filename = book.get('image', 'default_book.jpg')
+        staged_upload = None
         if 'image' in request.files:
             file = request.files['image']
             if file.filename != '':
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_filename = filename
+                try:
+                    staged_upload = cover_jobs.stage(file)
+                except InvalidImage as e:
+                    flash(str(e), 'danger')
+                    return render_template('book_form.html', action='Edit', book=book)
         
         # AWS: Overwrite Item in DynamoDB
-        books_table.put_item(Item={
+        updated = {
             'id': str(book_id),
             'title': request.form['title'], 
             'author': request.form['author'], 
@@ -401,7 +694,14 @@ def edit_book(book_id):
             'description': request.form['description'],
             'stock': int(request.form['stock']),
             'image': image_filename
-        })
+        }
+        catalog.put(updated)
+        stats.adjust_stock(int(request.form['stock']) - int(book.get('stock', 0)))
+        if search_index.built:
+            search_index.add(updated)
+        render_cache.bump()
+        if staged_upload:
+            cover_jobs.submit(book_id, staged_upload)
         
         flash('Book updated successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
@@ -413,7 +713,13 @@ def delete_book(book_id):
     if 'user' not in session or session['user']['email'] != 'admin@bookbazar.com': return redirect(url_for('index'))
     
     # AWS: Delete Item from DynamoDB
-    books_table.delete_item(Key={'id': str(book_id)})
+    deleted = catalog.delete(book_id)
+    if deleted:
+        stats.adjust_stock(-int(deleted.get('stock', 0)))
+        search_index.remove(book_id)
+        render_cache.bump()
+        # Deleted in the background once no other book shares the cover
+        cover_jobs.reclaim([deleted.get('image')])
     
     flash('Book deleted successfully!', 'warning')
     return redirect(url_for('admin_dashboard'))
@@ -0,0 +1,147 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+import metrics
+
+# ---------------------------------------------------------
+# boto3 Client Factory (lazy, shared, tuned)
+# ---------------------------------------------------------
+# Size the HTTP pool to the number of threads that can call AWS at once
+# (WSGI worker threads + fan-out workers), or requests queue for a socket.
+MAX_POOL_CONNECTIONS = int(os.environ.get(
+    'AWS_MAX_POOL_CONNECTIONS',
+    int(os.environ.get('WSGI_THREADS', 16)) + int(os.environ.get('FANOUT_WORKERS', 16))))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 5))
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 5))
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+_pool_stats = {}
+
+
+def client_config():
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries={'mode': 'adaptive', 'max_attempts': MAX_ATTEMPTS},
+        tcp_keepalive=True,
+    )
+
+
+def endpoint_url(service):
+    """DYNAMODB_ENDPOINT_URL / SNS_ENDPOINT_URL, then AWS_ENDPOINT_URL
+    (DynamoDB Local, moto server). None means the real AWS endpoint."""
+    return os.environ.get(service.upper() + '_ENDPOINT_URL') or os.environ.get('AWS_ENDPOINT_URL') or None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+class _PoolStats:
+    """Counts requests in flight on one service's connection pool."""
+
+    def __init__(self, service):
+        self.service = service
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def before_send(self, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def response_received(self, exception=None, **kwargs):
+        with self._lock:
+            self.in_flight -= 1
+            if exception is not None:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'max_pool_connections': MAX_POOL_CONNECTIONS,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'pool_saturated': self.peak_in_flight >= MAX_POOL_CONNECTIONS,
+                'requests': self.requests,
+                'errors': self.errors,
+            }
+
+
+def _instrument(service, low_level_client):
+    stats = _pool_stats.setdefault(service, _PoolStats(service))
+    events = low_level_client.meta.events
+    events.register('before-send.*', stats.before_send)
+    events.register('response-received.*', stats.response_received)
+    # Per-operation counts / latency for /metrics and Server-Timing
+    metrics.instrument_client(service, low_level_client)
+
+
+def client(service, region_name):
+    """Shared, thread-safe low-level client, created on first use."""
+    key = (service, region_name)
+    if key not in _clients:
+        with _lock:
+            if key not in _clients:
+                c = _get_session().client(service, region_name=region_name,
+                                          endpoint_url=endpoint_url(service), config=client_config())
+                _instrument(service, c)
+                _clients[key] = c
+    return _clients[key]
+
+
+def resource(service, region_name):
+    """Shared service resource (e.g. DynamoDB), created on first use."""
+    key = (service, region_name)
+    if key not in _resources:
+        with _lock:
+            if key not in _resources:
+                r = _get_session().resource(service, region_name=region_name,
+                                            endpoint_url=endpoint_url(service), config=client_config())
+                _instrument(service, r.meta.client)
+                _resources[key] = r
+    return _resources[key]
+
+
+class _Lazy:
+    """Proxy that builds the real boto3 object on first attribute access, so
+    importing the app (or serving routes that never touch AWS) is free."""
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_target', None)
+
+    def _resolve(self):
+        target = object.__getattribute__(self, '_target')
+        if target is None:
+            target = object.__getattribute__(self, '_factory')()
+            object.__setattr__(self, '_target', target)
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def lazy_client(service, region_name):
+    return _Lazy(lambda: client(service, region_name))
+
+
+def lazy_table(name, region_name):
+    return _Lazy(lambda: resource('dynamodb', region_name).Table(name))
+
+
+def pool_stats():
+    return {service: stats.snapshot() for service, stats in _pool_stats.items()}
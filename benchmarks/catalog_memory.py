@@ -0,0 +1,81 @@
+import os
+import sys
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import datagen
+from columnar import ColumnarCatalog
+
+# ---------------------------------------------------------
+# Catalog Memory Benchmark (list of dicts vs. columnar)
+# ---------------------------------------------------------
+# python benchmarks/catalog_memory.py 100k 1m
+# Heap size is what tracemalloc still holds once the structure is built from
+# freshly parsed books (as json.load returns them) and the parsed list is
+# dropped. Columnar descriptions live in an mmap'd file, reported separately:
+# the OS can page them out. Build time excludes tracing overhead.
+LOOKUPS = 100000
+
+
+def build_dicts(books):
+    """What CatalogCache holds with CATALOG_LAYOUT=dicts."""
+    return books, {str(b['id']): b for b in books}
+
+
+def build_columnar(books):
+    catalog = ColumnarCatalog(books)
+    return catalog, catalog
+
+
+def measure(build, count):
+    books = list(datagen.books(count))
+    started = time.perf_counter()
+    build(books)
+    build_seconds = time.perf_counter() - started
+    del books
+    gc.collect()
+
+    tracemalloc.start()
+    books = list(datagen.books(count))
+    structure = build(books)
+    del books
+    gc.collect()
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    _, by_id = structure
+    rng = random.Random(1)
+    ids = [str(rng.randint(1, count)) for _ in range(LOOKUPS)]
+    started = time.perf_counter()
+    for book_id in ids:
+        book = by_id.get(book_id)
+        book['title'], book['price'], book['stock']
+    lookup_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+    mapped = structure[0].stats()['description_bytes'] if isinstance(structure[0], ColumnarCatalog) else 0
+    return {'heap': heap, 'mapped': mapped, 'build': build_seconds, 'lookup_us': lookup_us}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Catalog memory: list of dicts vs columnar')
+    parser.add_argument('scales', nargs='*', default=['100k', '1m'], help='1k, 10k, 100k, 1m or a number')
+    args = parser.parse_args(argv)
+
+    print(f"{'books':>9}{'layout':>10}{'heap MB':>10}{'B/book':>9}{'mmap MB':>10}{'build s':>9}{'get+3 fields us':>17}")
+    for scale in args.scales:
+        count = datagen.scale(scale)
+        results = {}
+        for layout, build in (('dicts', build_dicts), ('columnar', build_columnar)):
+            r = results[layout] = measure(build, count)
+            print(f"{count:>9}{layout:>10}{r['heap'] / 2**20:>10.1f}{r['heap'] / count:>9.0f}"
+                  f"{r['mapped'] / 2**20:>10.1f}{r['build']:>9.2f}{r['lookup_us']:>17.2f}")
+        print(f"📉 {count} books: columnar heap is {results['columnar']['heap'] / results['dicts']['heap']:.0%} of dicts")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import os
+import sys
+import uuid
+import random
+from decimal import Decimal
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import index_attributes
+from orders import Order, OrderLine, order_to_item
+
+# ---------------------------------------------------------
+# Synthetic Catalog / Order Generators
+# ---------------------------------------------------------
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+_WORDS = ('river', 'shadow', 'empire', 'garden', 'silent', 'winter', 'golden', 'machine', 'ocean',
+          'letters', 'midnight', 'forgotten', 'city', 'history', 'secret', 'stars', 'kingdom', 'glass',
+          'journey', 'fire', 'house', 'mountain', 'little', 'last', 'light', 'war', 'song', 'road')
+_FIRST = ('Ada', 'James', 'Maya', 'Leo', 'Nora', 'Omar', 'Iris', 'Hugo', 'Zara', 'Felix', 'Ines', 'Theo')
+_LAST = ('Okafor', 'Lindqvist', 'Moreau', 'Tanaka', 'Silva', 'Novak', 'Haddad', 'Brennan', 'Kowalski', 'Reyes')
+
+
+def scale(value):
+    """'1k' / '100k' / '1m' or a plain number -> int."""
+    return SCALES.get(str(value).lower()) or int(value)
+
+
+def books(count, seed=42):
+    """Yields `count` books with ids 1..count. Stock is large, so benchmark
+    checkouts never run out."""
+    rng = random.Random(seed)
+    authors = [f'{rng.choice(_FIRST)} {rng.choice(_LAST)}' for _ in range(max(1, count // 20))]
+    for book_id in range(1, count + 1):
+        title = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(2, 4))).title()
+        yield {
+            'id': book_id,
+            'title': f'{title} {book_id}',
+            'author': rng.choice(authors),
+            'price': round(rng.uniform(3, 60), 2),
+            'description': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(20, 60))).capitalize() + '.',
+            'stock': 1000000,
+            'image': 'default_book.jpg',
+        }
+
+
+def orders(count, users, book_count, seed=7, days=30, user_key='id'):
+    """Yields `count` Orders of 1-3 lines by `users` ([{id, email, name}])
+    over the last `days` days, oldest first. user_key picks the user_id."""
+    rng = random.Random(seed)
+    start = (datetime.now() - timedelta(days=days)).timestamp()
+    step = days * 86400 / max(1, count)
+    for i in range(count):
+        user = rng.choice(users)
+        lines = []
+        for book_id in {rng.randint(1, book_count) for _ in range(rng.randint(1, 3))}:
+            lines.append(OrderLine(str(book_id), f'Book {book_id}', rng.randint(1, 3), round(rng.uniform(3, 60), 2)))
+        yield Order(None, user[user_key], user['name'], int(start + step * i), lines,
+                    rng.choice(('Pending', 'Pending', 'Shipped', 'Delivered')))
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------------------------------------------------
+# Loaders
+# ---------------------------------------------------------
+def seed_sqlite(db_path, book_count, order_count, users):
+    """Fills a fresh app.py database. `users` are (name, email, password_hash)."""
+    import sqlite_store
+    db = sqlite_store.Database(db_path)
+    catalog = sqlite_store.SqliteCatalogStore(db)
+    stats = sqlite_store.SqliteStats(db)
+    user_store = sqlite_store.SqliteUserStore(db)
+    order_store = sqlite_store.SqliteOrderStore(db)
+    for chunk in _chunks(books(book_count), 5000):
+        catalog.put_many(chunk)
+    stats.adjust_stock(book_count * 1000000)
+    accounts = [user_store.add(*user) or user_store.get_by_email(user[1]) for user in users]
+    for chunk in _chunks(orders(order_count, accounts, book_count), 5000):
+        order_store.add_many(chunk)
+        totals = {'total_orders': len(chunk), 'total_sales': sum(o.total for o in chunk)}
+        for o in chunk:
+            totals['status_' + o.status] = totals.get('status_' + o.status, 0) + 1
+        stats._add(totals)
+    return db
+
+
+def seed_dynamo(dynamodb, book_count, order_count, users):
+    """Fills Books, Users and Orders (tables from create_tables.py).
+    `users` are (name, email, password_hash)."""
+    from stats import DynamoStats
+    books_table = dynamodb.Table('Books')
+    with books_table.batch_writer() as batch:
+        for book in books(book_count):
+            book = dict(book, id=str(book['id']), price=Decimal(str(book['price'])))
+            book.update(index_attributes(book))
+            batch.put_item(Item=book)
+    users_table = dynamodb.Table('Users')
+    accounts = []
+    for name, email, password in users:
+        role = 'admin' if email == 'admin@bookbazar.com' else 'customer'
+        users_table.put_item(Item={'email': email, 'name': name, 'password': password, 'role': role})
+        accounts.append({'email': email, 'name': name})
+    with dynamodb.Table('Orders').batch_writer() as batch:
+        for o in orders(order_count, accounts, book_count, user_key='email'):
+            o.order_id = str(uuid.uuid4())
+            for line in o.lines:
+                line.unit_price = Decimal(str(line.unit_price))
+            batch.put_item(Item=order_to_item(o))
+    DynamoStats(dynamodb.Table('Stats')).rebuild(books_table, dynamodb.Table('Orders'))
+
+
+def seed_json(path, book_count):
+    """Writes a books.json catalog (the app.py JSON backend)."""
+    import json
+    with open(path, 'w') as file:
+        json.dump(list(books(book_count)), file)
+
+
+if __name__ == '__main__':
+    # python benchmarks/datagen.py books.json 100k
+    path = sys.argv[1] if len(sys.argv) > 1 else 'books.json'
+    count = scale(sys.argv[2] if len(sys.argv) > 2 else '1k')
+    print(f"📦 Writing {count} synthetic books to {path}...")
+    seed_json(path, count)
+    print("🎉 Done!")
@@ -0,0 +1,67 @@
+import os
+import uuid
+import random
+from locust import HttpUser, task, between
+
+# ---------------------------------------------------------
+# HTTP Load Test (locust -f benchmarks/locustfile.py --host http://127.0.0.1:5000)
+# ---------------------------------------------------------
+# Run against app.py / app_aws.py started on a catalog of BENCH_CATALOG_SIZE
+# books with ids 1..N (python benchmarks/datagen.py books.json 100k, or
+# benchmarks/run.py's seeding for DynamoDB Local). Locust reports the
+# per-route percentiles; routes are named so the ids don't split them.
+# Start the app with LOGIN_RATE_BURST raised: every simulated user logs in
+# from the same IP.
+CATALOG_SIZE = int(os.environ.get('BENCH_CATALOG_SIZE', 20))
+ADMIN_EMAIL = os.environ.get('BENCH_ADMIN_EMAIL', 'admin@bookbazar.com')
+ADMIN_PASSWORD = os.environ.get('BENCH_ADMIN_PASSWORD', 'admin123')
+SEARCH_TERMS = ('river', 'shadow', 'garden', 'winter', 'ocean', 'city', 'stars', 'journey')
+
+
+def _book_id():
+    return random.randint(1, CATALOG_SIZE)
+
+
+class Shopper(HttpUser):
+    weight = 20
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        email = f'load-{uuid.uuid4().hex[:12]}@example.com'
+        self.client.post('/signup', data={'name': 'Load Test', 'email': email, 'password': 'load-password'}, name='signup')
+        self.client.post('/login', data={'email': email, 'password': 'load-password'}, name='login')
+
+    @task(6)
+    def browse(self):
+        self.client.get('/browse', name='browse')
+
+    @task(3)
+    def search(self):
+        self.client.get('/search?q=' + random.choice(SEARCH_TERMS), name='search')
+
+    @task(4)
+    def book_details(self):
+        self.client.get(f'/book/{_book_id()}', name='book_details')
+
+    @task(2)
+    def add_and_view_cart(self):
+        self.client.post(f'/add_to_cart/{_book_id()}', name='add_to_cart')
+        self.client.get('/cart', name='view_cart')
+
+    @task(1)
+    def checkout(self):
+        self.client.post(f'/add_to_cart/{_book_id()}', name='add_to_cart')
+        self.client.post('/checkout', name='checkout')
+        self.client.get('/my_orders', name='my_orders')
+
+
+class Admin(HttpUser):
+    weight = 1
+    wait_time = between(2, 5)
+
+    def on_start(self):
+        self.client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}, name='login')
+
+    @task
+    def dashboard(self):
+        self.client.get('/admin', name='admin_dashboard')
@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import datagen
+
+# ---------------------------------------------------------
+# Shop Flow Benchmark (in-process, against local stand-ins)
+# ---------------------------------------------------------
+# Drives app.py (SQLite / JSON backend) or app_aws.py (moto, or DynamoDB Local
+# with --dynamodb-endpoint) through the shop flows with Flask's test client,
+# so timings are server-side only: no network or HTTP parsing noise. For
+# load over real HTTP, see benchmarks/locustfile.py.
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+PASSWORD = 'bench-password'
+ADMIN_EMAIL = 'admin@bookbazar.com'
+# p95 changes smaller than this are noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+
+class Recorder:
+    """Per-route latencies and backend-call counts."""
+
+    def __init__(self, backend_calls):
+        self.backend_calls = backend_calls
+        self.samples = {}
+        self.errors = {}
+        self.enabled = True
+
+    def call(self, route, fn, *args, **kwargs):
+        calls_before = self.backend_calls()
+        started = time.perf_counter()
+        response = fn(*args, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        calls = self.backend_calls() - calls_before
+        if self.enabled:
+            self.samples.setdefault(route, []).append((elapsed, calls))
+            if response.status_code >= 400:
+                self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder):
+    summary = {}
+    for route, samples in recorder.samples.items():
+        latencies = sorted(ms for ms, _ in samples)
+        summary[route] = {
+            'count': len(samples),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'backend_calls': round(sum(calls for _, calls in samples) / len(samples), 2),
+            'errors': recorder.errors.get(route, 0),
+        }
+    return summary
+
+
+# ---------------------------------------------------------
+# App Setup
+# ---------------------------------------------------------
+def _bench_env():
+    os.environ.setdefault('IMAGE_WORKERS', '0')
+    os.environ.setdefault('LOGIN_RATE_BURST', '1000000')
+    os.environ.setdefault('SNS_FAKE', '1')
+
+
+def _users(count, password_hash):
+    users = [('Admin', ADMIN_EMAIL, password_hash)]
+    users += [(f'Bench User {i}', f'bench{i}@example.com', password_hash) for i in range(count)]
+    return users
+
+
+def load_app(args, workdir):
+    """Seeds the backend, imports the app module and returns
+    (module, backend_calls) where backend_calls() is a running count of
+    SQL statements or AWS requests."""
+    _bench_env()
+    os.chdir(workdir)
+    from passwords import PasswordHasher
+    users = _users(args.users, PasswordHasher().hash(PASSWORD))
+
+    if args.app == 'app':
+        os.environ['BOOKBAZAR_STORAGE'] = args.storage
+        if args.storage == 'sqlite':
+            os.environ['BOOKBAZAR_DB'] = os.path.join(workdir, 'bench.db')
+            datagen.seed_sqlite(os.environ['BOOKBAZAR_DB'], args.books, args.orders, users)
+        else:
+            datagen.seed_json(os.path.join(workdir, 'books.json'), args.books)
+        import app as module
+        if args.storage != 'sqlite':
+            for name, email, password in users:
+                module.user_store.add(name, email, password)
+            return module, lambda: 0
+        counter = [0]
+        module.db.connection().set_trace_callback(lambda sql: counter.__setitem__(0, counter[0] + 1))
+        return module, lambda: counter[0]
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    if args.fanout_workers is not None:
+        os.environ['FANOUT_WORKERS'] = str(args.fanout_workers)
+    if args.dynamodb_endpoint:
+        os.environ['DYNAMODB_ENDPOINT_URL'] = args.dynamodb_endpoint
+    else:
+        from moto import mock_aws
+        mock_aws().start()
+    import aws_clients
+    import create_tables
+    dynamodb = aws_clients.resource('dynamodb', 'us-east-1')
+    create_tables.create_all(dynamodb)
+    if not args.no_seed:
+        datagen.seed_dynamo(dynamodb, args.books, args.orders, users)
+    import app_aws as module
+    if args.latency_ms:
+        add_latency(dynamodb.meta.client, args.latency_ms / 1000)
+
+    def backend_calls():
+        return sum(stats['requests'] for stats in aws_clients.pool_stats().values())
+    return module, backend_calls
+
+
+def add_latency(low_level_client, seconds):
+    """Sleeps before every request, as a stand-in for the network round
+    trip to DynamoDB that moto and DynamoDB Local don't have."""
+    def delay(**kwargs):
+        time.sleep(seconds)
+    low_level_client.meta.events.register('before-send.*', delay)
+
+
+# ---------------------------------------------------------
+# Flows
+# ---------------------------------------------------------
+def login(recorder, client, email):
+    response = recorder.call('login', client.post, '/login', data={'email': email, 'password': PASSWORD})
+    assert response.status_code == 302, f'login failed for {email}'
+
+
+def shopper_flow(recorder, client, rng, book_count, cart_lines=2):
+    book_ids = [rng.randint(1, book_count) for _ in range(cart_lines)]
+    recorder.call('browse', client.get, '/browse')
+    recorder.call('search', client.get, '/search?q=' + rng.choice(datagen._WORDS))
+    recorder.call('book_details', client.get, f'/book/{book_ids[0]}')
+    for book_id in book_ids:
+        recorder.call('add_to_cart', client.post, f'/add_to_cart/{book_id}')
+    recorder.call('view_cart', client.get, '/cart')
+    recorder.call('checkout', client.post, '/checkout')
+    recorder.call('my_orders', client.get, '/my_orders')
+
+
+def run(module, recorder, args):
+    rng = random.Random(args.seed)
+    admin = module.app.test_client()
+    login(recorder, admin, ADMIN_EMAIL)
+    clients = []
+    for i in range(args.users):
+        client = module.app.test_client()
+        login(recorder, client, f'bench{i}@example.com')
+        clients.append(client)
+
+    recorder.enabled = False
+    for i in range(args.warmup):
+        shopper_flow(recorder, clients[i % len(clients)], rng, args.books, args.cart_lines)
+    recorder.enabled = True
+
+    for i in range(args.iterations):
+        shopper_flow(recorder, clients[i % len(clients)], rng, args.books, args.cart_lines)
+        recorder.call('admin_dashboard', admin.get, '/admin')
+        if i % max(1, args.iterations // args.logins) == 0:
+            # Fresh session: login is measured too, but less often (KDF cost)
+            client = module.app.test_client()
+            login(recorder, client, f'bench{i % args.users}@example.com')
+            clients[i % len(clients)] = client
+
+
+# ---------------------------------------------------------
+# Reporting / Baselines
+# ---------------------------------------------------------
+def print_summary(summary, baseline=None):
+    header = f"{'route':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls':>8}{'errors':>8}"
+    if baseline:
+        header += f"{'p95 vs base':>14}"
+    print(header)
+    for route in sorted(summary):
+        row = summary[route]
+        line = (f"{route:<16}{row['count']:>7}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+                f"{row['p99_ms']:>10.2f}{row['backend_calls']:>8.1f}{row['errors']:>8}")
+        base = (baseline or {}).get(route)
+        if base and base['p95_ms']:
+            line += f"{(row['p95_ms'] / base['p95_ms'] - 1) * 100:>+13.0f}%"
+        print(line)
+
+
+def regressions(summary, baseline, tolerance):
+    """Routes whose p95 grew by more than `tolerance` (and the noise floor)
+    or that now make more backend calls."""
+    found = []
+    for route, row in summary.items():
+        base = baseline.get(route)
+        if not base:
+            continue
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance) and row['p95_ms'] - base['p95_ms'] > NOISE_FLOOR_MS:
+            found.append(f"{route}: p95 {base['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+        if row['backend_calls'] > base['backend_calls'] + 0.5:
+            found.append(f"{route}: backend calls {base['backend_calls']} -> {row['backend_calls']}")
+        if row['errors'] > base.get('errors', 0):
+            found.append(f"{route}: errors {base.get('errors', 0)} -> {row['errors']}")
+    return found
+
+
+def baseline_path(args):
+    backend = args.storage if args.app == 'app' else ('dynamodb-local' if args.dynamodb_endpoint else 'moto')
+    latency = f'-{args.latency_ms:g}ms' if args.latency_ms else ''
+    return os.path.join(args.baseline_dir, f'{args.app}-{backend}-{args.scale}{latency}.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='BookBazar shop-flow benchmark')
+    parser.add_argument('--app', choices=('app', 'app_aws'), default='app')
+    parser.add_argument('--storage', choices=('sqlite', 'json'), default='sqlite', help='app.py backend')
+    parser.add_argument('--scale', default='1k', help='catalog size: 1k, 10k, 100k, 1m or a number')
+    parser.add_argument('--orders', type=int, help='existing orders (default: catalog size / 10)')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=100, help='shopper flows measured')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--logins', type=int, default=10, help='measured re-logins')
+    parser.add_argument('--cart-lines', type=int, default=2, help='books added to the cart per flow')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--dynamodb-endpoint', help='DynamoDB Local URL for app_aws (default: moto in-process)')
+    parser.add_argument('--no-seed', action='store_true', help='tables at --dynamodb-endpoint are already seeded')
+    parser.add_argument('--latency-ms', type=float, default=0, help='app_aws: added delay per DynamoDB request')
+    parser.add_argument('--fanout-workers', type=int, help='app_aws: FANOUT_WORKERS (0 = sequential)')
+    parser.add_argument('--baseline-dir', default=BASELINE_DIR)
+    parser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='compare with the saved baseline (exit 1 on regression)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+    args.books = datagen.scale(args.scale)
+    if args.orders is None:
+        args.orders = args.books // 10
+
+    target = args.app + (f' ({args.storage})' if args.app == 'app' else '')
+    print(f"📦 Seeding {args.books} books / {args.orders} orders for {target}...")
+    workdir = tempfile.mkdtemp(prefix='bookbazar-bench-')
+    started = time.time()
+    module, backend_calls = load_app(args, workdir)
+    print(f"⏱️  Ready in {time.time() - started:.1f}s, running {args.iterations} flows...")
+    recorder = Recorder(backend_calls)
+    run(module, recorder, args)
+    summary = summarize(recorder)
+
+    path = baseline_path(args)
+    baseline = None
+    if args.compare:
+        if os.path.exists(path):
+            with open(path) as file:
+                baseline = json.load(file)['routes']
+        else:
+            print(f"ℹ️  No baseline at {path}")
+    print_summary(summary, baseline)
+
+    if args.save:
+        os.makedirs(args.baseline_dir, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({
+                'app': args.app, 'scale': args.scale, 'books': args.books, 'orders': args.orders,
+                'iterations': args.iterations, 'python': platform.python_version(),
+                'recorded_at': datetime.now().isoformat(timespec='seconds'), 'routes': summary,
+            }, file, indent=2, sort_keys=True)
+        print(f"💾 Baseline saved to {path}")
+
+    if baseline:
+        found = regressions(summary, baseline, args.tolerance)
+        for line in found:
+            print(f"❌ {line}")
+        if found:
+            return 1
+        print("✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,464 @@
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import argparse
+import threading
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from catalog import index_attributes
+from storage import atomic_write_json
+
+# ---------------------------------------------------------
+# Bulk Catalog Import / Export (DynamoDB, SQLite or books.json)
+# ---------------------------------------------------------
+# python bulk_load.py import feed.jsonl                      -> Books table
+# python bulk_load.py import feed.csv --target sqlite         -> bookbazar.db
+# python bulk_load.py export books.jsonl --segments 8
+# Set DYNAMODB_ENDPOINT_URL for DynamoDB Local / moto server.
+REGION = 'us-east-1'
+BOOK_FIELDS = ('id', 'title', 'author', 'price', 'description', 'stock', 'image')
+CHECKPOINT_INTERVAL = 5.0   # seconds between checkpoint saves
+PROGRESS_INTERVAL = 2.0
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def normalize(record):
+    """Feed record -> book dict (Decimal price, int stock). Raises
+    InvalidRecord for rows that can't be loaded."""
+    missing = [f for f in ('id', 'title', 'author', 'price') if record.get(f) in (None, '')]
+    if missing:
+        raise InvalidRecord('missing ' + ', '.join(missing))
+    try:
+        return {
+            'id': str(record['id']).strip(),
+            'title': str(record['title']).strip(),
+            'author': str(record['author']).strip(),
+            'price': Decimal(str(record['price'])),
+            'description': record.get('description') or '',
+            'stock': int(record.get('stock') or 0),
+            'image': record.get('image') or 'default_book.jpg',
+        }
+    except (ArithmeticError, ValueError, TypeError) as e:
+        raise InvalidRecord(str(e))
+
+
+def read_records(path, fmt=None):
+    """Streams raw records from JSON Lines, CSV or a JSON array (books.json;
+    loaded whole). Yields (line_number, record)."""
+    fmt = fmt or _format_of(path)
+    if fmt == 'json':
+        with open(path) as file:
+            for n, record in enumerate(json.load(file, parse_float=Decimal), 1):
+                yield n, record
+    elif fmt == 'csv':
+        with open(path, newline='') as file:
+            for n, record in enumerate(csv.DictReader(file), 1):
+                yield n, record
+    else:
+        with open(path) as file:
+            for n, line in enumerate(file, 1):
+                if line.strip():
+                    yield n, json.loads(line, parse_float=Decimal)
+
+
+def _format_of(path):
+    ext = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.json': 'json'}.get(ext, 'jsonl')
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+# ---------------------------------------------------------
+# Targets
+# ---------------------------------------------------------
+class DynamoTarget:
+    """Books table. Writes go through batch_writer (25-item BatchWriteItem,
+    unprocessed items retried); one writer per thread."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def check(self, book):
+        pass
+
+    def write(self, books):
+        with self.table.batch_writer(overwrite_by_pkeys=['id']) as batch:
+            for book in books:
+                item = dict(book)
+                item.update(index_attributes(item))
+                batch.put_item(Item=item)
+
+    def flush(self):
+        pass
+
+    def scan_segment(self, segment, total_segments, page_size=1000):
+        kwargs = {'Segment': segment, 'TotalSegments': total_segments, 'Limit': page_size,
+                  'ProjectionExpression': ', '.join('#f%d' % i for i in range(len(BOOK_FIELDS))),
+                  'ExpressionAttributeNames': {'#f%d' % i: f for i, f in enumerate(BOOK_FIELDS)}}
+        while True:
+            response = self.table.scan(**kwargs)
+            yield response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def finish(self):
+        from render_cache import DynamoCatalogVersion
+        import aws_clients
+        DynamoCatalogVersion(aws_clients.resource('dynamodb', REGION).Table('Stats')).bump()
+        print("ℹ️  Run python stats.py to recount the dashboard stock total.")
+
+
+class SqliteTarget:
+    """app.py's SQLite books table (INSERT OR REPLACE per batch)."""
+
+    def __init__(self, db):
+        import sqlite_store
+        self.db = db
+        self.catalog = sqlite_store.SqliteCatalogStore(db)
+        self.stats = sqlite_store.SqliteStats(db)
+        self.versions = sqlite_store.SqliteCatalogVersion(db)
+
+    def check(self, book):
+        if not book['id'].isdigit():
+            raise InvalidRecord('the SQLite catalog needs integer ids')
+
+    def write(self, books):
+        self.catalog.put_many(books)
+
+    def flush(self):
+        pass
+
+    def scan_segment(self, segment, total_segments, page_size=1000):
+        after = 0
+        while True:
+            books = self.db.query(
+                'SELECT id, title, author, price, description, stock, image FROM books '
+                'WHERE id > ? AND id % ? = ? ORDER BY id LIMIT ?', (after, total_segments, segment, page_size))
+            if not books:
+                return
+            yield books
+            after = books[-1]['id']
+
+    def finish(self):
+        # Upserts replace stock, so recount the dashboard total from the table
+        total = self.db.query_one('SELECT COALESCE(SUM(stock), 0) AS total FROM books')['total']
+        self.stats.adjust_stock(total - self.stats.snapshot()['total_stock'])
+        self.versions.bump()
+
+
+class JsonTarget:
+    """books.json. The merged catalog is kept in memory and the file is
+    rewritten (atomically) at every checkpoint, so the two always agree."""
+
+    def __init__(self, path):
+        from storage import file_lock
+        self.path = path
+        self.file_lock = file_lock
+        self._lock = threading.Lock()
+        self._books = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self._books = {str(b['id']): b for b in json.load(file)}
+        self._dirty = False
+
+    def check(self, book):
+        pass
+
+    def write(self, books):
+        with self._lock:
+            for book in books:
+                book = {k: _plain(v) for k, v in book.items()}
+                if book['id'].isdigit():
+                    book['id'] = int(book['id'])
+                self._books[str(book['id'])] = book
+            self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            with self.file_lock(self.path):
+                atomic_write_json(self.path, list(self._books.values()))
+            self._dirty = False
+
+    def scan_segment(self, segment, total_segments, page_size=1000):
+        books = list(self._books.values())[segment::total_segments]
+        for start in range(0, len(books), page_size):
+            yield books[start:start + page_size]
+
+    def finish(self):
+        self.flush()
+
+
+def open_target(args):
+    if args.target == 'sqlite':
+        import sqlite_store
+        return SqliteTarget(sqlite_store.Database(args.db))
+    if args.target == 'json':
+        return JsonTarget(args.json)
+    import aws_clients
+    return DynamoTarget(aws_clients.resource('dynamodb', REGION).Table(args.table))
+
+
+# ---------------------------------------------------------
+# Import
+# ---------------------------------------------------------
+class Throttle:
+    """Blocking token bucket shared by the writer threads (items/second)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self, items):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + items / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class Checkpoint:
+    """Records how many input records are committed, so a rerun skips them.
+    Batches finish out of order; only the contiguous prefix counts."""
+
+    def __init__(self, path, source):
+        self.path = path
+        st = os.stat(source)
+        self.source = {'path': os.path.abspath(source), 'size': st.st_size, 'mtime': int(st.st_mtime)}
+        self.done = 0
+        self.written = 0
+        self.rejected = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as file:
+            saved = json.load(file)
+        if saved.get('source') != self.source:
+            raise SystemExit(f"❌ {self.path} belongs to a different or modified feed (use --restart).")
+        self.done, self.written, self.rejected = saved['done'], saved['written'], saved['rejected']
+        return True
+
+    def save(self):
+        atomic_write_json(self.path, {'source': self.source, 'done': self.done,
+                                      'written': self.written, 'rejected': self.rejected})
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    def __init__(self, label, interval=PROGRESS_INTERVAL):
+        self.label = label
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last = self.started
+        self.count = 0
+
+    def add(self, n, force=False):
+        self.count += n
+        now = time.monotonic()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            elapsed = max(now - self.started, 1e-9)
+            print(f"📈 {self.label}: {self.count} records, {self.count / elapsed:,.0f}/s")
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return f"{self.count} records in {elapsed:.1f}s ({self.count / elapsed:,.0f}/s)"
+
+
+def import_feed(args):
+    target = open_target(args)
+    checkpoint = Checkpoint(args.checkpoint or args.source + '.checkpoint', args.source)
+    if args.restart:
+        checkpoint.remove()
+    elif checkpoint.load():
+        print(f"↩️  Resuming after record {checkpoint.done} ({checkpoint.written} written).")
+    skip = checkpoint.done
+
+    throttle = Throttle(args.rate)
+    progress = Progress('import')
+    lock = threading.Lock()
+    finished = {}           # batch index -> (records consumed, books written, rejected)
+    next_index = [0]        # first batch not yet counted into checkpoint.done
+    failures = []
+    in_flight = threading.BoundedSemaphore(args.threads * 2)
+    last_save = [time.monotonic()]
+
+    def advance():
+        # Caller holds lock: fold contiguous finished batches into the checkpoint
+        while next_index[0] in finished:
+            consumed, written, rejected = finished.pop(next_index[0])
+            checkpoint.done += consumed
+            checkpoint.written += written
+            checkpoint.rejected += rejected
+            next_index[0] += 1
+        if time.monotonic() - last_save[0] >= CHECKPOINT_INTERVAL:
+            target.flush()
+            checkpoint.save()
+            last_save[0] = time.monotonic()
+
+    def write_batch(index, consumed, rejected, books):
+        try:
+            throttle.wait(len(books))
+            target.write(books)
+        except Exception as e:
+            failures.append(f"batch {index}: {e}")
+            return
+        finally:
+            in_flight.release()
+        with lock:
+            finished[index] = (consumed, len(books), rejected)
+            progress.add(len(books))
+            advance()
+
+    def submit(executor, index, consumed, rejected, books):
+        in_flight.acquire()
+        executor.submit(write_batch, index, consumed, rejected, books)
+
+    rejects = open(args.rejects, 'a') if args.rejects else None
+    with ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix='bulk-load') as executor:
+        batch, consumed, rejected, index = {}, 0, 0, 0
+        for line, record in read_records(args.source, args.format):
+            if line <= skip:
+                continue
+            if failures:
+                break
+            consumed += 1
+            try:
+                book = normalize(record)
+                target.check(book)
+            except InvalidRecord as e:
+                rejected += 1
+                if rejects:
+                    rejects.write(json.dumps({'line': line, 'error': str(e), 'record': record}, default=str) + '\n')
+                continue
+            # Last occurrence of an id in a batch wins (batch_writer rejects duplicates)
+            batch[book['id']] = book
+            if len(batch) >= args.batch_size:
+                submit(executor, index, consumed, rejected, list(batch.values()))
+                batch, consumed, rejected, index = {}, 0, 0, index + 1
+        if consumed and not failures:
+            submit(executor, index, consumed, rejected, list(batch.values()))
+    if rejects:
+        rejects.close()
+
+    with lock:
+        target.flush()
+        checkpoint.save()
+    if failures:
+        for failure in failures[:5]:
+            print(f"❌ {failure}")
+        print(f"⏸️  Stopped after record {checkpoint.done}; rerun the same command to resume.")
+        return 1
+    target.finish()
+    checkpoint.remove()
+    progress.add(0, force=True)
+    print(f"🎉 Imported {progress.summary()}; {checkpoint.written} written in total, {checkpoint.rejected} rejected.")
+    return 0
+
+
+# ---------------------------------------------------------
+# Export
+# ---------------------------------------------------------
+def export_catalog(args):
+    target = open_target(args)
+    pages = queue.Queue(maxsize=args.segments * 4)
+    done = object()
+    errors = []
+
+    def scan(segment):
+        try:
+            for books in target.scan_segment(segment, args.segments):
+                pages.put(books)
+        except Exception as e:
+            errors.append(f"segment {segment}: {e}")
+        finally:
+            pages.put(done)
+
+    threads = [threading.Thread(target=scan, args=(s,), daemon=True) for s in range(args.segments)]
+    for t in threads:
+        t.start()
+
+    fmt = args.format or ('csv' if args.destination.endswith('.csv') else 'jsonl')
+    progress = Progress('export')
+    tmp_path = args.destination + '.part'
+    with open(tmp_path, 'w', newline='') as out:
+        writer = csv.DictWriter(out, fieldnames=BOOK_FIELDS, extrasaction='ignore') if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+        remaining = args.segments
+        while remaining:
+            books = pages.get()
+            if books is done:
+                remaining -= 1
+                continue
+            for book in books:
+                book = {f: _plain(book.get(f)) for f in BOOK_FIELDS}
+                if writer:
+                    writer.writerow(book)
+                else:
+                    out.write(json.dumps(book) + '\n')
+            progress.add(len(books))
+    if errors:
+        os.remove(tmp_path)
+        for error in errors:
+            print(f"❌ {error}")
+        return 1
+    os.replace(tmp_path, args.destination)
+    print(f"🎉 Exported {progress.summary()} to {args.destination}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import / export of the BookBazar catalog')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('import', 'export'):
+        p = sub.add_parser(name)
+        p.add_argument('source' if name == 'import' else 'destination')
+        p.add_argument('--target', choices=('dynamodb', 'sqlite', 'json'), default='dynamodb')
+        p.add_argument('--table', default='Books', help='DynamoDB table')
+        p.add_argument('--db', default=os.environ.get('BOOKBAZAR_DB', 'bookbazar.db'), help='SQLite file')
+        p.add_argument('--json', default='books.json', help='books.json path')
+        p.add_argument('--format', choices=('jsonl', 'csv', 'json') if name == 'import' else ('jsonl', 'csv'),
+                       help='default: from the file extension')
+    p = sub.choices['import']
+    p.add_argument('--threads', type=int, default=4, help='parallel writers')
+    p.add_argument('--batch-size', type=int, default=500, help='records per writer batch')
+    p.add_argument('--rate', type=float, default=0, help='max records/second (0 = no cap)')
+    p.add_argument('--checkpoint', help='default: <source>.checkpoint')
+    p.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    p.add_argument('--rejects', help='append invalid records to this JSON Lines file')
+    sub.choices['export'].add_argument('--segments', type=int, default=4, help='parallel scan segments')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        if not os.path.exists(args.source):
+            print(f"❌ {args.source} not found")
+            return 1
+        print(f"📦 Importing {args.source} into {args.target}...")
+        return import_feed(args)
+    print(f"📦 Exporting {args.target} catalog to {args.destination}...")
+    return export_catalog(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import json
+import threading
+from decimal import Decimal
+
+# ---------------------------------------------------------
+# Shopping Carts (per user, with a cached priced summary)
+# ---------------------------------------------------------
+# Book fields a cart line needs (no descriptions / covers)
+SUMMARY_FIELDS = ('id', 'title', 'author', 'price', 'stock')
+# Tries of a cart change that keeps losing to concurrent writes (two tabs)
+MAX_SAVE_ATTEMPTS = 5
+
+
+class CartConflict(Exception):
+    """The cart changed under every one of MAX_SAVE_ATTEMPTS tries."""
+
+
+def _plain(value):
+    """DynamoDB Decimals -> int/float so summaries are JSON-serializable."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def price_cart(items, books_by_id):
+    """Builds the priced summary for {str_id: qty}; books that no longer
+    exist are left out."""
+    lines = []
+    grand_total = 0
+    for str_id, quantity in items.items():
+        book = books_by_id.get(str_id)
+        if not book:
+            continue
+        book = {field: _plain(book.get(field)) for field in SUMMARY_FIELDS}
+        line_total = book['price'] * quantity
+        grand_total += line_total
+        lines.append({
+            'book': book,
+            'quantity': quantity,
+            'line_total': round(line_total, 2),
+            'short': quantity > (book['stock'] or 0),
+        })
+    return {
+        'lines': lines,
+        'grand_total': round(grand_total, 2),
+        'count': sum(line['quantity'] for line in lines),
+    }
+
+
+class CartService:
+    """Carts keyed by user (shared across devices and sessions).
+
+    The priced summary is stored with the cart, so showing the cart or the
+    badge is one store read. It is dropped when the cart changes, and is
+    stamped with `catalog_version()` (render_cache's version, bumped by every
+    price/stock change): a summary from an older catalog is re-priced with
+    one get_many when it is next read, so catalog writes never touch carts.
+
+    Changes are optimistic: the store only saves if the cart's version is
+    still the one that was read, otherwise the change is re-applied to a
+    fresh read, so concurrent requests never overwrite each other.
+    """
+
+    def __init__(self, store, catalog, catalog_version=lambda: None):
+        self.store = store
+        self.catalog = catalog
+        self.catalog_version = catalog_version
+        self._lock = threading.Lock()
+        self.summary_hits = 0
+        self.summary_misses = 0
+        self.conflicts = 0
+
+    def items(self, user_key):
+        return self.store.load(user_key)['items']
+
+    def _change(self, user_key, change):
+        """Applies change(items) -> new items (or None: leave the cart as
+        it is) to the current cart, retrying when another write got in."""
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            cart = self.store.load(user_key)
+            items = change(dict(cart['items']))
+            if items is None:
+                return None
+            if self.store.save_items(user_key, items, cart['items'], cart['version']):
+                return items
+            with self._lock:
+                self.conflicts += 1
+        raise CartConflict(user_key)
+
+    def set_quantity(self, user_key, book_id, quantity):
+        """Sets one line; quantity <= 0 removes it. Returns the new items."""
+        def change(items):
+            if quantity > 0:
+                items[str(book_id)] = quantity
+            else:
+                items.pop(str(book_id), None)
+            return items
+        return self._change(user_key, change)
+
+    def add(self, user_key, book_id, delta, max_quantity=None):
+        """Adds delta (may be negative) to one line, removing it at 0.
+        Returns the new items, or None (cart unchanged) if the line would
+        exceed max_quantity, e.g. the stock."""
+        def change(items):
+            quantity = items.get(str(book_id), 0) + delta
+            if max_quantity is not None and delta > 0 and quantity > max_quantity:
+                return None
+            if quantity > 0:
+                items[str(book_id)] = quantity
+            else:
+                items.pop(str(book_id), None)
+            return items
+        return self._change(user_key, change)
+
+    def summary(self, user_key):
+        cart = self.store.load(user_key)
+        # JSON round trip: a tuple version (books.json signature) comes back as a list
+        stamp = json.loads(json.dumps(self.catalog_version()))
+        if cart['summary'] is not None and cart['summary'].get('catalog_version') == stamp:
+            with self._lock:
+                self.summary_hits += 1
+            return cart['summary']
+        with self._lock:
+            self.summary_misses += 1
+        summary = price_cart(cart['items'], self.catalog.get_many(cart['items'].keys()) if cart['items'] else {})
+        summary['catalog_version'] = stamp
+        # Not stored if the cart changed meanwhile (version check)
+        self.store.save_summary(user_key, cart['version'], summary)
+        return summary
+
+    def clear(self, user_key):
+        self.store.clear(user_key)
+
+    def stats(self):
+        stats = {'summary_hits': self.summary_hits, 'summary_misses': self.summary_misses, 'conflicts': self.conflicts}
+        stats.update(self.store.stats())
+        return stats
+
+
+class MemoryCartStore:
+    """In-process carts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carts = {}
+
+    def load(self, user_key):
+        with self._lock:
+            cart = self._carts.get(user_key)
+            if cart is None:
+                return {'items': {}, 'summary': None, 'version': 0}
+            return {'items': dict(cart['items']), 'summary': cart['summary'], 'version': cart['version']}
+
+    def save_items(self, user_key, items, old_items, version):
+        """Saves if the cart is still at `version` (0: no cart yet);
+        returns False if another write got in first."""
+        with self._lock:
+            cart = self._carts.get(user_key)
+            if (cart['version'] if cart else 0) != version:
+                return False
+            cart = self._carts.setdefault(user_key, {'items': {}, 'summary': None, 'version': 0})
+            cart.update(items=dict(items), summary=None, version=cart['version'] + 1)
+        return True
+
+    def save_summary(self, user_key, version, summary):
+        with self._lock:
+            cart = self._carts.get(user_key)
+            if cart is not None and cart['version'] == version:
+                cart['summary'] = summary
+
+    def clear(self, user_key):
+        with self._lock:
+            self._carts.pop(user_key, None)
+
+    def stats(self):
+        return {'backend': 'memory', 'carts': len(self._carts)}
+
+
+class DynamoCartStore:
+    """Carts table (Partition Key: user_key, Sort Key: entry).
+
+    entry 'cart'  -- items map, version, cached summary (JSON string)
+    """
+
+    CART = 'cart'
+
+    def __init__(self, table):
+        self.table = table
+
+    def load(self, user_key):
+        # Strongly consistent: the version read here is what save_items checks
+        item = self.table.get_item(Key={'user_key': user_key, 'entry': self.CART}, ConsistentRead=True).get('Item')
+        if item is None:
+            return {'items': {}, 'summary': None, 'version': 0}
+        summary = item.get('summary')
+        return {
+            'items': {k: int(v) for k, v in item.get('items', {}).items()},
+            'summary': json.loads(summary) if summary else None,
+            'version': int(item.get('version', 0)),
+        }
+
+    def save_items(self, user_key, items, old_items, version):
+        """Updates the cart entry if it is still at `version` (0: no cart
+        yet). Returns False if another write got in first."""
+        values = {':items': items, ':zero': 0, ':one': 1}
+        if version:
+            condition = '#v = :expected'
+            values[':expected'] = version
+        else:
+            condition = 'attribute_not_exists(#v)'
+        try:
+            self.table.update_item(
+                Key={'user_key': user_key, 'entry': self.CART},
+                UpdateExpression='SET #items = :items, #v = if_not_exists(#v, :zero) + :one REMOVE #s',
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#items': 'items', '#v': 'version', '#s': 'summary'},
+                ExpressionAttributeValues=values
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def save_summary(self, user_key, version, summary):
+        try:
+            self.table.update_item(
+                Key={'user_key': user_key, 'entry': self.CART},
+                UpdateExpression='SET #s = :s',
+                ConditionExpression='#v = :v',
+                ExpressionAttributeNames={'#v': 'version', '#s': 'summary'},
+                ExpressionAttributeValues={':s': json.dumps(summary), ':v': version}
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    def clear(self, user_key):
+        from boto3.dynamodb.conditions import Key
+        response = self.table.query(KeyConditionExpression=Key('user_key').eq(user_key),
+                                    ProjectionExpression='#e', ExpressionAttributeNames={'#e': 'entry'})
+        with self.table.batch_writer() as batch:
+            for item in response.get('Items', []):
+                batch.delete_item(Key={'user_key': user_key, 'entry': item['entry']})
+
+    def stats(self):
+        return {'backend': 'dynamodb'}
@@ -0,0 +1,539 @@
+import os
+import json
+import bisect
+import threading
+from flask import g, has_request_context
+from dynamo_utils import batch_get, transact_write, TransactionCancelled, TRANSACT_ITEMS_LIMIT
+from storage import atomic_write_json, file_lock
+from pagination import encode_cursor, decode_cursor, start_key
+from metrics import timed
+from columnar import ColumnarCatalog
+
+# ---------------------------------------------------------
+# Catalog Cache (books.json kept parsed in memory)
+# ---------------------------------------------------------
+# 'dicts' keeps the parsed list of dicts; 'columnar' converts it to
+# columnar.ColumnarCatalog (arrays + mmap'd descriptions) for large,
+# read-mostly catalogs: this worker's stock writes update the stock column
+# in place, but any write makes the other workers reload and rebuild it
+CATALOG_LAYOUT = os.environ.get('CATALOG_LAYOUT', 'dicts')
+
+class CatalogCache:
+    """Keeps the parsed books.json in memory and reloads it only when the
+    file's inode, mtime or size changes (or when a save hands us new data).
+    Inside a request the file is stat'ed once; later reads use that check."""
+
+    def __init__(self, path, layout=CATALOG_LAYOUT):
+        self.path = path
+        self.layout = layout
+        self._lock = threading.Lock()
+        self._books = []
+        self._by_id = {}
+        self._signature = None
+        self._loaded = False
+        self.generation = 0
+        # Bumped only when ids, titles or authors change (not for stock,
+        # price or cover writes), so the sorted indexes can be kept
+        self.index_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.read_errors = 0
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # Atomic saves rename a new file into place, so the inode changes too
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @timed('file_read')
+    def _read_file(self):
+        """Returns the parsed file, or None if it can't be parsed."""
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {self.path}: {e}")
+            self.read_errors += 1
+            return None
+
+    def _set(self, books_list, signature):
+        if self.layout == 'columnar':
+            try:
+                books_list = ColumnarCatalog(books_list)
+            except (TypeError, ValueError) as e:
+                print(f"Columnar catalog needs integer ids, keeping dicts: {e}")
+        if not self._loaded or not _same_index_keys(self._books, books_list):
+            self.index_generation += 1
+        self._books = books_list
+        # ColumnarCatalog.get() takes str ids too
+        self._by_id = books_list if isinstance(books_list, ColumnarCatalog) else {str(b['id']): b for b in books_list}
+        self._signature = signature
+        self._loaded = True
+        self.generation += 1
+
+    def _refresh(self):
+        if has_request_context():
+            checked = g.setdefault('catalog_checked', set())
+            if self._loaded and id(self) in checked:
+                self.hits += 1
+                return
+            checked.add(id(self))
+        signature = self._file_signature()
+        if self._loaded and signature == self._signature:
+            self.hits += 1
+            return
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            signature = self._file_signature()
+            if self._loaded and signature == self._signature:
+                self.hits += 1
+                return
+            if self._loaded:
+                self.reloads += 1
+            else:
+                self.misses += 1
+            books_list = self._read_file()
+            if books_list is None:
+                # Never replace a good catalog with an empty one; keep serving
+                # the last copy until the file is fixed
+                books_list = self._books
+            self._set(books_list, signature)
+
+    def books(self):
+        """Returns the cached catalog: a list of dicts, or a ColumnarCatalog
+        of read-only BookViews. Treat it as read-only."""
+        self._refresh()
+        return self._books
+
+    def get(self, book_id):
+        """O(1) lookup by id (int or str). Returns None if missing."""
+        self._refresh()
+        return self._by_id.get(str(book_id))
+
+    def snapshot(self):
+        """Returns a private copy of the catalog for read-modify-write paths."""
+        return [dict(b) for b in self.books()]
+
+    def store(self, books_list, stock_only=None):
+        """Called right after books.json was written so the next read is a hit.
+        `stock_only` ({id: new stock}) says nothing else changed: a columnar
+        catalog then updates its stock column instead of being rebuilt."""
+        with self._lock:
+            if stock_only is not None and self._loaded and isinstance(self._books, ColumnarCatalog):
+                self._books.set_stock(stock_only)
+                self._signature = self._file_signature()
+                self.generation += 1
+                return
+            self._set(books_list, self._file_signature())
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self._signature = None
+
+    def stats(self):
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'read_errors': self.read_errors,
+            'books': len(self._books),
+            'layout': 'dicts',
+        }
+        if isinstance(self._books, ColumnarCatalog):
+            stats.update(self._books.stats())
+        return stats
+
+
+class FileCatalogVersion:
+    """Catalog version for render_cache, read from books.json itself: the
+    file's (inode, mtime, size). Every write replaces the file, so each
+    worker, bulk_load.py and hand edits all move it without a shared counter."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self):
+        signature = self.cache._file_signature()
+        if signature is None:
+            return None, 0.0
+        return signature, signature[1] / 1e9
+
+    def bump(self):
+        # The write that changed the catalog already changed the file
+        return self.get()
+
+
+def _same_index_keys(old, new):
+    """True if two loads of the catalog have the same ids, titles and
+    authors in the same order (a stock/price/cover write)."""
+    if len(old) != len(new) or type(old) is not type(new):
+        return False
+    if isinstance(new, ColumnarCatalog):
+        return (old.ids == new.ids and old.titles == new.titles
+                and old.authors.codes == new.authors.codes and old.authors.values == new.authors.values)
+    return all(str(a['id']) == str(b['id']) and a.get('title') == b.get('title') and a.get('author') == b.get('author')
+               for a, b in zip(old, new))
+
+
+# Attributes a browse card needs (no descriptions)
+CARD_FIELDS = ('id', 'title', 'author', 'price', 'image', 'stock')
+
+def title_key(title):
+    return (title or '').strip().casefold()
+
+def author_key(author):
+    return (author or '').strip().casefold()
+
+def index_attributes(book):
+    """Derived attributes the DynamoDB author/title GSIs are keyed on."""
+    title_lower = title_key(book.get('title'))
+    return {
+        'author_key': author_key(book.get('author')) or '-',
+        'title_lower': title_lower or '-',
+        'title_initial': title_lower[:1] or '-',
+    }
+
+# ---------------------------------------------------------
+# Catalog Store (one interface, JSON or DynamoDB behind it)
+# ---------------------------------------------------------
+class CatalogStore:
+    """Book lookups used by the route handlers. Every lookup is by key or
+    by index; handlers should never iterate the full catalog themselves."""
+
+    def get(self, book_id):
+        raise NotImplementedError
+
+    def get_many(self, book_ids):
+        """Returns {str_id: book} for the ids that exist."""
+        raise NotImplementedError
+
+    def all(self):
+        raise NotImplementedError
+
+    def page(self, limit, cursor=None):
+        """Returns (books, next_cursor) for one browse page. Cursors are
+        opaque strings; next_cursor is None on the last page."""
+        raise NotImplementedError
+
+    def by_author(self, author):
+        raise NotImplementedError
+
+    def by_title_prefix(self, prefix, limit=20):
+        raise NotImplementedError
+
+    def put(self, book):
+        """Inserts or overwrites a book."""
+        raise NotImplementedError
+
+    def insert(self, make_book):
+        """Adds make_book(new_id) with a freshly allocated id; returns the book."""
+        raise NotImplementedError
+
+    def delete(self, book_id):
+        """Removes a book and returns it (or None if it did not exist)."""
+        raise NotImplementedError
+
+    def adjust_stock(self, deltas):
+        """Applies {str_id: delta} stock changes all-or-nothing. Returns the
+        ids whose stock would go below zero (nothing is applied then)."""
+        raise NotImplementedError
+
+    def set_image(self, book_id, image):
+        """Points a book at a new cover. Returns the previous image name,
+        or None if the book no longer exists (nothing is written then)."""
+        raise NotImplementedError
+
+    def image_names(self):
+        """Set of cover filenames referenced by any book."""
+        return {b.get('image') for b in self.all()}
+
+    def stats(self):
+        return {}
+
+
+class JsonCatalogStore(CatalogStore):
+    """books.json backend. Reads come from CatalogCache; the id, author and
+    title-prefix indexes are rebuilt only when ids, titles or authors change
+    (not after a checkout's stock write). Writes are
+    read-modify-write under a cross-process file lock and replace the file
+    atomically, so several gunicorn workers can share one books.json."""
+
+    def __init__(self, path):
+        self.path = path
+        self.cache = CatalogCache(path)
+        self._index_generation = None
+        self._by_author = {}
+        self._titles = []
+        self._ids = []
+        self._max_id = 0
+
+    def _indexes(self):
+        books = self.cache.books()
+        if self._index_generation != self.cache.index_generation:
+            # Ids, not books: a columnar catalog hands out a new view per access
+            by_author = {}
+            for b in books:
+                by_author.setdefault(author_key(b.get('author')), []).append(b['id'])
+            self._by_author = by_author
+            self._titles = sorted((title_key(b.get('title')), str(b['id'])) for b in books)
+            # A columnar catalog's id column is already sorted
+            self._ids = books.ids if isinstance(books, ColumnarCatalog) else sorted(int(b['id']) for b in books)
+            self._max_id = self._ids[-1] if self._ids else 0
+            self._index_generation = self.cache.index_generation
+
+    def get(self, book_id):
+        return self.cache.get(book_id)
+
+    def get_many(self, book_ids):
+        found = {}
+        for book_id in book_ids:
+            book = self.cache.get(book_id)
+            if book:
+                found[str(book_id)] = book
+        return found
+
+    def all(self):
+        return self.cache.books()
+
+    def page(self, limit, cursor=None):
+        self._indexes()
+        position = decode_cursor(cursor) or {}
+        ids = self._ids
+        start = 0
+        if 'after' in position:
+            try:
+                start = bisect.bisect_right(ids, int(position['after']))
+            except (TypeError, ValueError):
+                start = 0
+        page_ids = ids[start:start + limit]
+        books = [b for b in (self.cache.get(i) for i in page_ids) if b]
+        next_cursor = None
+        if page_ids and start + limit < len(ids):
+            next_cursor = encode_cursor({'after': page_ids[-1]})
+        return books, next_cursor
+
+    def by_author(self, author):
+        self._indexes()
+        return [b for b in (self.cache.get(i) for i in self._by_author.get(author_key(author), [])) if b]
+
+    def by_title_prefix(self, prefix, limit=20):
+        self._indexes()
+        prefix = title_key(prefix)
+        titles = self._titles
+        results = []
+        i = bisect.bisect_left(titles, (prefix, ''))
+        while i < len(titles) and len(results) < limit and titles[i][0].startswith(prefix):
+            book = self.cache.get(titles[i][1])
+            if book:
+                results.append(book)
+            i += 1
+        return results
+
+    def next_id(self):
+        self._indexes()
+        return self._max_id + 1
+
+    def snapshot(self):
+        return self.cache.snapshot()
+
+    def _write(self, books_list, stock_only=None):
+        # Caller must hold file_lock(self.path)
+        atomic_write_json(self.path, books_list)
+        self.cache.store(books_list, stock_only)
+
+    def save(self, books_list):
+        """Replaces the whole catalog."""
+        with file_lock(self.path):
+            self._write(books_list)
+
+    def put(self, book):
+        with file_lock(self.path):
+            books = self.snapshot()
+            for i, b in enumerate(books):
+                if str(b['id']) == str(book['id']):
+                    books[i] = book
+                    break
+            else:
+                books.append(book)
+            self._write(books)
+
+    def insert(self, make_book):
+        """Adds make_book(new_id) with an id allocated under the lock, so two
+        workers adding books at once never hand out the same id."""
+        with file_lock(self.path):
+            book = make_book(self.next_id())
+            books = self.snapshot()
+            books.append(book)
+            self._write(books)
+        return book
+
+    def delete(self, book_id):
+        with file_lock(self.path):
+            books = self.snapshot()
+            removed = next((b for b in books if str(b['id']) == str(book_id)), None)
+            if removed:
+                self._write([b for b in books if str(b['id']) != str(book_id)])
+        return removed
+
+    def adjust_stock(self, deltas):
+        with file_lock(self.path):
+            books = self.snapshot()
+            by_id = {str(b['id']): b for b in books}
+            short = [str_id for str_id, delta in deltas.items()
+                     if str_id in by_id and by_id[str_id].get('stock', 0) + delta < 0]
+            if short:
+                return short
+            for str_id, delta in deltas.items():
+                if str_id in by_id:
+                    by_id[str_id]['stock'] = by_id[str_id].get('stock', 0) + delta
+            self._write(books, stock_only={str_id: by_id[str_id]['stock'] for str_id in deltas if str_id in by_id})
+        return []
+
+    def set_image(self, book_id, image):
+        with file_lock(self.path):
+            books = self.snapshot()
+            book = next((b for b in books if str(b['id']) == str(book_id)), None)
+            if book is None:
+                return None
+            old = book.get('image')
+            book['image'] = image
+            self._write(books)
+        return old
+
+    def stats(self):
+        return {'cache': self.cache.stats()}
+
+
+class DynamoCatalogStore(CatalogStore):
+    """DynamoDB Books table backend.
+
+    Secondary lookups use two GSIs on the Books table:
+      author-index  (author_key)                   -- exact author match
+      title-index   (title_initial, title_lower)   -- begins_with prefix
+    """
+
+    AUTHOR_INDEX = 'author-index'
+    TITLE_INDEX = 'title-index'
+
+    def __init__(self, table, fanout=None):
+        self.table = table
+        # BatchGetItem chunks (>100 ids) run concurrently through it
+        self.fanout = fanout
+
+    def get(self, book_id):
+        response = self.table.get_item(Key={'id': str(book_id)})
+        return response.get('Item')
+
+    def get_many(self, book_ids):
+        keys = [{'id': str(book_id)} for book_id in book_ids]
+        if not keys:
+            return {}
+        return {b['id']: b for b in batch_get(self.table, keys, fanout=self.fanout)}
+
+    def all(self):
+        response = self.table.scan()
+        books = response.get('Items', [])
+        while 'LastEvaluatedKey' in response:
+            response = self.table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            books.extend(response.get('Items', []))
+        return books
+
+    def page(self, limit, cursor=None):
+        # Projected scan: only card fields, never long descriptions
+        kwargs = {
+            'Limit': limit,
+            'ProjectionExpression': ', '.join('#f%d' % i for i in range(len(CARD_FIELDS))),
+            'ExpressionAttributeNames': {'#f%d' % i: name for i, name in enumerate(CARD_FIELDS)},
+        }
+        # Table key only (id); any other cursor starts over
+        start = start_key(decode_cursor(cursor), ('id',))
+        if start:
+            kwargs['ExclusiveStartKey'] = start
+        books = []
+        while True:
+            response = self.table.scan(**kwargs)
+            books.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key or len(books) >= limit:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+            kwargs['Limit'] = limit - len(books)
+        return books, encode_cursor(last_key)
+
+    def by_author(self, author):
+        from boto3.dynamodb.conditions import Key
+        response = self.table.query(
+            IndexName=self.AUTHOR_INDEX,
+            KeyConditionExpression=Key('author_key').eq(author_key(author))
+        )
+        return response.get('Items', [])
+
+    def by_title_prefix(self, prefix, limit=20):
+        from boto3.dynamodb.conditions import Key
+        prefix = title_key(prefix)
+        if not prefix:
+            return []
+        response = self.table.query(
+            IndexName=self.TITLE_INDEX,
+            KeyConditionExpression=Key('title_initial').eq(prefix[:1]) & Key('title_lower').begins_with(prefix),
+            Limit=limit
+        )
+        return response.get('Items', [])
+
+    def put(self, book):
+        item = dict(book)
+        item['id'] = str(item['id'])
+        item.update(index_attributes(item))
+        self.table.put_item(Item=item)
+
+    def delete(self, book_id):
+        response = self.table.delete_item(Key={'id': str(book_id)}, ReturnValues='ALL_OLD')
+        return response.get('Attributes')
+
+    def adjust_stock(self, deltas):
+        if len(deltas) > TRANSACT_ITEMS_LIMIT:
+            raise ValueError('adjust_stock handles at most %d books at once' % TRANSACT_ITEMS_LIMIT)
+        ids = list(deltas)
+        actions = [{'Update': {
+            'TableName': self.table.name,
+            'Key': {'id': str(str_id)},
+            'UpdateExpression': "set stock = stock + :d",
+            'ConditionExpression': "stock >= :min",
+            'ExpressionAttributeValues': {':d': deltas[str_id], ':min': max(0, -deltas[str_id])}
+        }} for str_id in ids]
+        try:
+            transact_write(self.table.meta.client, actions)
+        except TransactionCancelled as e:
+            return [str(ids[i]) for i, r in enumerate(e.reasons) if r.get('Code') == 'ConditionalCheckFailed']
+        return []
+
+    def set_image(self, book_id, image):
+        try:
+            response = self.table.update_item(
+                Key={'id': str(book_id)},
+                UpdateExpression='set #img = :i',
+                ConditionExpression='attribute_exists(id)',
+                ExpressionAttributeNames={'#img': 'image'},
+                ExpressionAttributeValues={':i': image},
+                ReturnValues='UPDATED_OLD'
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+        return response.get('Attributes', {}).get('image', 'default_book.jpg')
+
+    def image_names(self):
+        # Projected scan: one small attribute per book
+        kwargs = {'ProjectionExpression': '#img', 'ExpressionAttributeNames': {'#img': 'image'}}
+        names = set()
+        while True:
+            response = self.table.scan(**kwargs)
+            names.update(b.get('image') for b in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return names
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,152 @@
+import mmap
+import bisect
+import tempfile
+from array import array
+from collections.abc import Mapping, Sequence
+
+# ---------------------------------------------------------
+# Columnar Catalog (compact in-memory books.json for large catalogs)
+# ---------------------------------------------------------
+# One array per numeric field instead of one dict per book: ids, prices and
+# stock are machine values, authors and cover names are stored once and
+# referenced by a 4-byte code, and descriptions live in an mmap'd temp file
+# (the OS pages them in and out; they never sit on the Python heap).
+FIELDS = ('id', 'title', 'author', 'price', 'description', 'stock', 'image')
+_FIELD_SET = frozenset(FIELDS)
+
+
+class _Interned:
+    """Each distinct value stored once; rows hold a 32-bit code."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+        self.codes = array('I')
+
+    def append(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+
+class BookView(Mapping):
+    """Read-only dict-like view of one row. Templates (book.title),
+    book['price'], book.get('stock') and dict(book) all work; copy it with
+    dict() before changing anything."""
+
+    __slots__ = ('_catalog', '_row')
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._catalog._value(self._row, key)
+
+    def __iter__(self):
+        yield from FIELDS
+        yield from self._catalog._extra.get(self._row, ())
+
+    def __len__(self):
+        return len(FIELDS) + len(self._catalog._extra.get(self._row, ()))
+
+    def __repr__(self):
+        return 'BookView(%r)' % dict(self)
+
+
+class ColumnarCatalog(Sequence):
+    """The catalog as columns, rows sorted by id (lookups are a bisect on the
+    id array, no per-book dict). Iterating yields BookViews in id order.
+    Raises ValueError for non-integer ids."""
+
+    def __init__(self, books):
+        self.ids = array('q')
+        self.prices = array('d')
+        self.stock = array('q')
+        self.titles = []
+        self.authors = _Interned()
+        self.images = _Interned()
+        self._extra = {}          # row -> {field: value} for fields outside FIELDS
+        self._offsets = array('Q', [0])
+        descriptions = tempfile.TemporaryFile()
+
+        for row, book in enumerate(sorted(books, key=lambda b: int(b['id']))):
+            self.ids.append(int(book['id']))
+            self.prices.append(float(book.get('price') or 0))
+            self.stock.append(int(book.get('stock') or 0))
+            self.titles.append(book.get('title'))
+            self.authors.append(book.get('author'))
+            self.images.append(book.get('image'))
+            encoded = (book.get('description') or '').encode('utf-8')
+            descriptions.write(encoded)
+            self._offsets.append(self._offsets[-1] + len(encoded))
+            if book.keys() - _FIELD_SET:
+                self._extra[row] = {k: v for k, v in book.items() if k not in _FIELD_SET}
+
+        descriptions.flush()
+        # mmap can't map an empty file
+        self._descriptions = mmap.mmap(descriptions.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b''
+        self._descriptions_file = descriptions
+
+    def _value(self, row, key):
+        if key == 'id':
+            return self.ids[row]
+        if key == 'title':
+            return self.titles[row]
+        if key == 'author':
+            return self.authors[row]
+        if key == 'price':
+            return self.prices[row]
+        if key == 'stock':
+            return self.stock[row]
+        if key == 'image':
+            return self.images[row]
+        if key == 'description':
+            return self._descriptions[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+        return self._extra.get(row, {})[key]
+
+    def row_of(self, book_id):
+        """Row index for an id (int or str), or None."""
+        try:
+            book_id = int(book_id)
+        except (TypeError, ValueError):
+            return None
+        row = bisect.bisect_left(self.ids, book_id)
+        return row if row < len(self.ids) and self.ids[row] == book_id else None
+
+    def set_stock(self, stock_by_id):
+        """Updates the stock column in place for {id: stock}; ids not in
+        the catalog are ignored."""
+        for book_id, stock in stock_by_id.items():
+            row = self.row_of(book_id)
+            if row is not None:
+                self.stock[row] = int(stock)
+
+    def get(self, book_id, default=None):
+        row = self.row_of(book_id)
+        return default if row is None else BookView(self, row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [BookView(self, row) for row in range(*index.indices(len(self.ids)))]
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError(index)
+        return BookView(self, index)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def stats(self):
+        return {
+            'layout': 'columnar',
+            'authors': len(self.authors.values),
+            'images': len(self.images.values),
+            'description_bytes': self._offsets[-1],
+        }
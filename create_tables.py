@@ -0,0 +1,123 @@
+import aws_clients
+from botocore.exceptions import ClientError
+
+# AWS Configuration (set AWS_ENDPOINT_URL to target DynamoDB Local)
+REGION = 'us-east-1'
+
+def S(name):
+    return {'AttributeName': name, 'AttributeType': 'S'}
+
+def key_schema(hash_key, range_key=None):
+    schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    if range_key:
+        schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+    return schema
+
+def gsi(name, hash_key, range_key=None):
+    return {
+        'IndexName': name,
+        'KeySchema': key_schema(hash_key, range_key),
+        'Projection': {'ProjectionType': 'ALL'},
+    }
+
+# Table name -> (key schema, attribute definitions, GSIs)
+TABLES = {
+    'Books': (
+        key_schema('id'),
+        [S('id'), S('author_key'), S('title_initial'), S('title_lower')],
+        [gsi('author-index', 'author_key'),
+         gsi('title-index', 'title_initial', 'title_lower')],
+    ),
+    'Users': (
+        key_schema('email'),
+        [S('email')],
+        [],
+    ),
+    'Orders': (
+        key_schema('order_id'),
+        [S('order_id'), S('user_id'), S('order_date'), S('order_shard')],
+        [gsi('user_id-order_date-index', 'user_id', 'order_date'),
+         gsi('order_shard-order_date-index', 'order_shard', 'order_date')],
+    ),
+    # Single 'global' item of atomic counters for the admin dashboard
+    'Stats': (
+        key_schema('name'),
+        [S('name')],
+        [],
+    ),
+    # Per-user carts: one 'cart' entry per user (cart.DynamoCartStore)
+    'Carts': (
+        key_schema('user_key', 'entry'),
+        [S('user_key'), S('entry')],
+        [],
+    ),
+    # Server-side Flask sessions (sessions.DynamoSessionStore)
+    'Sessions': (
+        key_schema('sid'),
+        [S('sid')],
+        [],
+    ),
+}
+
+# Table name -> attribute DynamoDB TTL deletes expired items by
+TTL_ATTRIBUTES = {'Sessions': 'expires_at'}
+
+def create_table(dynamodb, name):
+    keys, attributes, indexes = TABLES[name]
+    params = {
+        'TableName': name,
+        'KeySchema': keys,
+        'AttributeDefinitions': attributes,
+        'BillingMode': 'PAY_PER_REQUEST',
+    }
+    if indexes:
+        params['GlobalSecondaryIndexes'] = indexes
+    table = dynamodb.create_table(**params)
+    table.wait_until_exists()
+    print(f"✅ Created table: {name}")
+
+def add_missing_indexes(dynamodb, name):
+    """Adds GSIs to a table that was created by hand before they existed."""
+    keys, attributes, indexes = TABLES[name]
+    table = dynamodb.Table(name)
+    existing = {i['IndexName'] for i in (table.global_secondary_indexes or [])}
+    for index in indexes:
+        if index['IndexName'] in existing:
+            continue
+        # DynamoDB only allows one GSI creation per UpdateTable call
+        dynamodb.meta.client.update_table(
+            TableName=name,
+            AttributeDefinitions=attributes,
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        print(f"✅ Creating index {index['IndexName']} on {name} (backfills in the background)")
+        print("   Run this script again once it is ACTIVE to add any remaining indexes.")
+        return
+
+def enable_ttl(dynamodb, name):
+    client = dynamodb.meta.client
+    current = client.describe_time_to_live(TableName=name)['TimeToLiveDescription']
+    if current.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        return
+    client.update_time_to_live(
+        TableName=name,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTES[name]}
+    )
+    print(f"✅ Enabled TTL on {name}.{TTL_ATTRIBUTES[name]}")
+
+def create_all(dynamodb):
+    for name in TABLES:
+        try:
+            create_table(dynamodb, name)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceInUseException':
+                raise
+            print(f"ℹ️  Table {name} already exists, checking indexes...")
+            add_missing_indexes(dynamodb, name)
+        if name in TTL_ATTRIBUTES:
+            enable_ttl(dynamodb, name)
+
+if __name__ == '__main__':
+    print("📦 Provisioning BookBazar tables...")
+    create_all(aws_clients.resource('dynamodb', REGION))
+    print("🎉 Tables ready!")
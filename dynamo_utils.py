@@ -0,0 +1,85 @@
+import time
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+# ---------------------------------------------------------
+# DynamoDB Helpers (shared by app_aws.py and the catalog store)
+# ---------------------------------------------------------
+BATCH_GET_LIMIT = 100   # BatchGetItem accepts at most 100 keys per call
+TRANSACT_ITEMS_LIMIT = 100   # TransactWriteItems accepts at most 100 actions
+MAX_BATCH_RETRIES = 8
+
+_deserializer = TypeDeserializer()
+
+
+class TransactionCancelled(Exception):
+    """A TransactWriteItems call was cancelled. `reasons` is aligned with
+    the actions that were sent: one {'Code': ..., 'Item': ...} per action."""
+
+    def __init__(self, reasons):
+        super().__init__('Transaction cancelled: %s' % [r.get('Code') for r in reasons])
+        self.reasons = reasons
+
+
+def chunked(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def batch_get(table, keys, projection=None, consistent=False, fanout=None):
+    """Fetches many items from one table with chunked BatchGetItem calls
+    (run concurrently through `fanout`, a fanout.FanOut, when given).
+
+    UnprocessedKeys (throttling / 16 MB response cap) are retried with
+    exponential backoff. Returns the list of items that exist.
+    """
+    client = table.meta.client
+    # BatchGetItem rejects duplicate keys inside one request
+    unique = list({tuple(sorted(k.items())): k for k in keys}.values())
+
+    def fetch(chunk):
+        items = []
+        request = {'Keys': chunk, 'ConsistentRead': consistent}
+        if projection:
+            request['ProjectionExpression'] = ', '.join('#p%d' % i for i in range(len(projection)))
+            request['ExpressionAttributeNames'] = {'#p%d' % i: name for i, name in enumerate(projection)}
+        pending = {table.name: request}
+        attempt = 0
+        while pending:
+            response = client.batch_get_item(RequestItems=pending)
+            items.extend(response.get('Responses', {}).get(table.name, []))
+            pending = response.get('UnprocessedKeys') or {}
+            if pending:
+                attempt += 1
+                if attempt > MAX_BATCH_RETRIES:
+                    raise RuntimeError('BatchGetItem still had unprocessed keys after %d retries' % MAX_BATCH_RETRIES)
+                time.sleep(min(0.05 * (2 ** attempt), 2.0))
+        return items
+
+    chunks = list(chunked(unique, BATCH_GET_LIMIT))
+    results = fanout.map(fetch, chunks) if fanout else [fetch(chunk) for chunk in chunks]
+    return [item for items in results for item in items]
+
+
+def transact_write(client, actions):
+    """Runs one TransactWriteItems call (at most TRANSACT_ITEMS_LIMIT actions).
+
+    Raises TransactionCancelled with per-action reasons when a condition
+    fails. Items returned by ReturnValuesOnConditionCheckFailure come back
+    as plain Python values.
+    """
+    if len(actions) > TRANSACT_ITEMS_LIMIT:
+        raise ValueError('A transaction can hold at most %d actions' % TRANSACT_ITEMS_LIMIT)
+    try:
+        client.transact_write_items(TransactItems=actions)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+            raise
+        reasons = []
+        for reason in e.response.get('CancellationReasons', []):
+            reason = dict(reason)
+            if 'Item' in reason:
+                reason['Item'] = {k: _deserializer.deserialize(v) for k, v in reason['Item'].items()}
+            reasons.append(reason)
+        raise TransactionCancelled(reasons)
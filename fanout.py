@@ -0,0 +1,109 @@
+import os
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from flask import g, has_app_context
+
+# ---------------------------------------------------------
+# Concurrent Fan-Out for Independent Backend Calls
+# ---------------------------------------------------------
+# One pool shared by all requests; FANOUT_WORKERS=0 runs every call inline
+# (the sequential path). Each request keeps at most FANOUT_PER_REQUEST calls
+# on the pool at once, so one big cart can't take every worker.
+FANOUT_WORKERS = int(os.environ.get('FANOUT_WORKERS', 16))
+FANOUT_PER_REQUEST = int(os.environ.get('FANOUT_PER_REQUEST', 4))
+
+_worker = threading.local()
+
+
+class FanOut:
+    """Runs independent calls concurrently and waits for all of them.
+
+    run(f, g, h) returns [f(), g(), h()] in order. Calls go to the pool
+    while the request has slots left; the rest run in the calling thread,
+    which would otherwise only be waiting. Calls made from a pool worker
+    (nested fan-out) run inline, so the pool can never deadlock on itself.
+    Workers see the caller's Flask context (g, request) and metrics.
+    """
+
+    def __init__(self, workers=FANOUT_WORKERS, per_request=FANOUT_PER_REQUEST):
+        self.workers = workers
+        self.per_request = max(1, per_request)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fanout',
+                                        initializer=_mark_worker) if workers > 0 else None
+        self._lock = threading.Lock()
+        self.fanouts = 0
+        self.pooled_calls = 0
+        self.inline_calls = 0
+
+    def _request_slots(self):
+        if has_app_context():
+            if 'fanout_slots' not in g:
+                g.fanout_slots = threading.BoundedSemaphore(self.per_request)
+            return g.fanout_slots
+        return threading.BoundedSemaphore(self.per_request)
+
+    def run(self, *calls):
+        """Calls each zero-argument callable and returns the results in
+        order. If any call raised, the first exception is re-raised once
+        every call has finished."""
+        if self._pool is None or len(calls) < 2 or getattr(_worker, 'active', False):
+            with self._lock:
+                self.inline_calls += len(calls)
+            return [call() for call in calls]
+
+        slots = self._request_slots()
+        outcomes = [None] * len(calls)
+        futures = []
+        inline = 0
+        for i, call in enumerate(calls):
+            if slots.acquire(blocking=False):
+                future = self._pool.submit(contextvars.copy_context().run, call)
+                future.add_done_callback(lambda _, slots=slots: slots.release())
+                futures.append((i, future))
+            else:
+                outcomes[i] = _outcome(call)
+                inline += 1
+        for i, future in futures:
+            try:
+                outcomes[i] = (future.result(), None)
+            except Exception as e:
+                outcomes[i] = (None, e)
+        with self._lock:
+            self.fanouts += 1
+            self.pooled_calls += len(futures)
+            self.inline_calls += inline
+
+        for _, error in outcomes:
+            if error is not None:
+                raise error
+        return [result for result, _ in outcomes]
+
+    def map(self, fn, items):
+        """[fn(item) for item in items], concurrently."""
+        return self.run(*(partial(fn, item) for item in items))
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'per_request': self.per_request,
+            'fanouts': self.fanouts,
+            'pooled_calls': self.pooled_calls,
+            'inline_calls': self.inline_calls,
+        }
+
+
+def _mark_worker():
+    _worker.active = True
+
+
+def _outcome(call):
+    try:
+        return call(), None
+    except Exception as e:
+        return None, e
+
+
+# Stores fall back to this when no fan-out is configured
+SEQUENTIAL = FanOut(workers=0)
@@ -0,0 +1,277 @@
+import io
+import os
+import re
+import sys
+import time
+import hashlib
+import tempfile
+from flask import send_from_directory, url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# ---------------------------------------------------------
+# Cover Image Pipeline (validate, resize, content-hash names)
+# ---------------------------------------------------------
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_PIXELS = 40_000_000
+ALLOWED_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+# Bounding boxes (width, height). 'card' fits the 300px-high browse card,
+# 'detail' the 500px-high details page at up to 2x density.
+VARIANTS = {'card': (240, 360), 'detail': (600, 900)}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+
+# Uploaded originals are named <20 hex chars of sha256><ext>; their bytes
+# never change, so they (and their variants) can be cached forever.
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{20}(-[a-z]+)?\.[a-z]+$')
+VARIANT_NAME_RE = re.compile(r'-(%s)\.(jpg|webp)$' % '|'.join(VARIANTS))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = 3600
+
+# Uploads wait here (inside the image folder) until a worker processes them
+STAGING_DIR = '.incoming'
+# A full orphan sweep leaves recent files alone: their book may not point
+# at them yet (upload still being processed)
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def variant_name(image, variant, ext):
+    stem = os.path.splitext(image)[0]
+    return f'{stem}-{variant}.{ext}'
+
+
+def _load(data):
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise InvalidImage(f'Image is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.')
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            fmt = probe.format
+            if fmt not in ALLOWED_FORMATS:
+                raise InvalidImage('Unsupported image type (use JPEG, PNG, WebP or GIF).')
+            if probe.width * probe.height > MAX_PIXELS:
+                raise InvalidImage('Image dimensions are too large.')
+            probe.verify()
+        # verify() leaves the image unusable; decode a fresh copy
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImage('File is not a valid image.')
+    return image, ALLOWED_FORMATS[fmt]
+
+
+def _to_rgb(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _check_header(data):
+    """Cheap request-time check (no pixel decoding): size and format."""
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise InvalidImage(f'Image is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.')
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            if probe.format not in ALLOWED_FORMATS:
+                raise InvalidImage('Unsupported image type (use JPEG, PNG, WebP or GIF).')
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise InvalidImage('File is not a valid image.')
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix='.upload.', suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ImagePipeline:
+    """Stores uploaded covers in `folder` under content-hash names and
+    writes resized JPEG + WebP variants next to them."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._known_variants = set()
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def write_variants(self, image, name):
+        """Writes every size of `image` (a PIL image) for original `name`."""
+        rgb = _to_rgb(image)
+        for variant, box in VARIANTS.items():
+            resized = rgb.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+            for ext, fmt, options in (('jpg', 'JPEG', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}),
+                                      ('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 4})):
+                out = io.BytesIO()
+                resized.save(out, fmt, **options)
+                _write_atomic(self._path(variant_name(name, variant, ext)), out.getvalue())
+
+    def store(self, data):
+        """Validates image bytes and returns their stored filename.
+        Identical uploads map to the same file and are only processed once."""
+        image, ext = _load(data)
+        name = hashlib.sha256(data).hexdigest()[:20] + ext
+        if os.path.exists(self._path(name)):
+            # Re-uploaded: restart the orphan grace period
+            os.utime(self._path(name))
+        else:
+            self.write_variants(image, name)
+            # Original last: its presence means the variants are complete
+            _write_atomic(self._path(name), data)
+        return name
+
+    def save_upload(self, file_storage):
+        """Processes an upload inline and returns its stored filename."""
+        return self.store(file_storage.read(MAX_UPLOAD_BYTES + 1))
+
+    def stage(self, file_storage):
+        """Writes an upload to the staging folder for process_staged()
+        after a header-only check. Returns the staged path."""
+        data = file_storage.read(MAX_UPLOAD_BYTES + 1)
+        _check_header(data)
+        staging = self._path(STAGING_DIR)
+        os.makedirs(staging, exist_ok=True)
+        fd, staged_path = tempfile.mkstemp(suffix='.upload', dir=staging)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        return staged_path
+
+    def delete(self, name):
+        """Removes an original and its variants (missing files are ignored)."""
+        names = [name] + [variant_name(name, v, ext) for v in VARIANTS for ext in ('jpg', 'webp')]
+        for n in names:
+            self._known_variants.discard(n)
+            try:
+                os.remove(self._path(n))
+            except OSError:
+                pass
+
+    def reclaim(self, referenced, candidates=None, include_legacy=False):
+        """Deletes covers no book references. `candidates` limits the check
+        to specific names (a deleted or replaced cover); otherwise the whole
+        folder is swept, skipping files younger than ORPHAN_GRACE_SECONDS.
+        Only content-hash names are touched unless include_legacy is set.
+        Returns the removed names."""
+        sweep = candidates is None
+        if sweep:
+            candidates = [n for n in os.listdir(self.folder)
+                          if not n.startswith('.') and not VARIANT_NAME_RE.search(n)
+                          and os.path.isfile(self._path(n))]
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        removed = []
+        for name in candidates:
+            if not name or name in referenced or name == 'default_book.jpg' or os.sep in name:
+                continue
+            if not include_legacy and not HASHED_NAME_RE.match(name):
+                continue
+            try:
+                if sweep and os.path.getmtime(self._path(name)) > cutoff:
+                    continue
+            except OSError:
+                continue
+            self.delete(name)
+            removed.append(name)
+        if sweep:
+            # Staged uploads whose worker died
+            staging = self._path(STAGING_DIR)
+            for name in os.listdir(staging) if os.path.isdir(staging) else []:
+                path = os.path.join(staging, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+        return removed
+
+    def _has(self, name):
+        if name in self._known_variants:
+            return True
+        if os.path.exists(self._path(name)):
+            self._known_variants.add(name)
+            return True
+        return False
+
+    def sources(self, image, variant='card'):
+        """URLs for a <picture>: {'src', 'srcset', 'webp_srcset'}. Covers
+        without generated variants fall back to the original file."""
+        image = image or 'default_book.jpg'
+        original = url_for('cover', filename=image)
+        larger = 'detail' if variant == 'card' else None
+        jpg = variant_name(image, variant, 'jpg')
+        if not self._has(jpg):
+            return {'src': original, 'srcset': None, 'webp_srcset': None}
+        src = url_for('cover', filename=jpg)
+        srcset = [src + ' 1x']
+        webp_srcset = [url_for('cover', filename=variant_name(image, variant, 'webp')) + ' 1x']
+        if larger:
+            srcset.append(url_for('cover', filename=variant_name(image, larger, 'jpg')) + ' 2x')
+            webp_srcset.append(url_for('cover', filename=variant_name(image, larger, 'webp')) + ' 2x')
+        return {'src': src, 'srcset': ', '.join(srcset), 'webp_srcset': ', '.join(webp_srcset)}
+
+    def send(self, filename):
+        """Serves a cover. Content-hash names are immutable; legacy names
+        (which an upload could overwrite) get a short max-age. Flask adds
+        the ETag and answers If-None-Match with 304."""
+        immutable = bool(HASHED_NAME_RE.match(filename))
+        response = send_from_directory(self.folder, filename,
+                                       max_age=IMMUTABLE_MAX_AGE if immutable else LEGACY_MAX_AGE)
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+    def backfill(self):
+        """Generates missing variants for covers already in the folder
+        (e.g. the seeded static/images files). Returns the count."""
+        done = 0
+        for name in sorted(os.listdir(self.folder)):
+            if name.startswith('.') or VARIANT_NAME_RE.search(name):
+                continue
+            if all(os.path.exists(self._path(variant_name(name, v, 'webp'))) for v in VARIANTS):
+                continue
+            try:
+                with open(self._path(name), 'rb') as file:
+                    image, _ = _load(file.read())
+            except InvalidImage as e:
+                print(f"⚠️  Skipping {name}: {e}")
+                continue
+            self.write_variants(image, name)
+            done += 1
+        return done
+
+
+def process_staged(folder, staged_path):
+    """Job-worker entry point (runs in a child process): stores a staged
+    upload via ImagePipeline.store and removes the staged copy."""
+    try:
+        with open(staged_path, 'rb') as file:
+            data = file.read()
+        return ImagePipeline(folder).store(data)
+    finally:
+        try:
+            os.remove(staged_path)
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    # python images.py [static/images]
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'static/images'
+    print(f"🖼️  Generating card/detail variants in {folder}...")
+    print(f"🎉 Processed {ImagePipeline(folder).backfill()} covers.")
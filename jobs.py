@@ -0,0 +1,164 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from images import process_staged
+
+# ---------------------------------------------------------
+# Background Jobs (local process pool, off the request path)
+# ---------------------------------------------------------
+# Concurrent image jobs; 0 runs them inline in the request (no subprocesses)
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', min(2, os.cpu_count() or 1)))
+MAX_TRACKED_JOBS = 500
+
+
+def _mp_context():
+    # Never fork the web process: its request/fan-out threads may hold locks
+    # that the child would inherit held. forkserver/spawn start workers from
+    # a fresh interpreter, which imports the job function's module
+    # (images.process_staged) and re-runs the __main__ script as __mp_main__,
+    # so that script must be import-safe (see JOB_WORKER in app.py/app_aws.py).
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class JobQueue:
+    """CPU-bound jobs run in a process pool; their completion callbacks and
+    I/O jobs run on a single background thread. Status is kept for the last
+    MAX_TRACKED_JOBS jobs of this process."""
+
+    def __init__(self, workers=IMAGE_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._pool = None
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='jobs-io')
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def _processes(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+            return self._pool
+
+    def _track(self, kind, info):
+        job = {'id': uuid.uuid4().hex[:16], 'kind': kind, 'status': 'queued',
+               'submitted_at': time.time(), 'finished_at': None, 'result': None, 'error': None}
+        job.update(info)
+        with self._lock:
+            self._jobs[job['id']] = job
+            self.submitted += 1
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                old_id, _ = self._jobs.popitem(last=False)
+                self._futures.pop(old_id, None)
+        return job
+
+    def _finish(self, job, run, on_success):
+        try:
+            result = run()
+            if on_success is not None:
+                on_success(result)
+        except Exception as e:
+            with self._lock:
+                job.update(status='failed', error=str(e) or e.__class__.__name__, finished_at=time.time())
+                self.failed += 1
+                self._futures.pop(job['id'], None)
+            return
+        with self._lock:
+            job.update(status='done', result=result, finished_at=time.time())
+            self.succeeded += 1
+            self._futures.pop(job['id'], None)
+
+    def submit(self, kind, fn, *args, on_success=None, **info):
+        """Runs fn(*args) in the process pool, then on_success(result) on the
+        background thread. Returns the job id."""
+        job = self._track(kind, info)
+        if self.workers <= 0:
+            self._finish(job, lambda: fn(*args), on_success)
+            return job['id']
+        future = self._processes().submit(fn, *args)
+        with self._lock:
+            self._futures[job['id']] = future
+        # Done callbacks run on the pool's manager thread; hand off quickly
+        future.add_done_callback(lambda f: self._io.submit(self._finish, job, f.result, on_success))
+        return job['id']
+
+    def submit_io(self, kind, fn, *args, **info):
+        """Runs fn(*args) on the background thread. Returns the job id."""
+        job = self._track(kind, info)
+        job['status'] = 'running'
+        self._io.submit(self._finish, job, lambda: fn(*args), None)
+        return job['id']
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self._futures.get(job_id)
+        if job['status'] == 'queued' and future is not None and future.running():
+            job['status'] = 'running'
+        return job
+
+    def recent(self, limit=20):
+        with self._lock:
+            ids = list(self._jobs)[-limit:]
+        return [self.get(job_id) for job_id in reversed(ids)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': len(self._futures),
+                'submitted': self.submitted,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+            }
+
+
+class CoverJobs:
+    """Cover-image work for one app: the request only stages the upload;
+    resizing/encoding runs in the pool and then points the book at the
+    result. Replaced or deleted covers are reclaimed in the background.
+    `on_attach()` is called after a book's cover changes."""
+
+    def __init__(self, queue, pipeline, catalog, on_attach=None):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.catalog = catalog
+        self.on_attach = on_attach
+
+    def stage(self, file_storage):
+        """Request-side step; raises images.InvalidImage for non-images."""
+        return self.pipeline.stage(file_storage)
+
+    def submit(self, book_id, staged_path):
+        """Queues a staged upload for `book_id`; returns the job id."""
+        return self.queue.submit('cover', process_staged, self.pipeline.folder, staged_path,
+                                 on_success=lambda name: self._attach(book_id, name),
+                                 book_id=str(book_id))
+
+    def _attach(self, book_id, name):
+        old = self.catalog.set_image(book_id, name)
+        if old is not None and self.on_attach is not None:
+            self.on_attach()
+        if old is None:
+            # Book deleted while its cover was processing
+            self.reclaim([name])
+        elif old != name:
+            self.reclaim([old])
+
+    def reclaim(self, candidates=None, include_legacy=False):
+        """Deletes unreferenced covers (`candidates`, or a full sweep)."""
+        return self.queue.submit_io('reclaim', self._reclaim, candidates, include_legacy)
+
+    def _reclaim(self, candidates, include_legacy):
+        return self.pipeline.reclaim(self.catalog.image_names(), candidates, include_legacy)
@@ -0,0 +1,329 @@
+import os
+import io
+import time
+import random
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from flask import g, request, has_request_context, before_render_template, template_rendered
+
+# ---------------------------------------------------------
+# Instrumentation (route timings, backend calls, /metrics)
+# ---------------------------------------------------------
+# Server-Timing header on every response ('0' turns it off)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+# Optional bearer token for /metrics (otherwise: localhost or the admin)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Sampling profiler: endpoints to profile and the fraction of their requests
+PROFILE_ENDPOINTS = [e for e in os.environ.get('PROFILE_ENDPOINTS', '').split(',') if e]
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.01))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _labels(names, values):
+    pairs = ('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(names, values))
+    return '{' + ','.join(pairs) + '}' if names else ''
+
+
+class Registry:
+    """Counters, timers and histograms kept in this process, rendered in the
+    Prometheus text format. Multi-worker servers expose one set per worker
+    (scrape each, or sum in the query)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}          # (endpoint, method, status) -> count
+        self.latency = {}           # endpoint -> _Histogram
+        self.backend = {}           # (backend, operation) -> [calls, seconds, errors]
+        self.backend_by_endpoint = {}  # (endpoint, backend, operation) -> calls
+        self.timers = {}            # name -> [count, seconds]
+        self.gauges = []            # (name, help, fn)
+
+    def record_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(endpoint, _Histogram()).observe(seconds)
+
+    def record_backend(self, backend, operation, seconds, error=False):
+        endpoint = _endpoint()
+        with self._lock:
+            entry = self.backend.setdefault((backend, operation), [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += 1 if error else 0
+            key = (endpoint, backend, operation)
+            self.backend_by_endpoint[key] = self.backend_by_endpoint.get(key, 0) + 1
+        _add_to_request(backend, seconds)
+
+    def record_timer(self, name, seconds):
+        with self._lock:
+            entry = self.timers.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        _add_to_request(name, seconds)
+
+    def register_gauge(self, name, help_text, fn):
+        """fn() -> number, read on every scrape."""
+        self.gauges.append((name, help_text, fn))
+
+    def render(self):
+        out = io.StringIO()
+
+        def family(name, kind, help_text):
+            out.write(f'# HELP {name} {help_text}\n# TYPE {name} {kind}\n')
+
+        with self._lock:
+            family('bookbazar_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status.')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                out.write(f'bookbazar_http_requests_total{_labels(("endpoint", "method", "status"), (endpoint, method, status))} {count}\n')
+            family('bookbazar_http_request_duration_seconds', 'histogram', 'Time spent handling a request.')
+            for endpoint, hist in sorted(self.latency.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    out.write(f'bookbazar_http_request_duration_seconds_bucket{_labels(("endpoint", "le"), (endpoint, bound))} {count}\n')
+                out.write(f'bookbazar_http_request_duration_seconds_bucket{_labels(("endpoint", "le"), (endpoint, "+Inf"))} {hist.count}\n')
+                out.write(f'bookbazar_http_request_duration_seconds_sum{_labels(("endpoint",), (endpoint,))} {hist.sum:.6f}\n')
+                out.write(f'bookbazar_http_request_duration_seconds_count{_labels(("endpoint",), (endpoint,))} {hist.count}\n')
+            family('bookbazar_backend_calls_total', 'counter', 'DynamoDB / SNS / SQLite calls by operation.')
+            for (backend, operation), (calls, _, _) in sorted(self.backend.items()):
+                out.write(f'bookbazar_backend_calls_total{_labels(("backend", "operation"), (backend, operation))} {calls}\n')
+            family('bookbazar_backend_call_errors_total', 'counter', 'Backend calls that raised.')
+            for (backend, operation), (_, _, errors) in sorted(self.backend.items()):
+                out.write(f'bookbazar_backend_call_errors_total{_labels(("backend", "operation"), (backend, operation))} {errors}\n')
+            family('bookbazar_backend_call_seconds_total', 'counter', 'Time spent in backend calls (including retries).')
+            for (backend, operation), (_, seconds, _) in sorted(self.backend.items()):
+                out.write(f'bookbazar_backend_call_seconds_total{_labels(("backend", "operation"), (backend, operation))} {seconds:.6f}\n')
+            family('bookbazar_endpoint_backend_calls_total', 'counter', 'Backend calls made while serving each endpoint (divide by requests for calls per request).')
+            for (endpoint, backend, operation), calls in sorted(self.backend_by_endpoint.items()):
+                out.write(f'bookbazar_endpoint_backend_calls_total{_labels(("endpoint", "backend", "operation"), (endpoint, backend, operation))} {calls}\n')
+            family('bookbazar_timer_seconds_total', 'counter', 'Time spent in timed sections (render, file I/O).')
+            for name, (_, seconds) in sorted(self.timers.items()):
+                out.write(f'bookbazar_timer_seconds_total{_labels(("section",), (name,))} {seconds:.6f}\n')
+            family('bookbazar_timer_calls_total', 'counter', 'Timed sections entered.')
+            for name, (count, _) in sorted(self.timers.items()):
+                out.write(f'bookbazar_timer_calls_total{_labels(("section",), (name,))} {count}\n')
+            gauges = list(self.gauges)
+        for name, help_text, fn in gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            family(name, 'gauge', help_text)
+            out.write(f'{name} {value}\n')
+        return out.getvalue()
+
+
+REGISTRY = Registry()
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+def _add_to_request(name, seconds):
+    """Adds to the current request's Server-Timing entry, if any."""
+    if has_request_context() and 'request_timings' in g:
+        entry = g.request_timings.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+@contextmanager
+def timed(name):
+    """Times a block (file I/O, ...) into the `name` timer; also usable as a
+    decorator."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.record_timer(name, time.perf_counter() - started)
+
+
+@contextmanager
+def backend_call(backend, operation):
+    """Counts and times one call to a backend without botocore hooks (SQLite)."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        REGISTRY.record_backend(backend, operation, time.perf_counter() - started, error=True)
+        raise
+    REGISTRY.record_backend(backend, operation, time.perf_counter() - started)
+
+
+# ---------------------------------------------------------
+# botocore Hooks (every DynamoDB / SNS API call, retries included)
+# ---------------------------------------------------------
+def instrument_client(service, low_level_client):
+    events = low_level_client.meta.events
+
+    def before_call(model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+
+    def after_call(model, context, **kwargs):
+        started = context.pop('metrics_started', None)
+        if started is not None:
+            REGISTRY.record_backend(service, model.name, time.perf_counter() - started)
+
+    def after_call_error(model, context, **kwargs):
+        started = context.pop('metrics_started', None)
+        if started is not None:
+            REGISTRY.record_backend(service, model.name, time.perf_counter() - started, error=True)
+
+    events.register('before-call.*.*', before_call)
+    events.register('after-call.*.*', after_call)
+    events.register('after-call-error.*.*', after_call_error)
+
+
+# ---------------------------------------------------------
+# Sampling Profiler (cProfile on a fraction of chosen endpoints)
+# ---------------------------------------------------------
+class SamplingProfiler:
+    """Profiles PROFILE_SAMPLE_RATE of the requests to PROFILE_ENDPOINTS and
+    accumulates the results per endpoint. Only one request is profiled at
+    a time (a sample is skipped while another is running)."""
+
+    def __init__(self, endpoints=PROFILE_ENDPOINTS, rate=PROFILE_SAMPLE_RATE):
+        self.endpoints = set(endpoints)
+        self.rate = rate
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.samples = {}
+
+    def configure(self, endpoints, rate):
+        self.endpoints = set(endpoints)
+        self.rate = rate
+
+    def start(self):
+        if request.endpoint not in self.endpoints or random.random() >= self.rate:
+            return
+        if not self._busy.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active
+            self._busy.release()
+            return
+        g.profile = profile
+
+    def stop(self):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        profile.disable()
+        self._busy.release()
+        with self._lock:
+            endpoint = request.endpoint
+            if endpoint in self._stats:
+                self._stats[endpoint].add(profile)
+            else:
+                self._stats[endpoint] = pstats.Stats(profile)
+            self.samples[endpoint] = self.samples.get(endpoint, 0) + 1
+
+    def report(self, endpoint, limit=40, sort='cumulative'):
+        """Top functions for `endpoint` as text (None if never sampled)."""
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                return None
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats(sort).print_stats(limit)
+            return f'{self.samples[endpoint]} sampled requests\n' + out.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.samples.clear()
+
+    def status(self):
+        return {'endpoints': sorted(self.endpoints), 'rate': self.rate, 'samples': dict(self.samples)}
+
+
+# ---------------------------------------------------------
+# Flask Hooks
+# ---------------------------------------------------------
+def _server_timing(total, timings):
+    parts = [f'app;dur={total * 1000:.1f}']
+    for name, (count, seconds) in sorted(timings.items()):
+        parts.append(f'{name};desc="{count} calls";dur={seconds * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def init_app(app, registry=REGISTRY, profiler=None):
+    """Registers request timing, render timing and Server-Timing on `app`."""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_timings = {}
+        g.render_depth = 0
+        if profiler is not None:
+            profiler.start()
+
+    @app.after_request
+    def finish_request_timer(response):
+        if profiler is not None:
+            profiler.stop()
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        registry.record_request(request.endpoint or 'unknown', request.method, response.status_code, total)
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = _server_timing(total, g.request_timings)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # after_request is skipped when the view raised
+        if profiler is not None and 'profile' in g:
+            profiler.stop()
+
+    def render_started(sender, template, context, **extra):
+        if 'render_depth' not in g:
+            return
+        g.render_depth += 1
+        if g.render_depth == 1:
+            g.render_started = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        if 'render_depth' not in g:
+            return
+        g.render_depth -= 1
+        if g.render_depth == 0:
+            # Fragments rendered inside a page count towards the page
+            registry.record_timer('render', time.perf_counter() - g.render_started)
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+
+def metrics_allowed(is_admin):
+    """/metrics access: the METRICS_TOKEN bearer token when one is set,
+    otherwise localhost scrapes or a logged-in admin."""
+    if METRICS_TOKEN:
+        return request.headers.get('Authorization') == 'Bearer ' + METRICS_TOKEN
+    return is_admin or request.remote_addr in ('127.0.0.1', '::1')
@@ -0,0 +1,151 @@
+import json
+import time
+import queue
+import random
+import atexit
+import threading
+from datetime import datetime
+from botocore.exceptions import ClientError, BotoCoreError
+
+# ---------------------------------------------------------
+# Background SNS Notification Dispatcher
+# ---------------------------------------------------------
+# Errors worth retrying; anything else (bad ARN, auth) goes straight to dead-letter
+RETRYABLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'InternalError',
+    'InternalFailure', 'ServiceUnavailable', 'KMSThrottlingException', 'RequestTimeout',
+}
+
+
+class FakeSNSClient:
+    """Stand-in for boto3's SNS client for local runs and tests. Records every
+    publish; set fail_times to make the next N publishes raise."""
+
+    def __init__(self, fail_times=0, error_code='Throttling'):
+        self.published = []
+        self.fail_times = fail_times
+        self.error_code = error_code
+        self._lock = threading.Lock()
+
+    def publish(self, **kwargs):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ClientError({'Error': {'Code': self.error_code, 'Message': 'fake failure'}}, 'Publish')
+            self.published.append(kwargs)
+        return {'MessageId': str(len(self.published))}
+
+
+class NotificationDispatcher:
+    """Publishes SNS messages from worker threads so request handlers never
+    wait on SNS. The queue is bounded; when it is full, or a message keeps
+    failing after max_attempts, the message is appended to a dead-letter
+    JSON Lines file instead of being lost."""
+
+    def __init__(self, client, topic_arn, workers=2, max_queue=1000,
+                 max_attempts=5, base_delay=0.2, dead_letter_path='sns_dead_letter.jsonl'):
+        self.client = client
+        self.topic_arn = topic_arn
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.dead_letter_path = dead_letter_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._dead_letter_lock = threading.Lock()
+        self.counters = {'enqueued': 0, 'sent': 0, 'retries': 0, 'dead_lettered': 0, 'dropped_queue_full': 0}
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._run, name=f'sns-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        atexit.register(self.flush, 5.0)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def submit(self, subject, message):
+        """Queues a message and returns immediately."""
+        job = {'subject': subject, 'message': message, 'queued_at': time.time()}
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._count('dropped_queue_full')
+            self._dead_letter(job, 'queue full')
+            return False
+        self._count('enqueued')
+        return True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._deliver(job)
+            except Exception as e:
+                # Last resort: one bad message must never end the worker
+                print(f"Error delivering SNS message: {e!r}")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.client.publish(TopicArn=self.topic_arn, Subject=job['subject'], Message=job['message'])
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in RETRYABLE_CODES or attempt == self.max_attempts:
+                    self._dead_letter(job, f"{code}: {e}")
+                    return
+            except BotoCoreError as e:
+                # Connection / timeout errors are always worth another try
+                if attempt == self.max_attempts:
+                    self._dead_letter(job, str(e))
+                    return
+            except Exception as e:
+                # Bad payload, client bug: retrying won't help
+                self._dead_letter(job, f"{type(e).__name__}: {e}")
+                return
+            else:
+                latency = time.time() - job['queued_at']
+                with self._lock:
+                    self.counters['sent'] += 1
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+                return
+            self._count('retries')
+            # Exponential backoff with jitter
+            time.sleep(self.base_delay * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+    def _dead_letter(self, job, reason):
+        self._count('dead_lettered')
+        record = {
+            'subject': job['subject'],
+            'message': job['message'],
+            'reason': reason,
+            'failed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with self._dead_letter_lock:
+            try:
+                with open(self.dead_letter_path, 'a') as file:
+                    file.write(json.dumps(record, default=str) + '\n')
+            except OSError as e:
+                print(f"Error writing SNS dead-letter: {e}")
+
+    def flush(self, timeout=None):
+        """Waits (up to timeout seconds) for queued messages to be handled."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        with self._lock:
+            sent = self.counters['sent']
+            return dict(self.counters,
+                        queue_depth=self._queue.qsize(),
+                        avg_latency_ms=round(self.latency_total / sent * 1000, 2) if sent else 0.0,
+                        max_latency_ms=round(self.latency_max * 1000, 2))
@@ -0,0 +1,431 @@
+import io
+import os
+import csv
+import json
+import zlib
+import heapq
+import queue
+import threading
+from decimal import Decimal
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pagination import encode_cursor, decode_cursor, start_key
+
+# ---------------------------------------------------------
+# Order Model (one order per checkout, one line per book)
+# ---------------------------------------------------------
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Partitions of the recent-orders GSI. One takes ~1000 checkouts/s; after
+# changing it, run python stats.py to move existing orders.
+ORDER_SHARDS = int(os.environ.get('ORDER_SHARDS', 1))
+
+
+@dataclass(slots=True)
+class OrderLine:
+    book_id: str
+    title: str
+    quantity: int
+    unit_price: float      # Decimal when read from DynamoDB
+
+    @property
+    def total(self):
+        return self.unit_price * self.quantity
+
+
+@dataclass(slots=True)
+class Order:
+    order_id: object       # int (app.py) or UUID string (DynamoDB)
+    user_id: object
+    user_name: str
+    created_at: float      # epoch seconds
+    lines: list = field(default_factory=list)
+    status: str = 'Pending'
+
+    @property
+    def order_date(self):
+        return datetime.fromtimestamp(self.created_at).strftime(DATE_FORMAT)
+
+    @property
+    def units(self):
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def total(self):
+        return sum(line.total for line in self.lines)
+
+
+def order_shard(order_id, shards=ORDER_SHARDS):
+    """Recent-orders GSI partition of an order (stable per order_id)."""
+    return str(zlib.crc32(str(order_id).encode()) % shards)
+
+
+def order_to_item(order):
+    """Orders table item. order_date stays a string: it is the sort key
+    of both GSIs, and order_shard partitions the recent-orders one."""
+    return {
+        'order_id': order.order_id,
+        'user_id': order.user_id,
+        'user_name': order.user_name,
+        'status': order.status,
+        'order_date': order.order_date,
+        'order_shard': order_shard(order.order_id),
+        'lines': [{'book_id': line.book_id, 'title': line.title, 'quantity': line.quantity,
+                   'unit_price': line.unit_price} for line in order.lines],
+    }
+
+
+def order_from_item(item):
+    """Inverse of order_to_item(). Items written before line items (one
+    per cart line, with book_id/book_title/price/quantity) read as
+    single-line orders."""
+    lines = item.get('lines')
+    if lines is None:
+        lines = [{'book_id': item.get('book_id'), 'title': item.get('book_title', ''),
+                  'quantity': item.get('quantity', 1), 'unit_price': item.get('price', 0)}]
+    return Order(
+        order_id=item['order_id'],
+        user_id=item.get('user_id'),
+        user_name=item.get('user_name', ''),
+        created_at=datetime.strptime(item['order_date'], DATE_FORMAT).timestamp(),
+        lines=[OrderLine(line.get('book_id'), line.get('title', ''), int(line.get('quantity', 1)), line.get('unit_price', 0))
+               for line in lines],
+        status=item.get('status', 'Pending'),
+    )
+
+
+# ---------------------------------------------------------
+# Order Stores (per-user order history, newest first)
+# ---------------------------------------------------------
+class MemoryOrderStore:
+    """In-process orders for app.py, indexed by order_id and by user_id so
+    neither my_orders nor update_order_status walks the global list."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._orders = []
+        self._by_id = {}
+        self._by_user = {}
+        self._next_id = 1
+
+    def add(self, order):
+        return self.add_many([order])[0]
+
+    def add_many(self, orders):
+        """Stores new orders, assigning sequential order_ids."""
+        with self._lock:
+            for order in orders:
+                order.order_id = self._next_id
+                self._next_id += 1
+                self._orders.append(order)
+                self._by_id[order.order_id] = order
+                self._by_user.setdefault(order.user_id, []).append(order)
+        return orders
+
+    def get(self, order_id):
+        return self._by_id.get(order_id)
+
+    def update_status(self, order_id, status):
+        """Returns the previous status, or None if the order doesn't exist."""
+        with self._lock:
+            order = self._by_id.get(order_id)
+            if not order:
+                return None
+            old_status, order.status = order.status, status
+            return old_status
+
+    def all(self):
+        return self._orders
+
+    def page_for_user(self, user_id, limit, cursor=None):
+        """Returns (orders, next_cursor), newest first. The per-user lists
+        are append-only, so a position in them is a stable cursor."""
+        return _newest_first(self._by_user.get(user_id, []), limit, cursor)
+
+    def recent(self, limit, cursor=None):
+        """Newest orders across all users, for the admin dashboard."""
+        return _newest_first(self._orders, limit, cursor)
+
+    def iter_orders(self, order_filter):
+        """Oldest first. The list is append-only, so walking it by index
+        while checkouts continue never skips or repeats an order."""
+        for i in range(len(self._orders)):
+            order = self._orders[i]
+            if order_filter.matches(order):
+                yield order
+
+
+def _newest_first(orders, limit, cursor):
+    end = len(orders)
+    position = decode_cursor(cursor) or {}
+    if isinstance(position.get('before'), int):
+        end = max(0, min(position['before'], end))
+    start = max(0, end - limit)
+    page = orders[start:end][::-1]
+    next_cursor = encode_cursor({'before': start}) if start > 0 else None
+    return page, next_cursor
+
+
+class DynamoOrderStore:
+    """Orders table backend. History reads use the user_id/order_date GSI;
+    the admin's recent orders use the order_shard/order_date GSI."""
+
+    USER_INDEX = 'user_id-order_date-index'
+    RECENT_INDEX = 'order_shard-order_date-index'
+    RECENT_KEY = ('order_shard', 'order_date', 'order_id')
+
+    def __init__(self, table, shards=ORDER_SHARDS):
+        self.table = table
+        self.shards = shards
+
+    def get(self, order_id):
+        item = self.table.get_item(Key={'order_id': str(order_id)}).get('Item')
+        return order_from_item(item) if item else None
+
+    def page_for_user(self, user_id, limit, cursor=None):
+        from boto3.dynamodb.conditions import Key
+        kwargs = {
+            'IndexName': self.USER_INDEX,
+            'KeyConditionExpression': Key('user_id').eq(user_id),
+            'ScanIndexForward': False,   # newest order_date first
+            'Limit': limit,
+        }
+        # Index key plus table key, in this user's partition; else page one
+        start = start_key(decode_cursor(cursor), ('user_id', 'order_date', 'order_id'), user_id=user_id)
+        if start:
+            kwargs['ExclusiveStartKey'] = start
+        response = self.table.query(**kwargs)
+        return [order_from_item(item) for item in response.get('Items', [])], encode_cursor(response.get('LastEvaluatedKey'))
+
+    def recent(self, limit, cursor=None):
+        """Newest orders across all users: one Query per shard (one in all
+        with the default ORDER_SHARDS), merged by order_date. The cursor
+        holds each unfinished shard's position."""
+        from boto3.dynamodb.conditions import Key
+        shards = [str(shard) for shard in range(self.shards)]
+        position = decode_cursor(cursor)
+        if not isinstance(position, dict) or not position.keys() & set(shards):
+            position = dict.fromkeys(shards)
+        pages, starts = {}, {}
+        for shard in shards:
+            if shard not in position:
+                continue   # no orders left in this shard
+            kwargs = {
+                'IndexName': self.RECENT_INDEX,
+                'KeyConditionExpression': Key('order_shard').eq(shard),
+                'ScanIndexForward': False,   # newest order_date first
+                'Limit': limit,
+            }
+            start = starts[shard] = start_key(position[shard], self.RECENT_KEY, order_shard=shard)
+            if start:
+                kwargs['ExclusiveStartKey'] = start
+            response = self.table.query(**kwargs)
+            pages[shard] = (response.get('Items', []), response.get('LastEvaluatedKey'))
+
+        newest = heapq.merge(*([(item['order_date'], shard, item) for item in items] for shard, (items, _) in pages.items()),
+                             key=lambda entry: entry[0], reverse=True)
+        taken = {shard: 0 for shard in pages}
+        orders = []
+        for _, shard, item in newest:
+            if len(orders) == limit:
+                break
+            orders.append(order_from_item(item))
+            taken[shard] += 1
+
+        next_position = {}
+        for shard, (items, last_key) in pages.items():
+            if taken[shard] < len(items):
+                next_position[shard] = self._recent_key(items[taken[shard] - 1]) if taken[shard] else starts[shard]
+            elif last_key:
+                next_position[shard] = last_key
+        return orders, encode_cursor(next_position) if next_position else None
+
+    @staticmethod
+    def _recent_key(item):
+        return {name: item[name] for name in DynamoOrderStore.RECENT_KEY}
+
+    def iter_orders(self, order_filter, segments=4, page_size=1000):
+        """Parallel segmented Scan: one thread per segment feeds a bounded
+        queue, so at most a few pages are held whatever the table size.
+        Orders come out in no particular order."""
+        kwargs = {'Limit': page_size}
+        expression = order_filter.scan_expression()
+        if expression is not None:
+            kwargs['FilterExpression'] = expression
+        pages = queue.Queue(maxsize=segments * 2)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scan(segment):
+            scan_kwargs = dict(kwargs, Segment=segment, TotalSegments=segments)
+            try:
+                while not stop.is_set():
+                    response = self.table.scan(**scan_kwargs)
+                    if not put(response.get('Items', [])) or 'LastEvaluatedKey' not in response:
+                        break
+                    scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        for segment in range(segments):
+            threading.Thread(target=scan, args=(segment,), name=f'order-export-{segment}', daemon=True).start()
+        remaining = segments
+        try:
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for item in page:
+                        yield order_from_item(item)
+        finally:
+            # Client went away or a segment failed: let the scanners exit
+            stop.set()
+
+
+# ---------------------------------------------------------
+# Export (streamed CSV / NDJSON and a per-day sales report)
+# ---------------------------------------------------------
+# One row per order line; price is the unit price
+EXPORT_FIELDS = ('order_id', 'order_date', 'status', 'user_id', 'user_name',
+                 'book_id', 'book_title', 'quantity', 'price')
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Rows buffered per chunk written to the response
+EXPORT_CHUNK_ROWS = 500
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+class OrderFilter:
+    """?start=YYYY-MM-DD&end=YYYY-MM-DD (both inclusive, local time) and
+    ?status=Pending,Shipped. DynamoDB compares order_date strings (they
+    sort chronologically); app.py's stores compare created_at."""
+
+    def __init__(self, start=None, end=None, statuses=()):
+        self.start = start
+        self.end = end
+        self.statuses = tuple(statuses)
+        # First instant after the end day
+        self._before = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else None
+        self._start_ts = datetime.fromisoformat(start).timestamp() if start else None
+        self._before_ts = datetime.fromisoformat(self._before).timestamp() if end else None
+
+    @classmethod
+    def from_args(cls, args):
+        days = {}
+        for name in ('start', 'end'):
+            value = (args.get(name) or '').strip()
+            if value:
+                try:
+                    days[name] = date.fromisoformat(value).isoformat()
+                except ValueError:
+                    raise InvalidFilter(f'{name} must be a YYYY-MM-DD date')
+        if days.get('start') and days.get('end') and days['start'] > days['end']:
+            raise InvalidFilter('start is after end')
+        statuses = [s.strip() for s in (args.get('status') or '').split(',') if s.strip()]
+        return cls(days.get('start'), days.get('end'), statuses)
+
+    def matches(self, order):
+        if self._start_ts is not None and order.created_at < self._start_ts:
+            return False
+        if self._before_ts is not None and order.created_at >= self._before_ts:
+            return False
+        return not self.statuses or order.status in self.statuses
+
+    def scan_expression(self):
+        from boto3.dynamodb.conditions import Attr
+        conditions = []
+        if self.start:
+            conditions.append(Attr('order_date').gte(self.start))
+        if self._before:
+            conditions.append(Attr('order_date').lt(self._before))
+        if self.statuses:
+            conditions.append(Attr('status').is_in(list(self.statuses)))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def sql_where(self):
+        """(clauses, params) for the orders table."""
+        clauses, params = [], []
+        if self._start_ts is not None:
+            clauses.append('created_at >= ?')
+            params.append(self._start_ts)
+        if self._before_ts is not None:
+            clauses.append('created_at < ?')
+            params.append(self._before_ts)
+        if self.statuses:
+            clauses.append('status IN (%s)' % ', '.join('?' * len(self.statuses)))
+            params.extend(self.statuses)
+        return clauses, params
+
+
+def _plain(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _export_rows(order):
+    order_date = order.order_date
+    for line in order.lines:
+        yield {
+            'order_id': order.order_id, 'order_date': order_date, 'status': order.status,
+            'user_id': order.user_id, 'user_name': order.user_name, 'book_id': line.book_id,
+            'book_title': line.title, 'quantity': line.quantity, 'price': _plain(line.unit_price),
+        }
+
+
+def export_chunks(orders, fmt):
+    """Encodes an order iterator as CSV or NDJSON text chunks; nothing is
+    held beyond one chunk of rows."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS) if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+    rows = 0
+    for order in orders:
+        for row in _export_rows(order):
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row) + '\n')
+            rows += 1
+        if rows >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def sales_report(orders):
+    """Per-day orders / units / sales over an order iterator. Memory grows
+    with the number of days, not orders."""
+    days = {}
+    for order in orders:
+        day = days.setdefault(order.order_date[:10], {'orders': 0, 'units': 0, 'sales': 0.0})
+        day['orders'] += 1
+        day['units'] += order.units
+        day['sales'] += float(order.total)
+    report = [dict(totals, day=d, sales=round(totals['sales'], 2)) for d, totals in sorted(days.items())]
+    return {
+        'days': report,
+        'orders': sum(d['orders'] for d in report),
+        'units': sum(d['units'] for d in report),
+        'sales': round(sum(totals['sales'] for totals in days.values()), 2),
+    }
@@ -0,0 +1,54 @@
+import json
+import base64
+
+# ---------------------------------------------------------
+# Cursor Pagination Helpers
+# ---------------------------------------------------------
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(position):
+    """Turns a backend position (a DynamoDB LastEvaluatedKey or a JSON-store
+    offset dict) into an opaque, URL-safe token."""
+    if not position:
+        return None
+    raw = json.dumps(position, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor(). Bad or tampered tokens restart at page one."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position = json.loads(raw)
+    except ValueError:
+        return None
+    return position if isinstance(position, dict) else None
+
+
+def start_key(position, key_names, **expected):
+    """Returns a decoded position if it is a DynamoDB ExclusiveStartKey we
+    could have handed out: exactly `key_names` (the table or index key
+    schema plus the table key), all strings, with any `expected` values
+    (e.g. the queried partition). Anything else -- a tampered token or one
+    from another partition/index -- would be a ValidationException, so it
+    gives None: start at page one."""
+    if not isinstance(position, dict) or set(position) != set(key_names):
+        return None
+    if not all(isinstance(value, str) for value in position.values()):
+        return None
+    if any(position[name] != value for name, value in expected.items()):
+        return None
+    return position
+
+
+def page_size(args, default=DEFAULT_PAGE_SIZE):
+    """Reads ?size= from the query string, clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        size = int(args.get('size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
@@ -0,0 +1,177 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# ---------------------------------------------------------
+# Password Hashing (configurable cost, bounded, measured)
+# ---------------------------------------------------------
+# werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+# Stored hashes made with different parameters are upgraded on next login.
+PASSWORD_METHOD = os.environ.get('PASSWORD_METHOD', 'scrypt:32768:8:1')
+PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+# hashlib's scrypt/pbkdf2 release the GIL, so these threads hash in parallel;
+# the bound keeps a signup burst from taking every core from other requests
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+LOGIN_BURST = int(os.environ.get('LOGIN_RATE_BURST', 10))
+LOGIN_PER_MINUTE = float(os.environ.get('LOGIN_RATE_PER_MINUTE', 10))
+SIGNUP_BURST = int(os.environ.get('SIGNUP_RATE_BURST', 5))
+SIGNUP_PER_MINUTE = float(os.environ.get('SIGNUP_RATE_PER_MINUTE', 2))
+# Reverse proxies / load balancers in front of the app: the client IP the
+# limiters key on is taken from that many X-Forwarded-For hops (0: the
+# socket address, so a client can't pick its own bucket with the header)
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+# werkzeug's shorthand methods and the parameters it fills in
+_METHOD_DEFAULTS = {'scrypt': 'scrypt:32768:8:1', 'pbkdf2': 'pbkdf2:sha256:600000', 'pbkdf2:sha256': 'pbkdf2:sha256:600000'}
+
+
+class HasherBusy(Exception):
+    """More hashes queued than PASSWORD_HASH_QUEUE allows, or one not done
+    within PASSWORD_HASH_TIMEOUT. Views answer 503: try again."""
+
+
+class _Latency:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=500)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        return {
+            'count': self.count,
+            'avg_ms': round(1000 * self.total / self.count, 1) if self.count else 0,
+            # Nearest rank
+            'p95_ms': round(1000 * recent[min(len(recent) - 1, math.ceil(0.95 * len(recent)) - 1)], 1) if recent else 0,
+            'max_ms': round(1000 * self.max, 1),
+        }
+
+
+class PasswordHasher:
+    """Runs werkzeug hashing on a bounded thread pool with latency metrics."""
+
+    def __init__(self, method=PASSWORD_METHOD, salt_length=PASSWORD_SALT_LENGTH,
+                 workers=HASH_WORKERS, max_queue=HASH_QUEUE, timeout=HASH_TIMEOUT):
+        self.method = _METHOD_DEFAULTS.get(method, method)
+        self.salt_length = salt_length
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.rejected = 0
+        self.timed_out = 0
+        self.rehashed = 0
+        self._latency = {'hash': _Latency(), 'verify': _Latency(), 'wait': _Latency()}
+
+    def _record(self, name, seconds):
+        with self._lock:
+            self._latency[name].add(seconds)
+
+    def _timed(self, name, fn, *args, submitted):
+        started = time.perf_counter()
+        self._record('wait', started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            self._record(name, time.perf_counter() - started)
+
+    def _submit(self, name, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(self._timed, name, fn, *args, submitted=time.perf_counter())
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def _result(self, future):
+        """Waits for the hash, but no longer than timeout: the request then
+        gets a 503 instead of holding its thread."""
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()  # still queued: skip it
+            with self._lock:
+                self.timed_out += 1
+            raise HasherBusy() from None
+
+    def hash(self, password):
+        """Returns a new hash (blocks the caller, not a CPU, while queued)."""
+        return self._result(self._submit('hash', generate_password_hash, password, self.method, self.salt_length))
+
+    def verify(self, stored_hash, password):
+        return self._result(self._submit('verify', check_password_hash, stored_hash, password))
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != self.method
+
+    def rehash_later(self, password, save):
+        """Hashes with the current policy in the background, then save(hash)."""
+        def done(future):
+            if future.exception() is None:
+                save(future.result())
+                with self._lock:
+                    self.rehashed += 1
+        try:
+            self._submit('hash', generate_password_hash, password, self.method, self.salt_length).add_done_callback(done)
+        except HasherBusy:
+            pass  # upgraded on a later login
+
+    def stats(self):
+        with self._lock:
+            stats = {name: latency.snapshot() for name, latency in self._latency.items()}
+            stats.update({'method': self.method.split(':', 1)[0], 'workers': self.workers,
+                          'rejected_busy': self.rejected, 'timed_out': self.timed_out, 'rehashed': self.rehashed})
+        return stats
+
+
+class RateLimiter:
+    """Per-key token buckets (e.g. per client IP), kept in this process."""
+
+    MAX_KEYS = 100000
+
+    def __init__(self, burst=LOGIN_BURST, per_minute=LOGIN_PER_MINUTE):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.limited = 0
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.limited += 1
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                # Drop buckets that have refilled completely
+                full = [k for k, (t, ts) in self._buckets.items() if t + (now - ts) * self.rate >= self.burst]
+                for k in full:
+                    del self._buckets[k]
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'tracked_clients': len(self._buckets), 'limited': self.limited}
@@ -0,0 +1,172 @@
+import os
+import time
+import hashlib
+import threading
+from decimal import Decimal
+from collections import OrderedDict
+from flask import request, render_template, make_response
+from markupsafe import Markup
+
+# ---------------------------------------------------------
+# Render Cache (book fragments + anonymous pages, by catalog version)
+# ---------------------------------------------------------
+# How long a worker trusts the shared catalog version before re-reading it
+# (writes made by this worker are seen immediately)
+VERSION_TTL = float(os.environ.get('RENDER_CACHE_VERSION_TTL', 1))
+FRAGMENT_CACHE_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_ENTRIES', 5000))
+PAGE_CACHE_ENTRIES = int(os.environ.get('PAGE_CACHE_ENTRIES', 200))
+
+
+class _Entries:
+    """Thread-safe LRU dict."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DynamoCatalogVersion:
+    """Catalog version on one item of the Stats table (ADD, so concurrent
+    bumps from several instances all count)."""
+
+    KEY = {'name': 'catalog'}
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self):
+        item = self.table.get_item(Key=self.KEY).get('Item')
+        if item is None:
+            # First start: record a modification time for Last-Modified
+            return self.bump()
+        return int(item['version']), float(item['modified_at'])
+
+    def bump(self):
+        item = self.table.update_item(
+            Key=self.KEY,
+            UpdateExpression='ADD #v :one SET modified_at = :now',
+            ExpressionAttributeNames={'#v': 'version'},
+            ExpressionAttributeValues={':one': 1, ':now': Decimal(str(round(time.time(), 3)))},
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+        return int(item['version']), float(item['modified_at'])
+
+
+class RenderCache:
+    """Caches rendered HTML under the current catalog version.
+
+    Book fragments (cover + title/author/price markup) are rendered once per
+    book and version and reused by every user's page; pages that don't depend
+    on the user are cached whole. Any catalog write calls bump(), so old
+    entries are never served again and simply age out of the LRU. Responses
+    carry an ETag (and Last-Modified for cached pages) so a repeat GET gets
+    a 304 without a body.
+    """
+
+    def __init__(self, versions, ttl=VERSION_TTL,
+                 fragment_entries=FRAGMENT_CACHE_ENTRIES, page_entries=PAGE_CACHE_ENTRIES):
+        self.versions = versions
+        self.ttl = ttl
+        self._fragments = _Entries(fragment_entries)
+        self._pages = _Entries(page_entries)
+        self._lock = threading.Lock()
+        self._current = None
+        self._checked_at = 0.0
+        self.counts = {'fragment_hits': 0, 'fragment_misses': 0, 'page_hits': 0,
+                       'page_misses': 0, 'not_modified': 0, 'bumps': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def version(self):
+        """(version, modified_at) of the catalog, re-read at most every ttl seconds."""
+        now = time.monotonic()
+        if self._current is None or now - self._checked_at >= self.ttl:
+            current = self.versions.get()
+            with self._lock:
+                self._current, self._checked_at = current, now
+        return self._current
+
+    def bump(self):
+        """Call after every change to what books look like (add/edit/delete,
+        stock, covers)."""
+        current = self.versions.bump()
+        with self._lock:
+            self._current, self._checked_at = current, time.monotonic()
+            self.counts['bumps'] += 1
+
+    def fragment(self, name, book):
+        """templates/fragments/<name>.html rendered for `book`."""
+        key = (name, str(book['id']), self.version()[0])
+        html = self._fragments.get(key)
+        if html is None:
+            self._count('fragment_misses')
+            html = Markup(render_template('fragments/%s.html' % name, book=book))
+            self._fragments.put(key, html)
+        else:
+            self._count('fragment_hits')
+        return html
+
+    def page(self, render):
+        """Whole-page cache for views whose output doesn't depend on the
+        user (call it for anonymous visitors only if the template reads
+        the session); `render()` is only called on a miss."""
+        version, modified_at = self.version()
+        key = (request.full_path, version)
+        entry = self._pages.get(key)
+        if entry is None:
+            self._count('page_misses')
+            body = render()
+            entry = (body, hashlib.sha1(body.encode()).hexdigest()[:20])
+            self._pages.put(key, entry)
+        else:
+            self._count('page_hits')
+        response = make_response(entry[0])
+        response.set_etag(entry[1])
+        if modified_at:
+            response.last_modified = int(modified_at)
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return self._conditional(response)
+
+    def conditional(self, body):
+        """ETag response for per-user pages: still rendered, but an unchanged
+        page costs a 304 instead of the full HTML."""
+        response = make_response(body)
+        response.add_etag()
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return self._conditional(response)
+
+    def _conditional(self, response):
+        response.make_conditional(request)
+        if response.status_code == 304:
+            self._count('not_modified')
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counts)
+        stats.update({'version': self.version()[0], 'fragments': len(self._fragments), 'pages': len(self._pages)})
+        return stats
@@ -0,0 +1,204 @@
+import re
+import math
+import time
+import bisect
+import heapq
+import threading
+
+# ---------------------------------------------------------
+# Full-text Catalog Search (in-memory inverted index, BM25)
+# ---------------------------------------------------------
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+STOPWORDS = frozenset('a an and are as at be by for from in is it of on or the to with'.split())
+
+# Field weights: a match in the title counts three times one in the description
+FIELD_WEIGHTS = {'title': 3.0, 'author': 2.0, 'description': 1.0}
+K1 = 1.2
+B = 0.75
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or '').casefold()) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """Inverted index over title, author and description.
+
+    postings: term -> {book_id: impact}, the book's BM25 weight for the term
+    without idf. impacts: term -> [(-impact, book_id)], sorted best first,
+    made on the term's first query (kept up to date from then on).
+    A query walks the impact lists of its terms side by side and stops once
+    no book it hasn't seen can beat the current top `limit` (the threshold
+    algorithm), so a term in most of the catalog costs about `limit`
+    postings, not all of them. The sorted vocabulary list makes prefix
+    (type-ahead) expansion a bisect.
+
+    Length normalisation uses the average book length of the last build();
+    add() and remove() keep it until the next one.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.built = False
+        self.build_seconds = None
+
+    def _reset(self):
+        self._postings = {}
+        self._impacts = {}
+        self._doc_terms = {}
+        self._avg_len = 0.0
+        self._vocab = []
+
+    def build(self, books):
+        """(Re)builds the whole index from an iterable of books. Costs about
+        50 µs per book (tokenising dominates), once per process."""
+        started = time.perf_counter()
+        docs = [(str(book['id']),) + _terms(book) for book in books]
+        with self._lock:
+            self._reset()
+            if docs:
+                self._avg_len = sum(length for _, _, length in docs) / len(docs)
+            for doc_id, terms, length in docs:
+                self._insert(doc_id, terms, length, ordered=False)
+            self._vocab = sorted(self._postings)
+            self.built = True
+            self.build_seconds = round(time.perf_counter() - started, 3)
+
+    def _insert(self, doc_id, terms, length, ordered=True):
+        """ordered=False skips the vocabulary; build() sorts it once at the end."""
+        if not self._avg_len:
+            self._avg_len = length or 1.0
+        norm = K1 * (1 - B + B * length / self._avg_len)
+        for token, tf in terms.items():
+            impact = tf * (K1 + 1) / (tf + norm)
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if ordered:
+                    bisect.insort(self._vocab, token)
+            postings[doc_id] = impact
+            impacts = self._impacts.get(token)
+            if impacts is not None:
+                bisect.insort(impacts, (-impact, doc_id))
+        self._doc_terms[doc_id] = list(terms)
+
+    def _remove(self, doc_id):
+        for token in self._doc_terms.pop(doc_id, []):
+            postings = self._postings.get(token)
+            if postings is None or doc_id not in postings:
+                continue
+            entry = (-postings.pop(doc_id), doc_id)
+            impacts = self._impacts.get(token)
+            if impacts is not None:
+                i = bisect.bisect_left(impacts, entry)
+                if i < len(impacts) and impacts[i] == entry:
+                    del impacts[i]
+            if not postings:
+                del self._postings[token]
+                self._impacts.pop(token, None)
+                i = bisect.bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+
+    def add(self, book):
+        """Indexes a new or edited book (replacing any previous version)."""
+        doc_id = str(book['id'])
+        terms, length = _terms(book)
+        with self._lock:
+            self._remove(doc_id)
+            self._insert(doc_id, terms, length)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove(str(book_id))
+
+    def _impact_list(self, term):
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            impacts = self._impacts[term] = sorted((-impact, doc_id) for doc_id, impact in self._postings[term].items())
+        return impacts
+
+    def _expand(self, prefix):
+        i = bisect.bisect_left(self._vocab, prefix)
+        terms = []
+        while i < len(self._vocab) and len(terms) < MAX_PREFIX_EXPANSIONS and self._vocab[i].startswith(prefix):
+            terms.append(self._vocab[i])
+            i += 1
+        return terms
+
+    def search(self, query, limit=20, prefix=True):
+        """Returns up to `limit` book ids, best match first. With prefix=True
+        the last query word also matches longer words (type-ahead)."""
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs:
+                return []
+            # (term, query weight) pairs; prefix expansions weigh a little less than exact hits
+            terms = [(t, 1.0) for t in tokens[:-1]]
+            last = tokens[-1]
+            terms.append((last, 1.0))
+            if prefix:
+                terms.extend((t, 0.8) for t in self._expand(last) if t != last)
+            lists = []
+            for term, query_weight in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                lists.append((query_weight * idf, postings, self._impact_list(term)))
+            return _top(lists, limit)
+
+    def stats(self):
+        return {'documents': len(self._doc_terms), 'terms': len(self._postings),
+                'avg_length': round(self._avg_len, 2), 'build_seconds': self.build_seconds}
+
+
+def _terms(book):
+    """({term: weighted term frequency}, weighted length) of one book."""
+    terms = {}
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(book.get(field)):
+            terms[token] = terms.get(token, 0.0) + weight
+            length += weight
+    return terms, length
+
+
+def _top(lists, limit):
+    """Best `limit` book ids over (weight, postings, impacts) lists.
+
+    Round d reads entry d of every impact list and scores each new book in
+    full (a dict lookup per list). A book not seen yet can score at most
+    the sum of the round-d impacts (the threshold), so once the current
+    limit-th best reaches it the rest of the lists can't change the result.
+    """
+    best = []       # min-heap of (score, book_id)
+    seen = set()
+    depth = 0
+    while True:
+        threshold = 0.0
+        exhausted = True
+        for weight, _, impacts in lists:
+            if depth >= len(impacts):
+                continue
+            exhausted = False
+            negative_impact, doc_id = impacts[depth]
+            threshold -= weight * negative_impact
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            score = sum(w * postings.get(doc_id, 0.0) for w, postings, _ in lists)
+            if len(best) < limit:
+                heapq.heappush(best, (score, doc_id))
+            elif score > best[0][0]:
+                heapq.heapreplace(best, (score, doc_id))
+        if exhausted or (len(best) == limit and best[0][0] >= threshold):
+            break
+        depth += 1
+    return [doc_id for _, doc_id in sorted(best, reverse=True)]
@@ -0,0 +1,217 @@
+import os
+import copy
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SecureCookieSession, session_json_serializer
+
+# ---------------------------------------------------------
+# Server-side Sessions (the cookie carries only an opaque id)
+# ---------------------------------------------------------
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))
+MAX_MEMORY_SESSIONS = int(os.environ.get('SESSION_MAX_ENTRIES', 10000))
+READ_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
+
+
+class ServerSession(SecureCookieSession):
+    """Session dict plus its id and the version the client last saw."""
+
+    def __init__(self, initial=None, sid=None, version=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.version = version
+        self.expires_at = expires_at
+        self.rotate_id = False
+
+    def rotate(self):
+        """Issue a new id on the next save (call on login, so an id that
+        existed before authentication can't be replayed)."""
+        self.rotate_id = True
+        self.modified = True
+
+
+class _LRU:
+    """Thread-safe LRU of sid -> (version, data, expires_at)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._items.get(sid)
+            if entry is None:
+                return None
+            if entry[2] < time.time():
+                del self._items[sid]
+                return None
+            self._items.move_to_end(sid)
+            return entry
+
+    def put(self, sid, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[sid] = entry
+            self._items.move_to_end(sid)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def pop(self, sid):
+        with self._lock:
+            self._items.pop(sid, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class MemorySessionStore:
+    """Sessions in this process only (single worker / development)."""
+
+    local = True
+
+    def __init__(self, max_entries=MAX_MEMORY_SESSIONS):
+        self._sessions = _LRU(max_entries)
+
+    def load(self, sid, version=None):
+        entry = self._sessions.get(sid)
+        if entry is None:
+            return None
+        return entry[0], copy.deepcopy(entry[1]), entry[2]
+
+    def save(self, sid, version, data, expires_at):
+        self._sessions.put(sid, (version, copy.deepcopy(data), expires_at))
+
+    def delete(self, sid):
+        self._sessions.pop(sid)
+
+    def stats(self):
+        return {'backend': 'memory', 'sessions': len(self._sessions)}
+
+
+class DynamoSessionStore:
+    """Sessions table (Partition Key: sid) with DynamoDB TTL on expires_at.
+    TTL deletion is lazy, so reads also check expires_at themselves."""
+
+    local = False
+
+    def __init__(self, table):
+        self.table = table
+
+    def load(self, sid, version=None):
+        item = self.table.get_item(Key={'sid': sid}).get('Item')
+        if item is not None and version and item.get('version') != version:
+            # Eventually consistent read may predate the client's last write
+            item = self.table.get_item(Key={'sid': sid}, ConsistentRead=True).get('Item')
+        if item is None or item['expires_at'] < time.time():
+            return None
+        return item['version'], session_json_serializer.loads(item['data']), float(item['expires_at'])
+
+    def save(self, sid, version, data, expires_at):
+        self.table.put_item(Item={
+            'sid': sid,
+            'version': version,
+            'data': session_json_serializer.dumps(data),
+            'expires_at': int(expires_at),
+        })
+
+    def delete(self, sid):
+        self.table.delete_item(Key={'sid': sid})
+
+    def stats(self):
+        return {'backend': 'dynamodb'}
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface over a session store.
+
+    The cookie is '<sid>.<version>': a random id plus a token that changes on
+    every write. When this process already holds that version in its read
+    cache, the store is not queried and nothing is deserialized; an older or
+    unknown version falls through to the store (another worker wrote it).
+    Sessions are only written when modified, or when half the TTL has passed.
+    """
+
+    def __init__(self, store, ttl=SESSION_TTL, cache_size=READ_CACHE_SIZE):
+        self.store = store
+        self.ttl = ttl
+        self._cache = _LRU(0 if store.local else cache_size)
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _load(self, sid, version):
+        if self.store.local:
+            return self.store.load(sid, version)
+        entry = self._cache.get(sid)
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self.cache_hits += 1
+            return entry[0], copy.deepcopy(entry[1]), entry[2]
+        with self._lock:
+            self.cache_misses += 1
+        entry = self.store.load(sid, version)
+        if entry is not None:
+            self._cache.put(sid, (entry[0], copy.deepcopy(entry[1]), entry[2]))
+        return entry
+
+    def open_session(self, app, request):
+        sid, _, version = request.cookies.get(self.get_cookie_name(app), '').partition('.')
+        if sid and version:
+            entry = self._load(sid, version)
+            if entry is not None:
+                return ServerSession(entry[1], sid, entry[0], entry[2])
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid and session.modified:
+                self.store.delete(session.sid)
+                self._cache.pop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        refresh = session.expires_at is not None and session.expires_at - now < self.ttl / 2
+        if not (session.modified or session.sid is None or refresh):
+            return
+
+        sid = session.sid
+        if sid is None or session.rotate_id:
+            if sid is not None:
+                self.store.delete(sid)
+                self._cache.pop(sid)
+            sid = secrets.token_urlsafe(32)
+        version = secrets.token_hex(4)
+        data = dict(session)
+        expires_at = now + self.ttl
+        self.store.save(sid, version, data, expires_at)
+        self._cache.put(sid, (version, copy.deepcopy(data), expires_at))
+
+        response.set_cookie(
+            name, f'{sid}.{version}',
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def stats(self):
+        stats = self.store.stats()
+        stats.update({'cache_hits': self.cache_hits, 'cache_misses': self.cache_misses, 'cached': len(self._cache)})
+        return stats
+
+
+def session_user(user):
+    """What the session keeps about a logged-in user (never the password hash)."""
+    return {key: user[key] for key in ('id', 'name', 'email') if key in user}
@@ -0,0 +1,530 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from catalog import CatalogStore, author_key, title_key
+from orders import Order, OrderLine
+from pagination import encode_cursor, decode_cursor
+from flask.sessions import session_json_serializer
+from metrics import backend_call
+
+# ---------------------------------------------------------
+# SQLite Backend for app.py (users, orders, books)
+# ---------------------------------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id          INTEGER PRIMARY KEY,
+    title       TEXT NOT NULL,
+    author      TEXT NOT NULL,
+    author_key  TEXT NOT NULL,
+    title_lower TEXT NOT NULL,
+    price       REAL NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    stock       INTEGER NOT NULL DEFAULT 0 CHECK (stock >= 0),
+    image       TEXT NOT NULL DEFAULT 'default_book.jpg'
+);
+CREATE INDEX IF NOT EXISTS books_author ON books (author_key);
+CREATE INDEX IF NOT EXISTS books_title ON books (title_lower);
+
+CREATE TABLE IF NOT EXISTS users (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    name     TEXT NOT NULL,
+    email    TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id    INTEGER NOT NULL,
+    user_name  TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_user ON orders (user_id, order_id);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id   INTEGER NOT NULL,
+    book_id    TEXT,
+    title      TEXT NOT NULL,
+    quantity   INTEGER NOT NULL,
+    unit_price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS order_lines_order ON order_lines (order_id);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS carts (
+    user_key TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL DEFAULT 0,
+    summary  TEXT
+);
+CREATE TABLE IF NOT EXISTS cart_items (
+    user_key TEXT NOT NULL,
+    book_id  TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (user_key, book_id)
+);
+-- Carts no longer looked up by book (summaries check the catalog version)
+DROP INDEX IF EXISTS cart_items_book;
+
+CREATE TABLE IF NOT EXISTS sessions (
+    sid        TEXT PRIMARY KEY,
+    version    TEXT NOT NULL,
+    data       TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at);
+"""
+
+BOOK_COLUMNS = 'id, title, author, price, description, stock, image'
+ORDER_COLUMNS = 'order_id, user_id, user_name, status, created_at'
+
+# Databases from before line items have one orders row per unit sold; each
+# becomes a one-line order (same order_id, so counters stay correct)
+UPGRADE_PER_UNIT_ORDERS = """
+ALTER TABLE orders RENAME TO orders_per_unit;
+DROP INDEX IF EXISTS orders_user;
+""" + SCHEMA + """
+INSERT INTO orders (order_id, user_id, user_name, status, created_at)
+    SELECT order_id, user_id, user_name, status, CAST(strftime('%s', order_date, 'utc') AS REAL) FROM orders_per_unit;
+INSERT INTO order_lines (order_id, book_id, title, quantity, unit_price)
+    SELECT order_id, NULL, book_title, 1, price FROM orders_per_unit;
+DROP TABLE orders_per_unit;
+"""
+
+
+class Database:
+    """One SQLite file in WAL mode: readers never block the writer and
+    commits only append to the write-ahead log. Connections are per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connection()
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(orders)')]
+        if 'book_title' in columns:
+            conn.executescript('BEGIN IMMEDIATE;' + UPGRADE_PER_UNIT_ORDERS + 'COMMIT;')
+        conn.executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT: takes the write lock up front, so
+        read-check-write sequences (stock) can't interleave across workers.
+
+        Nested calls (a store's write inside a caller's transaction) join the
+        outer transaction: it alone commits or rolls back, so several stores'
+        writes can be made atomic together."""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        with backend_call('sqlite', 'transaction'):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def query(self, sql, params=()):
+        with backend_call('sqlite', 'query'):
+            return [dict(row) for row in self.connection().execute(sql, params)]
+
+    def query_one(self, sql, params=()):
+        with backend_call('sqlite', 'query'):
+            row = self.connection().execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+
+class SqliteCatalogStore(CatalogStore):
+    """books table; author and title-prefix lookups use their indexes."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, book_id):
+        try:
+            book_id = int(book_id)
+        except (TypeError, ValueError):
+            return None
+        return self.db.query_one(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,))
+
+    def get_many(self, book_ids):
+        ids = []
+        for book_id in book_ids:
+            try:
+                ids.append(int(book_id))
+            except (TypeError, ValueError):
+                pass
+        if not ids:
+            return {}
+        placeholders = ','.join('?' * len(ids))
+        rows = self.db.query(f'SELECT {BOOK_COLUMNS} FROM books WHERE id IN ({placeholders})', ids)
+        return {str(b['id']): b for b in rows}
+
+    def all(self):
+        return self.db.query(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY id')
+
+    def page(self, limit, cursor=None):
+        position = decode_cursor(cursor) or {}
+        after = position.get('after') if isinstance(position.get('after'), int) else 0
+        books = self.db.query(f'SELECT {BOOK_COLUMNS} FROM books WHERE id > ? ORDER BY id LIMIT ?', (after, limit + 1))
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_cursor = encode_cursor({'after': books[-1]['id']})
+        return books, next_cursor
+
+    def by_author(self, author):
+        return self.db.query(f'SELECT {BOOK_COLUMNS} FROM books WHERE author_key = ? ORDER BY id', (author_key(author),))
+
+    def by_title_prefix(self, prefix, limit=20):
+        prefix = title_key(prefix)
+        return self.db.query(
+            f'SELECT {BOOK_COLUMNS} FROM books WHERE title_lower >= ? AND title_lower < ? ORDER BY title_lower LIMIT ?',
+            (prefix, prefix + '\U0010ffff', limit)
+        )
+
+    def _row(self, book):
+        return (int(book['id']), book['title'], book['author'], author_key(book['author']),
+                title_key(book['title']), float(book['price']), book.get('description', ''),
+                int(book.get('stock', 0)), book.get('image') or 'default_book.jpg')
+
+    def put(self, book):
+        with self.db.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self._row(book))
+
+    def put_many(self, books):
+        with self.db.transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [self._row(b) for b in books])
+
+    def insert(self, make_book):
+        with self.db.transaction() as conn:
+            new_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM books').fetchone()[0]
+            book = make_book(new_id)
+            conn.execute('INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self._row(book))
+        return book
+
+    def delete(self, book_id):
+        with self.db.transaction() as conn:
+            row = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (int(book_id),)).fetchone()
+            if row:
+                conn.execute('DELETE FROM books WHERE id = ?', (int(book_id),))
+        return dict(row) if row else None
+
+    def adjust_stock(self, deltas):
+        with self.db.transaction() as conn:
+            short = []
+            for str_id, delta in deltas.items():
+                row = conn.execute('SELECT stock FROM books WHERE id = ?', (int(str_id),)).fetchone()
+                if row and row['stock'] + delta < 0:
+                    short.append(str_id)
+            if short:
+                return short
+            conn.executemany('UPDATE books SET stock = stock + ? WHERE id = ?',
+                             [(delta, int(str_id)) for str_id, delta in deltas.items()])
+        return []
+
+    def set_image(self, book_id, image):
+        with self.db.transaction() as conn:
+            row = conn.execute('SELECT image FROM books WHERE id = ?', (int(book_id),)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE books SET image = ? WHERE id = ?', (image, int(book_id)))
+        return row['image']
+
+    def image_names(self):
+        return {row['image'] for row in self.db.query('SELECT DISTINCT image FROM books')}
+
+    def count(self):
+        return self.db.connection().execute('SELECT COUNT(*) FROM books').fetchone()[0]
+
+    def stats(self):
+        return {'backend': 'sqlite', 'books': self.count()}
+
+
+class SqliteOrderStore:
+    """orders + order_lines tables; per-user history is an index range scan
+    on (user_id, order_id), and a page's lines come back in one more query."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, order):
+        return self.add_many([order])[0]
+
+    def add_many(self, orders):
+        """Inserts orders and their lines in one transaction."""
+        with self.db.transaction() as conn:
+            for order in orders:
+                cur = conn.execute(
+                    'INSERT INTO orders (user_id, user_name, status, created_at) VALUES (?, ?, ?, ?)',
+                    (order.user_id, order.user_name, order.status, order.created_at)
+                )
+                order.order_id = cur.lastrowid
+                conn.executemany(
+                    'INSERT INTO order_lines (order_id, book_id, title, quantity, unit_price) VALUES (?, ?, ?, ?, ?)',
+                    [(order.order_id, line.book_id, line.title, line.quantity, line.unit_price) for line in order.lines]
+                )
+        return orders
+
+    def _with_lines(self, rows):
+        if not rows:
+            return []
+        lines = {}
+        ids = [row['order_id'] for row in rows]
+        for line in self.db.query(
+                'SELECT order_id, book_id, title, quantity, unit_price FROM order_lines WHERE order_id IN (%s) ORDER BY rowid'
+                % ', '.join('?' * len(ids)), ids):
+            lines.setdefault(line['order_id'], []).append(
+                OrderLine(line['book_id'], line['title'], line['quantity'], line['unit_price']))
+        return [Order(row['order_id'], row['user_id'], row['user_name'], row['created_at'],
+                      lines.get(row['order_id'], []), row['status']) for row in rows]
+
+    def get(self, order_id):
+        row = self.db.query_one(f'SELECT {ORDER_COLUMNS} FROM orders WHERE order_id = ?', (order_id,))
+        return self._with_lines([row])[0] if row else None
+
+    def update_status(self, order_id, status):
+        with self.db.transaction() as conn:
+            row = conn.execute('SELECT status FROM orders WHERE order_id = ?', (order_id,)).fetchone()
+            if not row:
+                return None
+            conn.execute('UPDATE orders SET status = ? WHERE order_id = ?', (status, order_id))
+            return row['status']
+
+    def _newest_first(self, where, params, limit, cursor):
+        position = decode_cursor(cursor) or {}
+        if isinstance(position.get('before'), int):
+            where = where + (' AND ' if where else '') + 'order_id < ?'
+            params = params + (position['before'],)
+        sql = f'SELECT {ORDER_COLUMNS} FROM orders'
+        if where:
+            sql += ' WHERE ' + where
+        rows = self.db.query(sql + ' ORDER BY order_id DESC LIMIT ?', params + (limit + 1,))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor({'before': rows[-1]['order_id']})
+        return self._with_lines(rows), next_cursor
+
+    def page_for_user(self, user_id, limit, cursor=None):
+        return self._newest_first('user_id = ?', (user_id,), limit, cursor)
+
+    def recent(self, limit, cursor=None):
+        return self._newest_first('', (), limit, cursor)
+
+    def iter_orders(self, order_filter, page_size=1000):
+        """Oldest first, one keyset page (order_id > last) per query, so no
+        read transaction stays open while the response streams."""
+        clauses, params = order_filter.sql_where()
+        after = 0
+        while True:
+            where = ' AND '.join(['order_id > ?'] + clauses)
+            rows = self.db.query(f'SELECT {ORDER_COLUMNS} FROM orders WHERE {where} ORDER BY order_id LIMIT ?',
+                                 tuple([after] + params + [page_size]))
+            yield from self._with_lines(rows)
+            if len(rows) < page_size:
+                return
+            after = rows[-1]['order_id']
+
+
+class SqliteUserStore:
+    def __init__(self, db):
+        self.db = db
+
+    def get_by_email(self, email):
+        return self.db.query_one('SELECT id, name, email, password FROM users WHERE email = ?', (email,))
+
+    def add(self, name, email, password):
+        try:
+            with self.db.transaction() as conn:
+                cur = conn.execute('INSERT INTO users (name, email, password) VALUES (?, ?, ?)', (name, email, password))
+        except sqlite3.IntegrityError:
+            return None
+        return {'id': cur.lastrowid, 'name': name, 'email': email, 'password': password}
+
+    def set_password(self, email, password):
+        with self.db.transaction() as conn:
+            conn.execute('UPDATE users SET password = ? WHERE email = ?', (password, email))
+
+
+class SqliteStats:
+    """Dashboard totals persisted in the counters table (same interface as
+    stats.MemoryStats), so they survive restarts and are shared by workers."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _add(self, values):
+        with self.db.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO counters (name, value) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                list(values.items())
+            )
+
+    def record_orders(self, count, sales, units):
+        self._add({'total_orders': count, 'total_sales': sales, 'total_stock': -units, 'status_Pending': count})
+
+    def adjust_stock(self, delta):
+        if delta:
+            self._add({'total_stock': delta})
+
+    def status_changed(self, old, new):
+        if old and old != new:
+            self._add({'status_' + old: -1, 'status_' + new: 1})
+
+    def snapshot(self):
+        values = {row['name']: row['value'] for row in self.db.query('SELECT name, value FROM counters')}
+        return {
+            'total_sales': round(values.get('total_sales', 0), 2),
+            'total_orders': int(values.get('total_orders', 0)),
+            'total_stock': int(values.get('total_stock', 0)),
+            'status_counts': {k[len('status_'):]: int(v) for k, v in values.items() if k.startswith('status_')},
+        }
+
+
+class SqliteCatalogVersion:
+    """Catalog version for render_cache, in the counters table so every
+    worker sees the same value."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self):
+        values = {row['name']: row['value'] for row in self.db.query(
+            "SELECT name, value FROM counters WHERE name IN ('catalog_version', 'catalog_modified')")}
+        if 'catalog_modified' not in values:
+            # First start: record a modification time for Last-Modified
+            return self.bump()
+        return int(values['catalog_version']), values['catalog_modified']
+
+    def bump(self):
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO counters (name, value) VALUES ('catalog_version', 1) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + 1")
+            conn.execute("INSERT INTO counters (name, value) VALUES ('catalog_modified', ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = excluded.value", (now,))
+            version = conn.execute("SELECT value FROM counters WHERE name = 'catalog_version'").fetchone()[0]
+        return int(version), now
+
+
+class SqliteCartStore:
+    """carts + cart_items tables for cart.CartService."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, user_key):
+        cart = self.db.query_one('SELECT version, summary FROM carts WHERE user_key = ?', (user_key,))
+        if cart is None:
+            return {'items': {}, 'summary': None, 'version': 0}
+        rows = self.db.query('SELECT book_id, quantity FROM cart_items WHERE user_key = ?', (user_key,))
+        return {
+            'items': {row['book_id']: row['quantity'] for row in rows},
+            'summary': json.loads(cart['summary']) if cart['summary'] else None,
+            'version': cart['version'],
+        }
+
+    def save_items(self, user_key, items, old_items, version):
+        """Saves if the cart is still at `version` (0: no cart yet); returns
+        False if another write got in first."""
+        with self.db.transaction() as conn:
+            row = conn.execute('SELECT version FROM carts WHERE user_key = ?', (user_key,)).fetchone()
+            if (row['version'] if row else 0) != version:
+                return False
+            conn.execute('INSERT INTO carts (user_key, version) VALUES (?, 1) '
+                         'ON CONFLICT(user_key) DO UPDATE SET version = version + 1, summary = NULL', (user_key,))
+            conn.execute('DELETE FROM cart_items WHERE user_key = ?', (user_key,))
+            conn.executemany('INSERT INTO cart_items (user_key, book_id, quantity) VALUES (?, ?, ?)',
+                             [(user_key, str_id, quantity) for str_id, quantity in items.items()])
+        return True
+
+    def save_summary(self, user_key, version, summary):
+        with self.db.transaction() as conn:
+            conn.execute('UPDATE carts SET summary = ? WHERE user_key = ? AND version = ?',
+                         (json.dumps(summary), user_key, version))
+
+    def clear(self, user_key):
+        with self.db.transaction() as conn:
+            conn.execute('DELETE FROM cart_items WHERE user_key = ?', (user_key,))
+            conn.execute('DELETE FROM carts WHERE user_key = ?', (user_key,))
+
+    def stats(self):
+        count = self.db.connection().execute('SELECT COUNT(*) FROM carts').fetchone()[0]
+        return {'backend': 'sqlite', 'carts': count}
+
+
+class SqliteSessionStore:
+    """sessions table for sessions.ServerSessionInterface. Expired rows
+    are purged by an occasional DELETE piggybacked on writes."""
+
+    local = False
+    PURGE_PROBABILITY = 0.01
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, sid, version=None):
+        row = self.db.query_one('SELECT version, data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?',
+                                (sid, time.time()))
+        if row is None:
+            return None
+        return row['version'], session_json_serializer.loads(row['data']), row['expires_at']
+
+    def save(self, sid, version, data, expires_at):
+        with self.db.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, version, data, expires_at) VALUES (?, ?, ?, ?)',
+                         (sid, version, session_json_serializer.dumps(data), expires_at))
+            if random.random() < self.PURGE_PROBABILITY:
+                conn.execute('DELETE FROM sessions WHERE expires_at < ?', (time.time(),))
+
+    def delete(self, sid):
+        with self.db.transaction() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def stats(self):
+        count = self.db.connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return {'backend': 'sqlite', 'sessions': count}
+
+
+def migrate_books_json(db, json_path):
+    """Imports books.json into an empty books table (the old JSON catalog).
+    Returns the number of books imported."""
+    catalog = SqliteCatalogStore(db)
+    if catalog.count() or not os.path.exists(json_path):
+        return 0
+    with open(json_path) as file:
+        books = json.load(file)
+    catalog.put_many(books)
+    SqliteStats(db).adjust_stock(sum(int(b.get('stock', 0)) for b in books))
+    return len(books)
+
+
+if __name__ == '__main__':
+    # python sqlite_store.py [bookbazar.db] [books.json]
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'bookbazar.db'
+    json_path = sys.argv[2] if len(sys.argv) > 2 else 'books.json'
+    print(f"📦 Importing {json_path} into {db_path}...")
+    imported = migrate_books_json(Database(db_path), json_path)
+    print(f"🎉 Imported {imported} books." if imported else "ℹ️  Nothing to import (books table already populated).")
@@ -0,0 +1,149 @@
+import threading
+from decimal import Decimal
+from orders import order_from_item, order_shard
+
+# ---------------------------------------------------------
+# Dashboard Aggregates (maintained at write time)
+# ---------------------------------------------------------
+class MemoryStats:
+    """Running totals for app.py. Every write path (checkout, order status,
+    add/edit/delete book) adjusts them, so /admin reads them in O(1)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total_sales = 0.0
+        self.total_orders = 0
+        self.total_stock = 0
+        self.status_counts = {}
+
+    def record_orders(self, count, sales, units):
+        with self._lock:
+            self.total_orders += count
+            self.total_sales += sales
+            self.total_stock -= units
+            self.status_counts['Pending'] = self.status_counts.get('Pending', 0) + count
+
+    def adjust_stock(self, delta):
+        with self._lock:
+            self.total_stock += delta
+
+    def status_changed(self, old, new):
+        if old == new:
+            return
+        with self._lock:
+            self.status_counts[old] = self.status_counts.get(old, 0) - 1
+            self.status_counts[new] = self.status_counts.get(new, 0) + 1
+
+    def snapshot(self):
+        return {
+            'total_sales': round(self.total_sales, 2),
+            'total_orders': self.total_orders,
+            'total_stock': self.total_stock,
+            'status_counts': dict(self.status_counts),
+        }
+
+
+class DynamoStats:
+    """Atomic counters on a single item of the Stats table (Partition Key:
+    name). Updates use ADD, so concurrent writers never lose increments."""
+
+    KEY = {'name': 'global'}
+
+    def __init__(self, table):
+        self.table = table
+
+    def _add(self, values):
+        names = {}
+        exprs = []
+        attr_values = {}
+        for i, (attr, delta) in enumerate(values.items()):
+            names['#a%d' % i] = attr
+            attr_values[':v%d' % i] = delta
+            exprs.append('#a%d :v%d' % (i, i))
+        self.table.update_item(
+            Key=self.KEY,
+            UpdateExpression='ADD ' + ', '.join(exprs),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=attr_values
+        )
+
+    def record_orders(self, count, sales, units):
+        self._add({
+            'total_orders': count,
+            'total_sales': Decimal(str(round(sales, 2))),
+            'total_stock': -units,
+            'status_Pending': count,
+        })
+
+    def adjust_stock(self, delta):
+        if delta:
+            self._add({'total_stock': delta})
+
+    def status_changed(self, old, new):
+        if old and old != new:
+            self._add({'status_' + old: -1, 'status_' + new: 1})
+        elif not old:
+            self._add({'status_' + new: 1})
+
+    def snapshot(self):
+        item = self.table.get_item(Key=self.KEY).get('Item', {})
+        return {
+            'total_sales': round(float(item.get('total_sales', 0)), 2),
+            'total_orders': int(item.get('total_orders', 0)),
+            'total_stock': int(item.get('total_stock', 0)),
+            'status_counts': {k[len('status_'):]: int(v) for k, v in item.items() if k.startswith('status_')},
+        }
+
+    def rebuild(self, books_table, orders_table):
+        """One-off full recount, for tables that already had data before
+        the counters existed. Also sets order_shard on orders that lack it
+        or were written under another ORDER_SHARDS."""
+        total_stock = 0
+        for book in _scan_all(books_table, 'stock'):
+            total_stock += int(book.get('stock', 0))
+        total_orders = 0
+        total_sales = Decimal('0')
+        status_counts = {}
+        for order in _scan_all(orders_table):
+            total_orders += 1
+            # Line items, or the single line of an item written before them
+            total_sales += sum(Decimal(str(line.unit_price)) * line.quantity for line in order_from_item(order).lines)
+            status_counts[order['status']] = status_counts.get(order['status'], 0) + 1
+            shard = order_shard(order['order_id'])
+            if order.get('order_shard') != shard:
+                orders_table.update_item(
+                    Key={'order_id': order['order_id']},
+                    UpdateExpression='set order_shard = :s',
+                    ExpressionAttributeValues={':s': shard}
+                )
+        item = dict(self.KEY)
+        item.update({
+            'total_stock': total_stock,
+            'total_orders': total_orders,
+            'total_sales': total_sales,
+        })
+        for status, count in status_counts.items():
+            item['status_' + status] = count
+        self.table.put_item(Item=item)
+        return self.snapshot()
+
+
+def _scan_all(table, projection=None):
+    kwargs = {}
+    if projection:
+        kwargs['ProjectionExpression'] = projection
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+if __name__ == '__main__':
+    import aws_clients
+    dynamodb = aws_clients.resource('dynamodb', 'us-east-1')
+    print("📊 Recounting dashboard stats from Books and Orders...")
+    stats = DynamoStats(dynamodb.Table('Stats'))
+    print(stats.rebuild(dynamodb.Table('Books'), dynamodb.Table('Orders')))
+    print("🎉 Stats rebuilt!")
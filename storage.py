@@ -0,0 +1,66 @@
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+# ---------------------------------------------------------
+# Crash-safe JSON Files (used by the books.json catalog)
+# ---------------------------------------------------------
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock for a read-modify-write of `path`, held across threads
+    and across processes (gunicorn workers) via flock on `path`.lock."""
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@timed('file_write')
+def atomic_write_json(path, data):
+    """Writes compact JSON to a temp file, fsyncs it and renames it over
+    `path`. Readers see either the old file or the new one, never a
+    truncated one, even if the process dies mid-write."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Persist the rename itself
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
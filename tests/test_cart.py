@@ -0,0 +1,127 @@
+import os
+import threading
+
+import pytest
+
+import cart
+import sqlite_store
+from cart import CartConflict, CartService, MemoryCartStore
+
+
+def memory_store(tmp_path):
+    return MemoryCartStore()
+
+
+def sqlite_cart_store(tmp_path):
+    return sqlite_store.SqliteCartStore(sqlite_store.Database(str(tmp_path / 'test.db')))
+
+
+@pytest.fixture
+def dynamo_store():
+    moto = pytest.importorskip('moto')
+    for name, value in {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test',
+                        'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        os.environ.setdefault(name, value)
+    with moto.mock_aws():
+        import boto3
+        import create_tables
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        create_tables.create_table(dynamodb, 'Carts')
+        yield cart.DynamoCartStore(dynamodb.Table('Carts'))
+
+
+@pytest.fixture(params=[memory_store, sqlite_cart_store])
+def store(request, tmp_path):
+    return request.param(tmp_path)
+
+
+def race_once(service, competing):
+    """Runs competing() between the next load and save, like a second
+    request for the same cart."""
+    save_items = service.store.save_items
+    raced = []
+
+    def save_after_race(*args):
+        if not raced:
+            raced.append(True)
+            competing()
+        return save_items(*args)
+    service.store.save_items = save_after_race
+
+
+def test_concurrent_change_is_not_lost(store):
+    service = CartService(store, catalog=None)
+    service.add('u', 1, 1)
+    race_once(service, lambda: service.add('u', 2, 1))
+
+    assert service.add('u', 1, 1) == {'1': 2, '2': 1}
+    assert store.load('u')['items'] == {'1': 2, '2': 1}
+    assert service.stats()['conflicts'] == 1
+
+
+def test_stock_limit_is_checked_against_the_saved_cart(store):
+    service = CartService(store, catalog=None)
+    # Another tab takes the last copy after this request read the cart
+    race_once(service, lambda: service.add('u', 1, 1, max_quantity=1))
+
+    assert service.add('u', 1, 1, max_quantity=1) is None
+    assert store.load('u')['items'] == {'1': 1}
+
+
+def test_gives_up_after_max_attempts(store, monkeypatch):
+    service = CartService(store, catalog=None)
+    monkeypatch.setattr(store, 'save_items', lambda *args: False)
+    with pytest.raises(CartConflict):
+        service.set_quantity('u', 1, 1)
+    assert service.stats()['conflicts'] == cart.MAX_SAVE_ATTEMPTS
+
+
+def test_threads_adding_to_one_cart(store):
+    service = CartService(store, catalog=None)
+    threads = [threading.Thread(target=lambda i=i: [service.add('u', i % 4, 1) for _ in range(10)])
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.load('u')['items'] == {str(i): 20 for i in range(4)}
+
+
+def test_dynamo_conflict_retries(dynamo_store):
+    service = CartService(dynamo_store, catalog=None)
+    service.add('u', 1, 1)
+    race_once(service, lambda: service.set_quantity('u', 1, 0))
+
+    assert service.add('u', 2, 1) == {'2': 1}
+    assert service.stats()['conflicts'] == 1
+    assert dynamo_store.load('u')['items'] == {'2': 1}
+    assert dynamo_store.load('u')['version'] == 3
+
+
+class Catalog:
+    def __init__(self, books):
+        self.books = books
+        self.reads = 0
+
+    def get_many(self, book_ids):
+        self.reads += 1
+        return {str_id: dict(self.books[str_id]) for str_id in book_ids if str_id in self.books}
+
+
+def test_summary_is_repriced_when_the_catalog_version_moves(store):
+    catalog = Catalog({'1': {'id': '1', 'title': 'Dune', 'author': 'A', 'price': 10, 'stock': 3}})
+    version = [1]
+    service = CartService(store, catalog, catalog_version=lambda: version[0])
+    service.add('u', 1, 2)
+
+    assert service.summary('u')['grand_total'] == 20
+    assert service.summary('u')['grand_total'] == 20
+    assert catalog.reads == 1
+
+    # A price change elsewhere: no write to the cart, re-priced on read
+    cart_version = store.load('u')['version']
+    catalog.books['1']['price'] = 12
+    version[0] = 2
+    assert service.summary('u')['grand_total'] == 24
+    assert catalog.reads == 2
+    assert store.load('u')['version'] == cart_version
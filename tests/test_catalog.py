@@ -0,0 +1,68 @@
+import json
+
+from flask import Flask
+
+from catalog import JsonCatalogStore
+
+
+def make_store(tmp_path, count=5):
+    path = tmp_path / 'books.json'
+    path.write_text(json.dumps([{'id': i, 'title': f'Title {i}', 'author': 'A', 'price': 1.0, 'stock': 3}
+                                for i in range(1, count + 1)]))
+    return JsonCatalogStore(str(path))
+
+
+def test_stock_writes_keep_the_indexes(tmp_path):
+    store = make_store(tmp_path)
+    store.page(2)
+    generation = store.cache.index_generation
+
+    assert store.adjust_stock({'1': -1}) == []
+    store.set_image(2, 'cover.jpg')
+    books, _ = store.page(2)
+    assert books[0]['stock'] == 2
+    assert store.cache.index_generation == generation
+
+    store.put(dict(store.get(3), title='Renamed'))
+    assert [b['id'] for b in store.by_title_prefix('renamed')] == [3]
+    assert store.cache.index_generation == generation + 1
+
+
+def test_another_workers_stock_write_keeps_the_indexes(tmp_path):
+    store = make_store(tmp_path)
+    store.page(2)
+    generation = store.cache.index_generation
+    other = JsonCatalogStore(store.path)
+    other.adjust_stock({'4': -2})
+
+    assert store.get(4)['stock'] == 1
+    assert store.cache.reloads == 1
+    assert store.cache.index_generation == generation
+
+
+def test_books_json_is_checked_once_per_request(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.get(1)
+    calls = []
+    signature = store.cache._file_signature
+    monkeypatch.setattr(store.cache, '_file_signature', lambda: calls.append(1) or signature())
+
+    with Flask(__name__).test_request_context():
+        store.page(5)
+        store.get_many(['1', '2', '3'])
+        store.get(4)
+    assert len(calls) == 1
+
+
+def test_columnar_stock_write_updates_the_column_in_place(tmp_path):
+    store = make_store(tmp_path)
+    store.cache.layout = 'columnar'
+    columns = store.all()
+
+    assert store.adjust_stock({'2': -2, '3': 1}) == []
+    assert store.all() is columns
+    assert [book['stock'] for book in store.all()] == [3, 1, 4, 3, 3]
+    # Other writes still rebuild
+    store.put(dict(store.get(1), title='New'))
+    assert store.all() is not columns
+    assert store.get(1)['title'] == 'New' and store.get(2)['stock'] == 1
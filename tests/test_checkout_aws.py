@@ -0,0 +1,118 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+moto = pytest.importorskip('moto')
+
+USER = {'email': 'reader@example.com', 'name': 'Reader'}
+
+
+@pytest.fixture(scope='module')
+def app_aws():
+    """app_aws against moto's in-process DynamoDB, tables created empty."""
+    for name, value in {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test',
+                        'AWS_DEFAULT_REGION': 'us-east-1', 'SNS_FAKE': '1', 'IMAGE_WORKERS': '0'}.items():
+        os.environ.setdefault(name, value)
+    with moto.mock_aws():
+        import aws_clients
+        import create_tables
+        create_tables.create_all(aws_clients.resource('dynamodb', 'us-east-1'))
+        import app_aws
+        yield app_aws
+
+
+@pytest.fixture
+def books(app_aws, request):
+    """put(count, stock) adds books with ids unique to this test and
+    returns {str_id: book}."""
+    def put(count, stock):
+        prefix = request.node.name
+        books = {f'{prefix}-{i}': {'id': f'{prefix}-{i}', 'title': f'Book {i}', 'author': 'Author',
+                                    'price': Decimal('2.50'), 'stock': stock} for i in range(count)}
+        with app_aws.books_table.batch_writer() as batch:
+            for book in books.values():
+                batch.put_item(Item=book)
+        return books
+    return put
+
+
+def stock(app_aws, book_id):
+    return int(app_aws.books_table.get_item(Key={'id': book_id})['Item']['stock'])
+
+
+def order_item(app_aws, order_id):
+    return app_aws.orders_table.get_item(Key={'order_id': order_id}).get('Item')
+
+
+def test_places_a_multi_line_order(app_aws, books):
+    by_id = books(3, stock=5)
+    cart = {book_id: n + 1 for n, book_id in enumerate(by_id)}
+
+    order, failed = app_aws.place_order(USER, cart, by_id)
+
+    assert failed == []
+    assert [(line.book_id, line.quantity) for line in order.lines] == list(cart.items())
+    assert [stock(app_aws, book_id) for book_id in by_id] == [4, 3, 2]
+    item = order_item(app_aws, order.order_id)
+    assert item['user_id'] == USER['email']
+    assert len(item['lines']) == 3
+
+
+def test_insufficient_stock_cancels_and_reports_the_line(app_aws, books):
+    by_id = books(2, stock=2)
+    first, second = by_id
+    cart = {first: 1, second: 3}
+
+    order, failed = app_aws.place_order(USER, cart, by_id)
+
+    assert order is None
+    assert failed == [{'book': by_id[second], 'quantity': 3, 'stock': 2}]
+    # Nothing was written: the in-stock line wasn't decremented either
+    assert stock(app_aws, first) == 2
+    assert stock(app_aws, second) == 2
+
+
+def test_failed_later_chunk_restores_committed_chunks(app_aws, books):
+    count = app_aws.LINES_PER_TRANSACTION + 5
+    by_id = books(count, stock=1)
+    cart = {book_id: 1 for book_id in by_id}
+    # The last book (second transaction) is sold out in the meantime
+    last = list(by_id)[-1]
+    app_aws.books_table.update_item(Key={'id': last}, UpdateExpression='SET stock = :zero',
+                                    ExpressionAttributeValues={':zero': 0})
+
+    order, failed = app_aws.place_order(USER, cart, by_id)
+
+    assert order is None
+    assert [(line['book']['id'], line['stock']) for line in failed] == [(last, 0)]
+    # The first chunk (LINES_PER_TRANSACTION lines) committed, then was undone
+    assert all(stock(app_aws, book_id) == 1 for book_id in list(by_id)[:-1])
+    orders = app_aws.orders_table.scan()['Items']
+    assert not [o for o in orders if any(line['book_id'] in by_id for line in o.get('lines', []))]
+
+
+def test_cart_conflict_is_a_flash_not_a_500(app_aws, books, monkeypatch):
+    (book_id,) = books(1, stock=5)
+    client = app_aws.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = dict(USER, is_admin=False)
+    monkeypatch.setattr(app_aws.cart_service.store, 'save_items', lambda *args: False)
+
+    response = client.post(f'/add_to_cart/{book_id}')
+
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert ('warning', 'Your cart is busy, please try again.') in session['_flashes']
+
+
+def test_signup_attempts_do_not_use_up_login_attempts(app_aws):
+    client = app_aws.app.test_client()
+    environ = {'REMOTE_ADDR': '203.0.113.7'}
+    for _ in range(app_aws.signup_limiter.burst):
+        client.post('/signup', data={'name': 'x', 'email': 'x@example.com', 'password': 'pw'}, environ_base=environ)
+
+    assert client.post('/signup', data={'name': 'x', 'email': 'x@example.com', 'password': 'pw'},
+                       environ_base=environ).status_code == 429
+    assert client.post('/login', data={'email': 'nobody@example.com', 'password': 'pw'},
+                       environ_base=environ).status_code != 429
@@ -0,0 +1,43 @@
+import io
+import time
+
+from PIL import Image
+
+import jobs
+from images import ImagePipeline
+
+
+def wait(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('job did not finish')
+
+
+class Upload:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, size=-1):
+        return self.data
+
+
+def test_workers_are_not_forked_from_the_web_process():
+    assert jobs._mp_context().get_start_method() != 'fork'
+
+
+def test_cover_job_runs_in_a_worker_process(tmp_path):
+    buffer = io.BytesIO()
+    Image.new('RGB', (80, 120), 'red').save(buffer, 'PNG')
+    pipeline = ImagePipeline(str(tmp_path))
+    staged = pipeline.stage(Upload(buffer.getvalue()))
+    queue = jobs.JobQueue(workers=1)
+
+    job = wait(queue, queue.submit('cover', jobs.process_staged, str(tmp_path), staged))
+
+    assert job['status'] == 'done', job['error']
+    assert (tmp_path / job['result']).exists()
+    assert queue.stats()['succeeded'] == 1
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from notifications import NotificationDispatcher, FakeSNSClient
+
+
+class BrokenSNSClient(FakeSNSClient):
+    """Raises a non-AWS error on the first publish, then behaves."""
+
+    def __init__(self):
+        super().__init__()
+        self.broken = True
+
+    def publish(self, **kwargs):
+        if self.broken:
+            self.broken = False
+            raise ValueError('bad payload')
+        return super().publish(**kwargs)
+
+
+@pytest.fixture
+def dead_letter(tmp_path):
+    return tmp_path / 'dead_letter.jsonl'
+
+
+def dispatcher(client, dead_letter, **kwargs):
+    kwargs.setdefault('workers', 1)
+    kwargs.setdefault('base_delay', 0)
+    return NotificationDispatcher(client, 'arn:aws:sns:us-east-1:123456789012:test',
+                                  dead_letter_path=str(dead_letter), **kwargs)
+
+
+def dead_letters(path):
+    if not path.exists():
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_sends_in_the_background(dead_letter):
+    client = FakeSNSClient()
+    sns = dispatcher(client, dead_letter)
+    assert sns.submit('Subject', 'Body')
+    assert sns.flush(5)
+    assert client.published == [{'TopicArn': 'arn:aws:sns:us-east-1:123456789012:test',
+                                 'Subject': 'Subject', 'Message': 'Body'}]
+    assert sns.stats()['sent'] == 1
+
+
+def test_retries_throttling_until_sent(dead_letter):
+    client = FakeSNSClient(fail_times=2)
+    sns = dispatcher(client, dead_letter)
+    sns.submit('Subject', 'Body')
+    assert sns.flush(5)
+    stats = sns.stats()
+    assert (stats['sent'], stats['retries'], stats['dead_lettered']) == (1, 2, 0)
+    assert dead_letters(dead_letter) == []
+
+
+def test_dead_letters_after_max_attempts(dead_letter):
+    client = FakeSNSClient(fail_times=10)
+    sns = dispatcher(client, dead_letter, max_attempts=3)
+    sns.submit('Subject', 'Body')
+    assert sns.flush(5)
+    stats = sns.stats()
+    assert (stats['sent'], stats['retries'], stats['dead_lettered']) == (0, 2, 1)
+    [record] = dead_letters(dead_letter)
+    assert record['message'] == 'Body'
+    assert record['reason'].startswith('Throttling')
+
+
+def test_does_not_retry_permanent_errors(dead_letter):
+    client = FakeSNSClient(fail_times=1, error_code='InvalidParameter')
+    sns = dispatcher(client, dead_letter)
+    sns.submit('Subject', 'Body')
+    assert sns.flush(5)
+    assert sns.stats()['retries'] == 0
+    [record] = dead_letters(dead_letter)
+    assert record['reason'].startswith('InvalidParameter')
+
+
+def test_worker_survives_unexpected_errors(dead_letter):
+    client = BrokenSNSClient()
+    sns = dispatcher(client, dead_letter)
+    sns.submit('First', 'Body')
+    sns.submit('Second', 'Body')
+    assert sns.flush(5)
+    assert [m['Subject'] for m in client.published] == ['Second']
+    [record] = dead_letters(dead_letter)
+    assert (record['subject'], record['reason']) == ('First', 'ValueError: bad payload')
+
+
+def test_full_queue_dead_letters_instead_of_blocking(dead_letter):
+    sns = dispatcher(FakeSNSClient(), dead_letter, workers=0, max_queue=1)
+    assert sns.submit('First', 'Body')
+    assert not sns.submit('Second', 'Body')
+    assert sns.stats()['dropped_queue_full'] == 1
+    assert [r['subject'] for r in dead_letters(dead_letter)] == ['Second']
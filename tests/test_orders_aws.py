@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+moto = pytest.importorskip('moto')
+
+from orders import DynamoOrderStore, Order, OrderLine, order_shard, order_to_item
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def orders_table():
+    for name, value in {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test',
+                        'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        os.environ.setdefault(name, value)
+    with moto.mock_aws():
+        import boto3
+        import create_tables
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        create_tables.create_table(dynamodb, 'Orders')
+        yield dynamodb.Table('Orders')
+
+
+def put_orders(table, count, shards, spacing=DAY * 7):
+    """count orders, one a week going back from now (well past a month)."""
+    now = time.time()
+    with table.batch_writer() as batch:
+        for i in range(count):
+            order = Order(f'order-{i}', 'user', 'User', now - i * spacing, [OrderLine('1', 'Book', 1, 5)])
+            item = order_to_item(order)
+            item['order_shard'] = order_shard(order.order_id, shards)
+            batch.put_item(Item=item)
+
+
+def all_pages(store, limit):
+    pages, cursor = [], None
+    while True:
+        orders, cursor = store.recent(limit, cursor)
+        pages.append([order.order_id for order in orders])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('shards', [1, 3])
+def test_recent_pages_through_every_order_newest_first(orders_table, shards):
+    put_orders(orders_table, 30, shards)
+    store = DynamoOrderStore(orders_table, shards=shards)
+    pages = all_pages(store, 7)
+    assert [len(page) for page in pages] == [7, 7, 7, 7, 2]
+    assert sum(pages, []) == [f'order-{i}' for i in range(30)]
+
+
+def test_one_query_per_shard_per_page(orders_table, monkeypatch):
+    put_orders(orders_table, 10, 2)
+    store = DynamoOrderStore(orders_table, shards=2)
+    calls = []
+    query = orders_table.query
+    monkeypatch.setattr(orders_table, 'query', lambda **kwargs: calls.append(kwargs) or query(**kwargs))
+    orders, cursor = store.recent(4)
+    assert len(orders) == 4 and cursor
+    assert len(calls) == 2
+
+
+def test_tampered_cursor_starts_over(orders_table):
+    put_orders(orders_table, 5, 1)
+    store = DynamoOrderStore(orders_table, shards=1)
+    from pagination import encode_cursor
+    for position in ({'0': {'order_id': 'x', 'extra': 1}}, {'day': '2020-01-01'}, ['0']):
+        orders, _ = store.recent(2, encode_cursor(position))
+        assert [order.order_id for order in orders] == ['order-0', 'order-1']
+
+
+def test_page_for_user_ignores_cursors_it_did_not_hand_out(orders_table):
+    put_orders(orders_table, 5, 1)
+    store = DynamoOrderStore(orders_table, shards=1)
+    first, cursor = store.page_for_user('user', 2)
+    assert [order.order_id for order in first] == ['order-0', 'order-1']
+    second, _ = store.page_for_user('user', 2, cursor)
+    assert [order.order_id for order in second] == ['order-2', 'order-3']
+
+    from pagination import decode_cursor, encode_cursor
+    key = decode_cursor(cursor)
+    for position in (dict(key, user_id='someone-else'), dict(key, extra='1'), dict(key, order_date=5), {'id': '1'}):
+        orders, _ = store.page_for_user('user', 2, encode_cursor(position))
+        assert [order.order_id for order in orders] == ['order-0', 'order-1']
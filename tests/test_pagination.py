@@ -0,0 +1,47 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, start_key
+
+KEY = ('user_id', 'order_date', 'order_id')
+
+
+def test_cursor_round_trip_and_garbage():
+    position = {'user_id': 'a@example.com', 'order_date': '2026-01-01', 'order_id': 'x'}
+    assert decode_cursor(encode_cursor(position)) == position
+    for token in ('not base64!', encode_cursor(['list']), 'e30'):
+        assert not decode_cursor(token)
+
+
+def test_start_key_matches_the_key_schema():
+    key = {'user_id': 'a', 'order_date': '2026-01-01', 'order_id': 'x'}
+    assert start_key(key, KEY, user_id='a') == key
+    assert start_key(key, KEY, user_id='b') is None
+    assert start_key(dict(key, extra='1'), KEY) is None
+    assert start_key({'user_id': 'a', 'order_id': 'x'}, KEY) is None
+    assert start_key(dict(key, order_date=1), KEY) is None
+    assert start_key(None, KEY) is None
+
+
+def test_dynamo_catalog_page_restarts_on_a_bad_cursor():
+    moto = pytest.importorskip('moto')
+    for name, value in {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test',
+                        'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        os.environ.setdefault(name, value)
+    with moto.mock_aws():
+        import boto3
+        import create_tables
+        from catalog import DynamoCatalogStore
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        create_tables.create_table(dynamodb, 'Books')
+        table = dynamodb.Table('Books')
+        for i in range(5):
+            table.put_item(Item={'id': str(i), 'title': f'Book {i}', 'author': 'A', 'price': Decimal('1'), 'stock': 1})
+        store = DynamoCatalogStore(table)
+        first, cursor = store.page(2)
+        assert len(first) == 2 and cursor
+        for position in ({'id': 1}, {'id': '1', 'title': 'x'}, {'isbn': '1'}):
+            books, _ = store.page(2, encode_cursor(position))
+            assert [book['id'] for book in books] == [book['id'] for book in first]
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+import passwords
+from passwords import PasswordHasher, HasherBusy, RateLimiter, _Latency
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    stored = hasher.hash('secret')
+    assert hasher.verify(stored, 'secret')
+    assert not hasher.verify(stored, 'wrong')
+    assert not hasher.needs_rehash(stored)
+
+
+def test_slow_hash_times_out_as_busy(monkeypatch):
+    release = threading.Event()
+
+    def stuck(*args):
+        release.wait(5)
+        return 'hash'
+    monkeypatch.setattr(passwords, 'generate_password_hash', stuck)
+    hasher = PasswordHasher(workers=1, timeout=0.05)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        # Queued behind the stuck hash: cancelled, not left to run later
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        assert hasher.stats()['timed_out'] == 2
+    finally:
+        release.set()
+
+
+def test_full_queue_is_busy(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(passwords, 'generate_password_hash', lambda *args: release.wait(5))
+    hasher = PasswordHasher(workers=1, max_queue=0, timeout=5)
+    try:
+        hasher.rehash_later('secret', lambda new_hash: None)
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        assert hasher.stats()['rejected_busy'] == 1
+    finally:
+        release.set()
+
+
+def test_p95_is_nearest_rank():
+    latency = _Latency()
+    for ms in range(1, 11):
+        latency.add(ms / 1000)
+    assert latency.snapshot()['p95_ms'] == 10.0
+    single = _Latency()
+    single.add(0.004)
+    assert single.snapshot()['p95_ms'] == 4.0
+
+
+def test_proxy_fix_keys_the_limiter_on_the_forwarded_client():
+    from flask import Flask, request
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app = Flask(__name__)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    limiter = RateLimiter(burst=1, per_minute=1)
+    app.add_url_rule('/', 'index', lambda: ('ok', 200) if limiter.allow(request.remote_addr) else ('busy', 429))
+    client = app.test_client()
+    proxy = {'REMOTE_ADDR': '10.0.0.1'}
+
+    assert client.get('/', headers={'X-Forwarded-For': '198.51.100.1'}, environ_base=proxy).status_code == 200
+    # Same proxy, another client: its own bucket
+    assert client.get('/', headers={'X-Forwarded-For': '198.51.100.2'}, environ_base=proxy).status_code == 200
+    assert client.get('/', headers={'X-Forwarded-For': '198.51.100.1'}, environ_base=proxy).status_code == 429
@@ -0,0 +1,63 @@
+import math
+import random
+
+from search import SearchIndex, tokenize
+
+WORDS = 'river house golden fire song winter machine garden silent letter war history'.split()
+
+
+def books(count, seed=1):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        yield {'id': i, 'title': ' '.join(rng.choices(WORDS, k=3)), 'author': rng.choice(WORDS).title(),
+               'description': ' '.join(rng.choices(WORDS, k=rng.randint(5, 30)))}
+
+
+def brute_force_scores(index, query):
+    """Every posting of every query term scored, as before pruning."""
+    tokens = tokenize(query)
+    terms = [(t, 1.0) for t in tokens] + [(t, 0.8) for t in index._expand(tokens[-1]) if t != tokens[-1]]
+    n_docs = len(index._doc_terms)
+    scores = {}
+    for term, query_weight in terms:
+        postings = index._postings.get(term, {})
+        idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+        for doc_id, impact in postings.items():
+            scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * idf * impact
+    return scores
+
+
+def assert_top(index, query, limit):
+    scores = brute_force_scores(index, query)
+    found = index.search(query, limit=limit)
+    assert len(found) == min(limit, len(scores))
+    expected = sorted(scores.values(), reverse=True)[:limit]
+    assert [scores[doc_id] for doc_id in found] == expected
+
+
+def test_pruned_search_returns_the_best_scores():
+    index = SearchIndex()
+    index.build(books(2000))
+    rng = random.Random(2)
+    for _ in range(100):
+        query = ' '.join(rng.choices(WORDS, k=rng.randint(1, 3)))
+        assert_top(index, query, rng.choice([1, 5, 20]))
+
+
+def test_prefix_matches_longer_words():
+    index = SearchIndex()
+    index.build([{'id': 1, 'title': 'Gardening Basics'}, {'id': 2, 'title': 'Garden Party'}, {'id': 3, 'title': 'War'}])
+    assert index.search('gard') == ['2', '1']
+    assert index.search('gard', prefix=False) == []
+
+
+def test_add_and_remove_keep_queried_terms_in_order():
+    index = SearchIndex()
+    index.build(books(500))
+    index.search('river')      # materialise the impact list before editing
+    index.add({'id': 7, 'title': 'river river river', 'author': 'River'})
+    index.add({'id': 501, 'title': 'river', 'description': 'river house'})
+    index.remove(8)
+    assert '8' not in index.search('river', limit=500)
+    assert index.search('river', limit=1) == ['7']
+    assert_top(index, 'river house', 20)
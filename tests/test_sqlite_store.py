@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+import sqlite_store
+from orders import Order, OrderLine
+
+
+@pytest.fixture
+def db(tmp_path):
+    return sqlite_store.Database(str(tmp_path / 'test.db'))
+
+
+@pytest.fixture
+def stores(db):
+    catalog = sqlite_store.SqliteCatalogStore(db)
+    catalog.put({'id': 1, 'title': 'Dune', 'author': 'Frank Herbert', 'price': 10.0, 'stock': 5})
+    return catalog, sqlite_store.SqliteOrderStore(db), sqlite_store.SqliteStats(db)
+
+
+def checkout(db, catalog, orders, stats, quantity):
+    with db.transaction():
+        short = catalog.adjust_stock({'1': -quantity})
+        if short:
+            return None
+        order = orders.add(Order(None, 7, 'Reader', time.time(), [OrderLine('1', 'Dune', quantity, 10.0)]))
+        stats.record_orders(1, order.total, order.units)
+        return order
+
+
+def test_checkout_writes_commit_together(db, stores):
+    catalog, orders, stats = stores
+    order = checkout(db, catalog, orders, stats, 2)
+    assert catalog.get(1)['stock'] == 3
+    assert orders.get(order.order_id).total == 20.0
+    assert stats.snapshot()['total_orders'] == 1
+
+
+def test_failure_rolls_back_every_store(db, stores, monkeypatch):
+    catalog, orders, stats = stores
+
+    def fail(*args):
+        raise RuntimeError('crash after the order was written')
+    monkeypatch.setattr(stats, 'record_orders', fail)
+
+    with pytest.raises(RuntimeError):
+        checkout(db, catalog, orders, stats, 2)
+    assert catalog.get(1)['stock'] == 5
+    assert db.query('SELECT * FROM orders') == []
+    assert db.query('SELECT * FROM order_lines') == []
+    assert not db.connection().in_transaction
+
+
+def test_short_stock_writes_nothing(db, stores):
+    catalog, orders, stats = stores
+    assert checkout(db, catalog, orders, stats, 6) is None
+    assert catalog.get(1)['stock'] == 5
+    assert stats.snapshot()['total_orders'] == 0
+
+
+def test_store_writes_commit_on_their_own_outside_a_transaction(db, stores):
+    catalog, _, _ = stores
+    assert catalog.adjust_stock({'1': -1}) == []
+    assert not db.connection().in_transaction
+    assert catalog.get(1)['stock'] == 4
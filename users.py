@@ -0,0 +1,28 @@
+import threading
+
+# ---------------------------------------------------------
+# User Stores (app.py)
+# ---------------------------------------------------------
+class MemoryUserStore:
+    """In-process users keyed by email."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_email = {}
+
+    def get_by_email(self, email):
+        return self._by_email.get(email)
+
+    def add(self, name, email, password):
+        """Creates a user and returns it, or None if the email is taken."""
+        with self._lock:
+            if email in self._by_email:
+                return None
+            user = {'id': len(self._by_email) + 1, 'name': name, 'email': email, 'password': password}
+            self._by_email[email] = user
+            return user
+
+    def set_password(self, email, password):
+        with self._lock:
+            if email in self._by_email:
+                self._by_email[email] = dict(self._by_email[email], password=password)